@@ -7,17 +7,32 @@ Usage:
 
 import argparse
 import asyncio
+import concurrent.futures
+import functools
 import json
 import logging
+import math
 import os
+import random
 import time
 import tempfile
+import unicodedata
+import uuid
 import aiohttp
 import base64
+import hashlib
+import inspect
 import mimetypes
+import mmap
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
-from typing import Optional
-from datetime import datetime
+from types import ModuleType
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, cast
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 from fastmcp import FastMCP, Context
@@ -25,11 +40,38 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 
 try:
-    from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+    from azure.core import MatchConditions
+    from azure.core.exceptions import (
+        HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+    )
+    from azure.storage.blob import (
+        BlobServiceClient,
+        BlobClient,
+        ContainerClient,
+        BlobBlock,
+        ContentSettings,
+    )
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
 except ImportError:
     BlobServiceClient = None
     BlobClient = None
     ContainerClient = None
+    BlobBlock = None  # type: ignore[assignment,misc]
+    ContentSettings = None  # type: ignore[assignment,misc]
+    AsyncBlobServiceClient = None  # type: ignore[assignment,misc]
+    MatchConditions = None  # type: ignore[assignment,misc]
+    ResourceExistsError = None  # type: ignore[assignment,misc]
+    ResourceModifiedError = None  # type: ignore[assignment,misc]
+    ResourceNotFoundError = None  # type: ignore[assignment,misc]
+    HttpResponseError = None  # type: ignore[assignment,misc]
+
+crc64: Optional[ModuleType]
+try:
+    # Optional native CRC64 used by the Azure SDK; content CRC64 is skipped without it
+    from azure.storage.extensions.checksums import crc64 as _crc64
+    crc64 = _crc64
+except ImportError:
+    crc64 = None
 
 try:
     from google import genai
@@ -59,12 +101,190 @@ AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_BLOB_CONTAINER_NAME", "generated-videos")
 AZURE_UPLOAD_ENABLED = os.getenv("AZURE_UPLOAD_ENABLED", "true").lower() == "true"
 
+# Gemini SDK worker threads (the SDK calls are blocking, so they run off the event loop)
+GEMINI_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "32"))
+
+# Shared operation poller configuration
+VEO_POLL_CONCURRENCY = int(os.getenv("VEO_POLL_CONCURRENCY", "8"))  # Max status checks in flight
+VEO_POLL_TICK = float(os.getenv("VEO_POLL_TICK", "2"))  # Check slot size in seconds
+# Consecutive failed checks before giving up
+VEO_POLL_MAX_ERRORS = int(os.getenv("VEO_POLL_MAX_ERRORS", "3"))
+# A status check slower than this counts as failed
+VEO_POLL_RPC_TIMEOUT = float(os.getenv("VEO_POLL_RPC_TIMEOUT", "30"))
+# Progress report cadence in seconds
+VEO_PROGRESS_INTERVAL = float(os.getenv("VEO_PROGRESS_INTERVAL", "10"))
+
+# Adaptive poll scheduling driven by per-model latency history
+# Densest polling near expected completion
+VEO_POLL_MIN_INTERVAL = float(os.getenv("VEO_POLL_MIN_INTERVAL", "3"))
+VEO_POLL_MAX_INTERVAL = float(os.getenv("VEO_POLL_MAX_INTERVAL", "30"))  # Sparsest polling early on
+# Samples kept per model
+VEO_LATENCY_HISTORY_SIZE = int(os.getenv("VEO_LATENCY_HISTORY_SIZE", "50"))
+
+# Background job API
+# Finished jobs kept for lookup
+VEO_JOB_HISTORY_LIMIT = int(os.getenv("VEO_JOB_HISTORY_LIMIT", "1000"))
+VEO_JOB_MAX_WAIT = float(os.getenv("VEO_JOB_MAX_WAIT", "540"))  # Longest single wait_video_job call
+
+# Generation scheduler: per-model concurrency, priority lanes, per-session fairness
+# e.g. "veo-3.0-generate-preview=16,veo-3.0-fast-generate-preview=32"
+VEO_MODEL_CONCURRENCY = os.getenv("VEO_MODEL_CONCURRENCY", "")
+# Generations in flight per model, from submission until Veo finishes
+VEO_DEFAULT_MODEL_CONCURRENCY = int(os.getenv("VEO_DEFAULT_MODEL_CONCURRENCY", "32"))
+
+# Adaptive (AIMD) concurrency for Gemini submissions
+VEO_SUBMIT_MIN_CONCURRENCY = int(os.getenv("VEO_SUBMIT_MIN_CONCURRENCY", "1"))
+VEO_SUBMIT_MAX_CONCURRENCY = int(os.getenv("VEO_SUBMIT_MAX_CONCURRENCY", "32"))
+VEO_SUBMIT_INITIAL_CONCURRENCY = int(os.getenv("VEO_SUBMIT_INITIAL_CONCURRENCY", "4"))
+# x average latency
+VEO_SUBMIT_LATENCY_SPIKE_FACTOR = float(os.getenv("VEO_SUBMIT_LATENCY_SPIKE_FACTOR", "3"))
+VEO_SUBMIT_MAX_RETRIES = int(os.getenv("VEO_SUBMIT_MAX_RETRIES", "5"))  # Retries after a 429
+VEO_SUBMIT_BACKOFF_BASE = float(os.getenv("VEO_SUBMIT_BACKOFF_BASE", "2"))
+VEO_SUBMIT_BACKOFF_MAX = float(os.getenv("VEO_SUBMIT_BACKOFF_MAX", "60"))
+
+# Durable state (job store, resumable generations)
+VEO_STATE_DB = os.getenv("VEO_STATE_DB", os.path.join(OUTPUT_DIR, ".veo3_state.db"))
+VEO_RESUME_ON_START = os.getenv("VEO_RESUME_ON_START", "true").lower() == "true"
+# Gemini keeps results ~2 days
+VEO_OPERATION_RETENTION = float(os.getenv("VEO_OPERATION_RETENTION", str(2 * 24 * 3600)))
+
+# Content-addressed generation result cache
+VEO_CACHE_ENABLED = os.getenv("VEO_CACHE_ENABLED", "false").lower() == "true"
+# Seconds a cached result stays valid
+VEO_CACHE_TTL = float(os.getenv("VEO_CACHE_TTL", str(7 * 24 * 3600)))
+VEO_CACHE_MAX_ENTRIES = int(os.getenv("VEO_CACHE_MAX_ENTRIES", "10000"))
+# Total size of cached videos, 0 = unlimited
+VEO_CACHE_MAX_BYTES = int(os.getenv("VEO_CACHE_MAX_BYTES", "0"))
+
+# Batch generation
+VEO_BATCH_MAX_ITEMS = int(os.getenv("VEO_BATCH_MAX_ITEMS", "500"))
+VEO_BATCH_DEFAULT_CONCURRENCY = int(os.getenv("VEO_BATCH_DEFAULT_CONCURRENCY", "8"))
+VEO_BATCH_MAX_CONCURRENCY = int(os.getenv("VEO_BATCH_MAX_CONCURRENCY", "32"))
+
+# Upper bound on candidate videos requested from a single operation
+VEO_MAX_CANDIDATES = int(os.getenv("VEO_MAX_CANDIDATES", "4"))
+
+# Streaming download of generated videos (bounded memory, HTTP Range resume)
+VEO_STREAMING_DOWNLOAD = os.getenv("VEO_STREAMING_DOWNLOAD", "true").lower() == "true"
+# Bytes buffered per read
+VEO_DOWNLOAD_CHUNK_SIZE = int(os.getenv("VEO_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Reconnects without progress
+VEO_DOWNLOAD_MAX_RETRIES = int(os.getenv("VEO_DOWNLOAD_MAX_RETRIES", "5"))
+# Seconds without data
+VEO_DOWNLOAD_READ_TIMEOUT = float(os.getenv("VEO_DOWNLOAD_READ_TIMEOUT", "60"))
+
+# Zero-disk mode: stream Gemini output straight into Azure staged blocks
+AZURE_STREAM_UPLOAD_ENABLED = os.getenv("AZURE_STREAM_UPLOAD_ENABLED", "false").lower() == "true"
+# Bytes per staged block
+AZURE_STREAM_BLOCK_SIZE = int(os.getenv("AZURE_STREAM_BLOCK_SIZE", str(4 * 1024 * 1024)))
+# Also write streamed videos to OUTPUT_DIR
+VEO_KEEP_LOCAL_COPY = os.getenv("VEO_KEEP_LOCAL_COPY", "true").lower() == "true"
+
+# Parallel block upload; 0 lets the upload tuner pick per storage account
+AZURE_UPLOAD_BLOCK_SIZE = int(os.getenv("AZURE_UPLOAD_BLOCK_SIZE", "0"))
+AZURE_UPLOAD_CONCURRENCY = int(os.getenv("AZURE_UPLOAD_CONCURRENCY", "0"))
+AZURE_UPLOAD_AUTOTUNE = os.getenv("AZURE_UPLOAD_AUTOTUNE", "true").lower() == "true"
+# Share of uploads trying neighbouring settings
+AZURE_UPLOAD_EXPLORE_RATE = float(os.getenv("AZURE_UPLOAD_EXPLORE_RATE", "0.2"))
+# Per-request transactional CRC64 (MD5 without azure-storage-extensions)
+AZURE_UPLOAD_VALIDATE_CONTENT = os.getenv("AZURE_UPLOAD_VALIDATE_CONTENT", "true").lower() == "true"
+# Stage blocks as slices of a memory-mapped file
+AZURE_UPLOAD_MMAP = os.getenv("AZURE_UPLOAD_MMAP", "true").lower() == "true"
+
+# Upload bandwidth shaping in bytes/s (0 = unlimited);
+# interactive uploads come from generation, bulk from tools
+AZURE_UPLOAD_MAX_RATE = float(os.getenv("AZURE_UPLOAD_MAX_RATE", "0"))  # Shared by all uploads
+AZURE_UPLOAD_INTERACTIVE_RATE = float(os.getenv("AZURE_UPLOAD_INTERACTIVE_RATE", "0"))
+AZURE_UPLOAD_BULK_RATE = float(os.getenv("AZURE_UPLOAD_BULK_RATE", "0"))
+# Of the shared rate, kept for bulk while interactive waits
+AZURE_UPLOAD_BULK_MIN_SHARE = float(os.getenv("AZURE_UPLOAD_BULK_MIN_SHARE", "0.1"))
+
+# Background upload queue: return once the video is saved and upload it with retries
+AZURE_UPLOAD_ASYNC = os.getenv("AZURE_UPLOAD_ASYNC", "false").lower() == "true"
+AZURE_UPLOAD_WORKERS = int(os.getenv("AZURE_UPLOAD_WORKERS", "4"))
+# Before an upload is dead-lettered
+AZURE_UPLOAD_MAX_ATTEMPTS = int(os.getenv("AZURE_UPLOAD_MAX_ATTEMPTS", "6"))
+AZURE_UPLOAD_RETRY_BASE = float(os.getenv("AZURE_UPLOAD_RETRY_BASE", "5"))
+AZURE_UPLOAD_RETRY_MAX = float(os.getenv("AZURE_UPLOAD_RETRY_MAX", "300"))
+
+# Content-addressed deduplication: hash files before uploading
+# and reuse blobs that already hold the same bytes
+# off, reuse (existing blob's URL) or copy (server-side copy)
+AZURE_UPLOAD_DEDUP = os.getenv("AZURE_UPLOAD_DEDUP", "off").lower()
+# Tag blobs with content_sha256 and search tags
+AZURE_UPLOAD_DEDUP_TAGS = os.getenv("AZURE_UPLOAD_DEDUP_TAGS", "false").lower() == "true"
+
+# Paginated Azure listing
+# Default videos per list_azure_blob_videos page when paging
+AZURE_LIST_PAGE_SIZE = int(os.getenv("AZURE_LIST_PAGE_SIZE", "100"))
+# Azure returns at most 5000 blobs per request
+AZURE_LIST_MAX_PAGE_SIZE = int(os.getenv("AZURE_LIST_MAX_PAGE_SIZE", "5000"))
+# Azure pages read per call while filling a page
+AZURE_LIST_MAX_SCAN_PAGES = int(os.getenv("AZURE_LIST_MAX_SCAN_PAGES", "10"))
+
+# Local blob inventory: serve listings from SQLite, kept current by uploads/deletes and delta syncs
+AZURE_INVENTORY_ENABLED = os.getenv("AZURE_INVENTORY_ENABLED", "false").lower() == "true"
+# Seconds between background syncs
+AZURE_INVENTORY_SYNC_INTERVAL = float(os.getenv("AZURE_INVENTORY_SYNC_INTERVAL", "300"))
+
+# Shared catalog manifest: sharded NDJSON index blobs in the container,
+# for multi-replica deployments
+AZURE_CATALOG_MANIFEST = os.getenv("AZURE_CATALOG_MANIFEST", "false").lower() == "true"
+AZURE_CATALOG_PREFIX = os.getenv("AZURE_CATALOG_PREFIX", ".catalog/")
+AZURE_CATALOG_SHARDS = int(os.getenv("AZURE_CATALOG_SHARDS", "16"))
+# Conflicting writes before giving up
+AZURE_CATALOG_MAX_RETRIES = int(os.getenv("AZURE_CATALOG_MAX_RETRIES", "8"))
+# Seconds before a manifest is rebuilt from a listing, 0 = never
+AZURE_CATALOG_FULL_SYNC_INTERVAL = float(os.getenv("AZURE_CATALOG_FULL_SYNC_INTERVAL", "3600"))
+
+# Bulk deletion through the Blob Batch API
+# Deletes per batch request, Azure allows 256
+AZURE_DELETE_BATCH_SIZE = int(os.getenv("AZURE_DELETE_BATCH_SIZE", "256"))
+# Batch requests in flight
+AZURE_DELETE_CONCURRENCY = int(os.getenv("AZURE_DELETE_CONCURRENCY", "4"))
+# Blobs per delete_azure_blob_videos call
+AZURE_DELETE_MAX_BLOBS = int(os.getenv("AZURE_DELETE_MAX_BLOBS", "10000"))
+
+# Upload deduplication modes
+DEDUP_MODES = ["off", "reuse", "copy"]
+
+# Supported Veo models
+VALID_MODELS = ["veo-3.0-generate-preview", "veo-3.0-fast-generate-preview", "veo-2.0-generate-001"]
+
+# Blob name suffixes list_azure_blob_videos treats as videos
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+# Typical generation latencies (seconds) used until enough real samples exist
+DEFAULT_MODEL_LATENCY = {
+    "veo-3.0-generate-preview": 120.0,
+    "veo-3.0-fast-generate-preview": 60.0,
+    "veo-2.0-generate-001": 90.0,
+}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("mcp-veo3-azure-blob")
 
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Start background work that belongs to the running server"""
+    if VEO_RESUME_ON_START:
+        await resume_unfinished_generations()
+    if AZURE_UPLOAD_ASYNC and AZURE_UPLOAD_ENABLED:
+        upload_queue.start()
+    if AZURE_CONNECTION_STRING:
+        blob_inventory.start()
+    try:
+        yield
+    finally:
+        await blob_inventory.stop()
+        await upload_queue.stop()
+        await close_azure_blob_client()
+
+
 # Initialize FastMCP
-mcp = FastMCP("MCP Veo 3 Video Generator with Azure Blob Upload")
+mcp = FastMCP("MCP Veo 3 Video Generator with Azure Blob Upload", lifespan=server_lifespan)
 
 # Initialize Gemini client
 if not genai:
@@ -72,6 +292,10 @@ if not genai:
 
 gemini_client = genai.Client(api_key=API_KEY)
 
+# Dedicated executor for blocking Gemini SDK calls so that one slow request
+# (submit, poll or download) never freezes the other MCP tool calls
+gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
 
 class VideoGenerationResponse(BaseModel):
     video_path: str
@@ -107,12 +331,55 @@ class AzureBlobUploadResponse(BaseModel):
     error_message: Optional[str] = None
     upload_time: float
     file_size: int
+    content_md5: Optional[str] = None
+    content_crc64: Optional[str] = None
+    content_sha256: Optional[str] = None
+    deduplicated_from: Optional[str] = None
 
 
 class AzureBlobListResponse(BaseModel):
     blobs: list[dict]
     total_count: int
     container_name: str
+    continuation_token: Optional[str] = None
+    source: str = "azure"
+    # True when a date order only sorted this page, not the whole listing
+    sorted_within_page: bool = False
+
+
+class VideoJobResponse(BaseModel):
+    job_id: str
+    status: str
+    prompt: str
+    model: str
+    image_path: Optional[str] = None
+    progress: int = 0
+    message: Optional[str] = None
+    created: str
+    updated: str
+    video_path: Optional[str] = None
+    azure_video_url: Optional[str] = None
+    azure_video_urls: Optional[list[str]] = None
+    error: Optional[str] = None
+
+
+class VideoJobListResponse(BaseModel):
+    jobs: list[dict]
+    total_count: int
+
+
+class VideoBatchResponse(BaseModel):
+    results: list[dict]
+    total_count: int
+    succeeded_count: int
+    failed_count: int
+
+
+class UploadQueueResponse(BaseModel):
+    uploads: list[dict]
+    total_count: int
+
+
 def safe_join(root: str, user_path: str) -> str:
     """Safely join paths and prevent directory traversal"""
     abs_path = os.path.abspath(os.path.join(root, user_path))
@@ -194,356 +461,4778 @@ async def download_image_from_url(url: str, ctx: Context) -> str:
         raise ValueError(f"Failed to download image: {str(e)}")
 
 
-def get_azure_blob_client() -> Optional[BlobServiceClient]:
-    """Initialize Azure Blob Service Client"""
-    if not BlobServiceClient or not AZURE_CONNECTION_STRING:
-        return None
-    
-    try:
-        return BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-    except Exception as e:
-        logger.error(f"Failed to initialize Azure Blob client: {str(e)}")
-        return None
+async def run_gemini_call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking Gemini SDK call on the dedicated executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(gemini_executor, functools.partial(func, *args, **kwargs))
 
 
-async def upload_to_azure_blob(
-    file_path: str, 
-    blob_name: str, 
-    ctx: Context
-) -> AzureBlobUploadResponse:
-    """Upload a file to Azure Blob Storage"""
-    start_time = time.time()
-    upload_id = f"azure_{int(start_time)}"
-    
-    logger.info(f"[{upload_id}] Starting Azure Blob upload")
-    logger.info(f"[{upload_id}] File: {file_path}")
-    logger.info(f"[{upload_id}] Blob name: {blob_name}")
-    logger.info(f"[{upload_id}] Container: {AZURE_CONTAINER_NAME}")
-    
-    if not AZURE_UPLOAD_ENABLED:
-        logger.info(f"[{upload_id}] Azure upload is disabled")
-        await ctx.info("Azure upload is disabled")
-        return AzureBlobUploadResponse(
-            success=False,
-            error_message="Azure upload is disabled",
-            upload_time=0,
-            file_size=0
-        )
-    
-    if not BlobServiceClient:
-        await ctx.error("Azure Storage SDK not available. Install: pip install azure-storage-blob")
-        return AzureBlobUploadResponse(
-            success=False,
-            error_message="Azure Storage SDK not available",
-            upload_time=0,
-            file_size=0
+class ModelLatencyHistory:
+    """Rolling per-model record of how long Veo operations take to finish
+
+    Used to space out status checks (sparse early, dense around the expected
+    completion window) and to turn elapsed time into an ETA for progress.
+    """
+
+    MIN_SAMPLES = 5
+
+    def __init__(self, size: int, defaults: dict[str, float]):
+        self.size = max(1, size)
+        self.defaults = defaults
+        self._samples: dict[str, deque] = {}
+
+    def record(self, model: str, seconds: float) -> None:
+        """Record the observed submit-to-done latency of one operation"""
+        self._samples.setdefault(model, deque(maxlen=self.size)).append(seconds)
+
+    def samples(self, model: str) -> list[float]:
+        """Sorted latency samples, falling back to a spread around the model default"""
+        history = self._samples.get(model)
+        if history and len(history) >= self.MIN_SAMPLES:
+            return sorted(history)
+        default = self.defaults.get(model, 120.0)
+        return [default * factor for factor in (0.5, 0.75, 1.0, 1.25, 1.6)]
+
+    def percentile(self, model: str, q: float) -> float:
+        """Nearest-rank percentile (q in 0..1) of the model's latency"""
+        samples = self.samples(model)
+        index = min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))
+        return samples[index]
+
+    def eta(self, model: str, elapsed: float) -> float:
+        """Expected remaining seconds given that the operation is still running"""
+        remaining = [sample - elapsed for sample in self.samples(model) if sample > elapsed]
+        if not remaining:
+            # Running longer than anything seen so far; expect it shortly
+            return VEO_POLL_MIN_INTERVAL * 2
+        return remaining[len(remaining) // 2]
+
+    def progress_fraction(self, model: str, elapsed: float) -> float:
+        """Fraction of the expected total duration already spent"""
+        eta = self.eta(model, elapsed)
+        return elapsed / (elapsed + eta) if elapsed + eta > 0 else 0.0
+
+    def next_poll_delay(self, model: str, elapsed: float) -> float:
+        """Seconds until the next status check for an operation running for `elapsed` seconds"""
+        early = self.percentile(model, 0.1)
+        late = self.percentile(model, 0.9)
+        if elapsed < early:
+            # Nothing is likely to finish yet: aim roughly halfway to the early percentile
+            delay = (early - elapsed) / 2
+        elif elapsed <= late:
+            delay = VEO_POLL_MIN_INTERVAL
+        else:
+            # Past the usual window: back off gradually
+            delay = VEO_POLL_MIN_INTERVAL * (1 + 4 * (elapsed - late) / late)
+        return min(VEO_POLL_MAX_INTERVAL, max(VEO_POLL_MIN_INTERVAL, delay))
+
+    def stats(self) -> dict:
+        """Per-model latency summary for diagnostics"""
+        return {
+            model: {
+                "samples": len(history),
+                "p50": round(self.percentile(model, 0.5), 1),
+                "p90": round(self.percentile(model, 0.9), 1)
+            }
+            for model, history in self._samples.items()
+        }
+
+
+latency_history = ModelLatencyHistory(size=VEO_LATENCY_HISTORY_SIZE, defaults=DEFAULT_MODEL_LATENCY)
+
+
+class _PolledOperation:
+    """Bookkeeping for one operation owned by the poller"""
+
+    def __init__(
+        self,
+        operation: Any,
+        future: asyncio.Future,
+        interval: Optional[float],
+        model: Optional[str],
+    ):
+        self.operation = operation
+        self.future = future
+        self.interval = interval
+        self.model = model
+        self.started = time.monotonic()
+        self.next_check = 0.0
+        self.waiters = 0
+        self.checks = 0
+        self.errors = 0
+        # Last status RPC; its executor thread may outlive a check that timed out
+        self.rpc: Optional[concurrent.futures.Future] = None
+
+    def rpc_running(self) -> bool:
+        return self.rpc is not None and not self.rpc.done()
+
+
+class OperationPoller:
+    """Single background poller for every in-flight Veo operation
+
+    Tool calls register their operation with watch() and wait on the returned
+    future. Status checks are aligned to shared tick slots and run under a
+    global concurrency cap, so callers waiting on the same operation share one
+    check and the RPC rate no longer grows with the number of callers. Every
+    check is its own task with a deadline, so a hung status RPC only delays the
+    operation it belongs to. The deadline cannot stop the executor thread, so
+    an operation is not checked again until its previous RPC has returned: a
+    hung RPC holds at most one Gemini worker thread per operation.
+    """
+
+    def __init__(self, concurrency: int, tick: float, max_errors: int, rpc_timeout: float):
+        self.concurrency = max(1, concurrency)
+        self.tick = max(0.1, tick)
+        self.max_errors = max(1, max_errors)
+        self.rpc_timeout = max(1.0, rpc_timeout)
+        self._entries: dict[str, _PolledOperation] = {}
+        self._checks: dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        self.total_checks = 0
+
+    def _slot(self, when: float) -> float:
+        """Round a monotonic timestamp up to the next shared check slot"""
+        return math.ceil(when / self.tick) * self.tick
+
+    def watch(
+        self,
+        operation: Any,
+        interval: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> asyncio.Future:
+        """Start tracking an operation and return a future resolved with the finished operation
+
+        With a fixed interval the operation is checked every `interval` seconds;
+        otherwise checks are scheduled from the model's latency history.
+        """
+        entry = self._entries.get(operation.name)
+        if entry is None or entry.future.done():
+            future = asyncio.get_running_loop().create_future()
+            previous, entry = entry, _PolledOperation(operation, future, interval, model)
+            if previous is not None:
+                # A status RPC of the finished entry may still be hung
+                entry.rpc = previous.rpc
+            entry.next_check = self._slot(time.monotonic() + self._next_delay(entry))
+            self._entries[operation.name] = entry
+        elif interval is not None:
+            # Another caller already owns this operation; keep the tighter interval
+            entry.interval = interval if entry.interval is None else min(entry.interval, interval)
+        entry.waiters += 1
+        self._ensure_running()
+        return entry.future
+
+    def release(self, name: str) -> None:
+        """Drop one waiter; the operation is forgotten once nobody waits for it"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return
+        entry.waiters -= 1
+        if entry.waiters <= 0:
+            self._entries.pop(name, None)
+            if not entry.future.done():
+                entry.future.cancel()
+
+    def stats(self) -> dict:
+        """Current poller state for diagnostics"""
+        return {
+            "in_flight_operations": len(self._entries),
+            "waiting_calls": sum(entry.waiters for entry in self._entries.values()),
+            "checks_in_flight": len(self._checks),
+            "stuck_status_rpcs": sum(
+                1
+                for name, entry in self._entries.items()
+                if name not in self._checks and entry.rpc_running()
+            ),
+            "total_status_checks": self.total_checks
+        }
+
+    def _next_delay(self, entry: _PolledOperation) -> float:
+        if entry.interval is not None:
+            return entry.interval
+        return latency_history.next_poll_delay(entry.model or "", time.monotonic() - entry.started)
+
+    def _ensure_running(self) -> None:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._changed.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        changed = self._changed
+        assert changed is not None
+        while self._entries:
+            now = time.monotonic()
+            idle = [
+                entry
+                for name, entry in self._entries.items()
+                if name not in self._checks and not entry.rpc_running()
+            ]
+            for entry in idle:
+                if entry.next_check <= now:
+                    # Each check runs on its own so one slow status RPC cannot hold up the rest
+                    name = entry.operation.name
+                    task = asyncio.create_task(self._check(entry, semaphore))
+                    task.add_done_callback(functools.partial(self._check_done, name))
+                    self._checks[name] = task
+
+            waiting = [
+                entry.next_check for entry in idle if entry.operation.name not in self._checks
+            ]
+            changed.clear()
+            timeout = max(0.0, min(waiting) - now) if waiting else None
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    def _check_done(self, name: str, task: asyncio.Task) -> None:
+        self._checks.pop(name, None)
+        self._wake()
+
+    def _rpc_done(self, loop: asyncio.AbstractEventLoop, rpc: concurrent.futures.Future) -> None:
+        """Executor callback: a status RPC returned, possibly long after its check gave up"""
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass  # The event loop has already shut down
+
+    def _forget(self, entry: _PolledOperation) -> None:
+        """Stop polling an entry, unless a newer watch() already replaced it"""
+        if self._entries.get(entry.operation.name) is entry:
+            del self._entries[entry.operation.name]
+
+    async def _check(self, entry: _PolledOperation, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            # Submitted directly rather than through run_gemini_call, so the
+            # executor future stays visible after wait_for gives up on it
+            rpc = gemini_executor.submit(gemini_client.operations.get, entry.operation)
+            entry.rpc = rpc
+            rpc.add_done_callback(functools.partial(self._rpc_done, asyncio.get_running_loop()))
+            try:
+                operation = await asyncio.wait_for(
+                    asyncio.wrap_future(rpc), timeout=self.rpc_timeout
+                )
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = TimeoutError(f"Status check timed out after {self.rpc_timeout:g}s")
+                entry.errors += 1
+                logger.warning(
+                    f"Status check failed for {entry.operation.name} "
+                    f"({entry.errors}/{self.max_errors}): {str(e)}"
+                )
+                if entry.errors >= self.max_errors:
+                    self._forget(entry)
+                    if not entry.future.done():
+                        entry.future.set_exception(e)
+                else:
+                    entry.next_check = self._slot(
+                        time.monotonic() + self._next_delay(entry) * (2**entry.errors)
+                    )
+                return
+
+        self.total_checks += 1
+        entry.checks += 1
+        entry.errors = 0
+        entry.operation = operation
+        if operation.done:
+            self._forget(entry)
+            if not entry.future.done():
+                entry.future.set_result(operation)
+        else:
+            entry.next_check = self._slot(time.monotonic() + self._next_delay(entry))
+
+
+operation_poller = OperationPoller(
+    concurrency=VEO_POLL_CONCURRENCY,
+    tick=VEO_POLL_TICK,
+    max_errors=VEO_POLL_MAX_ERRORS,
+    rpc_timeout=VEO_POLL_RPC_TIMEOUT
+)
+
+
+class StateDatabase:
+    """Embedded SQLite database (WAL mode) holding the server's durable state
+
+    Opened lazily on first use; each store registers its own tables.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._schemas: list[str] = []
+        self._columns: list[tuple[str, str, str]] = []
+
+    def register_schema(self, schema: str) -> None:
+        """Add table definitions to create when the database is opened"""
+        self._schemas.append(schema)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.executescript(schema)
+
+    def register_column(self, table: str, column: str, definition: str) -> None:
+        """Add a column to an existing table, migrating databases created before it existed"""
+        self._columns.append((table, column, definition))
+        if self._conn is not None:
+            with self._lock:
+                self._add_column(self._conn, table, column, definition)
+
+    @staticmethod
+    def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for schema in self._schemas:
+                conn.executescript(schema)
+            for table, column, definition in self._columns:
+                self._add_column(conn, table, column, definition)
+            self._conn = conn
+        return self._conn
+
+    def execute(self, sql: str, params: tuple = ()) -> list[dict]:
+        """Run one statement and return any resulting rows as dicts"""
+        with self._lock:
+            cursor = self._connect().execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def execute_many(self, sql: str, rows: list[tuple]) -> None:
+        """Run one statement for every parameter row in a single transaction"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(sql, rows)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+state_db = StateDatabase(VEO_STATE_DB)
+
+
+class GenerationStore:
+    """Durable record of each generation request and the stage it reached
+
+    Stages: submitted -> polling -> downloaded -> uploaded (or completed when
+    Azure upload is disabled, upload_queued while the background upload queue
+    owns the upload, failed on error). Zero-disk streaming goes polling ->
+    uploading -> uploaded instead. Anything still submitted, polling, uploading
+    or downloaded after a restart is resumed rather than regenerated. Requests
+    coalesced onto an identical one stay in the following stage, pointing at
+    their leader, until they are given its outcome.
+    """
+
+    UNFINISHED_STAGES = ("submitted", "polling", "uploading", "downloaded")
+    FIELDS = (
+        "job_id", "operation_name", "model", "prompt", "image_path", "image_sha256", "stage",
+        "submitted_at", "video_path", "filename", "azure_blob_url", "error",
+        "number_of_videos", "video_paths", "azure_blob_urls", "leader_request_id"
+    )
+    OUTCOME_FIELDS = (
+        "stage", "video_path", "filename", "azure_blob_url", "error", "video_paths",
+        "azure_blob_urls"
+    )
+
+    def __init__(self, db: StateDatabase):
+        self.db = db
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS generations (
+                request_id TEXT PRIMARY KEY,
+                job_id TEXT,
+                operation_name TEXT,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                image_path TEXT,
+                image_sha256 TEXT,
+                stage TEXT NOT NULL,
+                submitted_at REAL,
+                video_path TEXT,
+                filename TEXT,
+                azure_blob_url TEXT,
+                error TEXT,
+                created TEXT NOT NULL,
+                updated TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_generations_stage ON generations (stage);
+            CREATE INDEX IF NOT EXISTS idx_generations_job ON generations (job_id);
+        """)
+        # Multi-candidate generations keep every path/URL as a JSON list
+        db.register_column("generations", "number_of_videos", "INTEGER NOT NULL DEFAULT 1")
+        db.register_column("generations", "video_paths", "TEXT")
+        db.register_column("generations", "azure_blob_urls", "TEXT")
+        db.register_column("generations", "leader_request_id", "TEXT")
+
+    def create(self, request_id: str, model: str, prompt: str, **fields: Any) -> None:
+        """Record a new request before it is submitted"""
+        now = datetime.now().isoformat()
+        try:
+            self.db.execute(
+                "INSERT INTO generations (request_id, job_id, model, prompt, image_path, "
+                "image_sha256, number_of_videos, leader_request_id, stage, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    request_id,
+                    fields.get("job_id"),
+                    model,
+                    prompt,
+                    fields.get("image_path"),
+                    fields.get("image_sha256"),
+                    fields.get("number_of_videos", 1),
+                    fields.get("leader_request_id"),
+                    "following" if fields.get("leader_request_id") else "pending",
+                    now,
+                    now,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[{request_id}] Failed to record generation state: {str(e)}")
+
+    def update(self, request_id: str, **fields: Any) -> None:
+        """Update stored fields of a request"""
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown generation fields: {sorted(unknown)}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            self.db.execute(
+                f"UPDATE generations SET {assignments}, updated = ? WHERE request_id = ?",
+                (*fields.values(), datetime.now().isoformat(), request_id)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[{request_id}] Failed to record generation state: {str(e)}")
+
+    def unfinished(self) -> list[dict]:
+        """Requests that were interrupted after submission"""
+        placeholders = ", ".join("?" for _ in self.UNFINISHED_STAGES)
+        return self.db.execute(
+            f"SELECT * FROM generations WHERE stage IN ({placeholders}) ORDER BY created",
+            self.UNFINISHED_STAGES
         )
-    
-    if not AZURE_CONNECTION_STRING:
-        await ctx.error("Azure connection string not configured")
-        return AzureBlobUploadResponse(
-            success=False,
-            error_message="Azure connection string not configured",
-            upload_time=0,
-            file_size=0
+
+    def following(self) -> list[dict]:
+        """Coalesced requests still waiting for their leader's outcome"""
+        return self.db.execute(
+            "SELECT * FROM generations WHERE stage = 'following' ORDER BY created"
         )
-    
-    try:
-        blob_service_client = get_azure_blob_client()
-        if not blob_service_client:
-            raise Exception("Failed to initialize Azure Blob client")
-        
-        # Create container if it doesn't exist
-        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+
+    def copy_outcome(self, request_id: str, leader_request_id: str) -> Optional[str]:
+        """Give a coalesced request the stored outcome of its leader
+
+        Returns:
+            Optional[str]: The stage copied, or None while the leader is unfinished
+        """
         try:
-            container_client.create_container()
-            await ctx.info(f"Created Azure container: {AZURE_CONTAINER_NAME}")
-        except Exception:
-            # Container already exists, which is fine
-            pass
-        
-        # Upload the file
-        await ctx.info(f"Uploading {blob_name} to Azure Blob Storage...")
-        
-        with open(file_path, "rb") as data:
-            blob_client = blob_service_client.get_blob_client(
-                container=AZURE_CONTAINER_NAME, 
-                blob=blob_name
+            rows = self.db.execute(
+                "SELECT * FROM generations WHERE request_id = ?", (leader_request_id,)
             )
-            blob_client.upload_blob(data, overwrite=True)
-        
-        # Get the blob URL
-        blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob_name}"
-        
-        file_size = os.path.getsize(file_path)
-        upload_time = time.time() - start_time
-        
-        logger.info(f"[{upload_id}] ✅ Azure upload completed successfully!")
-        logger.info(f"[{upload_id}] 🔗 Blob URL: {blob_url}")
-        logger.info(f"[{upload_id}] Upload time: {upload_time:.2f}s")
-        logger.info(f"[{upload_id}] File size: {file_size} bytes ({file_size/1024/1024:.1f} MB)")
-        logger.info(f"[{upload_id}] Upload speed: {(file_size/1024/1024)/upload_time:.1f} MB/s")
-        
-        await ctx.info(f"Successfully uploaded to Azure Blob: {blob_url}")
-        
-        return AzureBlobUploadResponse(
-            success=True,
-            blob_url=blob_url,
-            upload_time=upload_time,
-            file_size=file_size
-        )
-        
-    except Exception as e:
-        upload_time = time.time() - start_time
-        error_msg = f"Azure upload failed: {str(e)}"
-        
-        logger.error(f"[{upload_id}] ❌ Azure upload failed!")
-        logger.error(f"[{upload_id}] Error: {str(e)}")
-        logger.error(f"[{upload_id}] Exception type: {type(e).__name__}")
-        logger.error(f"[{upload_id}] Upload time before failure: {upload_time:.2f}s")
-        
-        await ctx.error(error_msg)
-        
-        return AzureBlobUploadResponse(
-            success=False,
-            error_message=error_msg,
-            upload_time=upload_time,
-            file_size=os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        except sqlite3.Error as e:
+            logger.warning(f"[{request_id}] Failed to read leader state: {str(e)}")
+            return None
+        leader = rows[0] if rows else None
+        if leader is None or leader["stage"] in (*self.UNFINISHED_STAGES, "pending", "following"):
+            return None
+        self.update(request_id, **{name: leader[name] for name in self.OUTCOME_FIELDS})
+        return cast(str, leader["stage"])
+
+    def find_job(self, job_id: str) -> Optional[dict]:
+        """Latest request recorded for a job id"""
+        rows = self.db.execute(
+            "SELECT * FROM generations WHERE job_id = ? ORDER BY created DESC LIMIT 1", (job_id,)
         )
+        return rows[0] if rows else None
 
 
-async def generate_video_with_progress(
-    prompt: str,
+generation_store = GenerationStore(state_db)
+
+
+def generation_cache_key(
     model: str,
-    ctx: Context,
-    image_path: Optional[str] = None,
-    poll_interval: int = 10,
-    max_poll_time: int = 2700  # Increased to 45 minutes (3x original)
-) -> dict:
-    """Generate a video using Veo 3 with progress tracking"""
-    
-    start_time = time.time()
-    request_id = f"veo3_{int(start_time)}"
-    
-    try:
-        # Log detailed request information
-        logger.info(f"[{request_id}] Starting video generation request")
-        logger.info(f"[{request_id}] Model: {model}")
-        logger.info(f"[{request_id}] Prompt: {prompt}")
-        logger.info(f"[{request_id}] Image path: {image_path if image_path else 'None'}")
-        logger.info(f"[{request_id}] Max poll time: {max_poll_time}s")
-        
-        await ctx.info(f"Starting video generation with model: {model}")
-        await ctx.info(f"Prompt: {prompt[:100]}...")
-        
-        # Start video generation - using official API format
-        await ctx.report_progress(progress=5, total=100)
-        
-        if image_path and os.path.exists(image_path):
-            await ctx.info(f"Processing image: {image_path}")
-            logger.info(f"[{request_id}] Processing image file: {image_path}")
-            
-            # Read image file as bytes
-            logger.info(f"[{request_id}] Reading image file as bytes")
-            with open(image_path, 'rb') as f:
-                image_bytes = f.read()
-            
-            # Get MIME type with better detection
-            mime_type, _ = mimetypes.guess_type(image_path)
-            
-            # If mimetypes fails, try to detect from file extension
-            if not mime_type:
-                ext = os.path.splitext(image_path)[1].lower()
-                mime_type_map = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif',
-                    '.webp': 'image/webp',
-                    '.bmp': 'image/bmp',
-                    '.tiff': 'image/tiff',
-                    '.tif': 'image/tiff'
-                }
-                mime_type = mime_type_map.get(ext, 'image/jpeg')
-            
-            # Ensure it's an image MIME type
-            if not mime_type.startswith('image/'):
-                mime_type = 'image/jpeg'  # Default fallback
-            
-            logger.info(f"[{request_id}] Image loaded successfully")
-            logger.info(f"[{request_id}] - MIME type: {mime_type}")
-            logger.info(f"[{request_id}] - File size: {len(image_bytes)} bytes")
-            
-            # Validate MIME type is supported
-            supported_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp']
-            if mime_type not in supported_types:
-                logger.warning(f"[{request_id}] Unusual MIME type: {mime_type}, using image/jpeg instead")
-                mime_type = 'image/jpeg'
-            
-            # Create image object using GenAI types
-            image_obj = genai_types.Image(image_bytes=image_bytes, mime_type=mime_type)
-            
-            # For image-to-video, we need to pass the image object
-            logger.info(f"[{request_id}] Calling Gemini API for image-to-video generation")
-            logger.info(f"[{request_id}] API Request - Model: {model}, Prompt: {prompt}")
-            
-            operation = gemini_client.models.generate_videos(
-                model=model,
-                prompt=prompt,
-                image=image_obj
-            )
-        else:
-            # For text-to-video, only model and prompt are needed
-            logger.info(f"[{request_id}] Calling Gemini API for text-to-video generation")
-            logger.info(f"[{request_id}] API Request - Model: {model}, Prompt: {prompt}")
-            operation = gemini_client.models.generate_videos(
-                model=model,
-                prompt=prompt
+    prompt: str,
+    image_sha256: Optional[str] = None,
+    number_of_videos: int = 1
+) -> str:
+    """Content address of a generation request
+
+    Covers the model, normalized prompt, input image and candidate count.
+    """
+    normalized_prompt = " ".join(unicodedata.normalize("NFC", prompt).split())
+    fields: list[Any] = [model, normalized_prompt, image_sha256 or ""]
+    if number_of_videos != 1:
+        # Single-video keys stay unchanged so existing cache entries remain valid
+        fields.append(number_of_videos)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationResultCache:
+    """Maps a generation cache key to the video that was already produced for it
+
+    Entries expire after a TTL and the least recently used ones are evicted
+    beyond VEO_CACHE_MAX_ENTRIES / VEO_CACHE_MAX_BYTES. Evicting an entry only
+    forgets it; the video files themselves are left alone.
+    """
+
+    def __init__(self, db: StateDatabase, ttl: float, max_entries: int, max_bytes: int):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                video_path TEXT,
+                filename TEXT,
+                azure_blob_url TEXT,
+                file_size INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_generation_cache_last_used
+                ON generation_cache (last_used);
+        """)
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        """Cached result for a key, or None if missing, expired or no longer reachable"""
+        try:
+            rows = self.db.execute(
+                "SELECT * FROM generation_cache WHERE cache_key = ?", (cache_key,)
+            )
+            entry = rows[0] if rows else None
+            now = time.time()
+            usable = (
+                entry is not None
+                and now - entry["created"] <= self.ttl
+                and (
+                    entry["azure_blob_url"]
+                    or (entry["video_path"] and os.path.exists(entry["video_path"]))
+                )
+            )
+            if not usable:
+                if entry is not None:
+                    self.db.execute(
+                        "DELETE FROM generation_cache WHERE cache_key = ?", (cache_key,)
+                    )
+                self.misses += 1
+                return None
+            self.db.execute(
+                "UPDATE generation_cache SET last_used = ? WHERE cache_key = ?", (now, cache_key)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Generation cache lookup failed: {str(e)}")
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, cache_key: str, result: dict) -> None:
+        """Remember the result of a finished generation"""
+        now = time.time()
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO generation_cache (cache_key, model, prompt, video_path, "
+                "filename, azure_blob_url, file_size, created, last_used) VALUES (?, ?, ?, ?, ?, "
+                "?, ?, ?, ?)",
+                (
+                    cache_key,
+                    result["model"],
+                    result["prompt"],
+                    result.get("video_path"),
+                    result.get("filename"),
+                    result.get("azure_blob_url"),
+                    result.get("file_size") or 0,
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to cache generation result: {str(e)}")
+
+    def _evict(self) -> None:
+        self.db.execute("DELETE FROM generation_cache WHERE created < ?", (time.time() - self.ttl,))
+        if self.max_entries > 0:
+            self.db.execute(
+                "DELETE FROM generation_cache WHERE cache_key NOT IN"
+                " (SELECT cache_key FROM generation_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes > 0:
+            # Keep the most recently used entries whose running total fits the size budget
+            self.db.execute(
+                "DELETE FROM generation_cache WHERE cache_key IN (SELECT cache_key FROM ("
+                " SELECT cache_key, SUM(file_size) OVER (ORDER BY last_used DESC, cache_key)"
+                " AS running_total FROM generation_cache) WHERE running_total > ?)",
+                (self.max_bytes,),
+            )
+
+    def stats(self) -> dict:
+        try:
+            rows = self.db.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(file_size), 0) AS bytes"
+                " FROM generation_cache"
+            )
+        except sqlite3.Error:
+            rows = [{"entries": None, "bytes": None}]
+        return {"enabled": VEO_CACHE_ENABLED, "hits": self.hits, "misses": self.misses, **rows[0]}
+
+
+result_cache = GenerationResultCache(
+    state_db,
+    ttl=VEO_CACHE_TTL,
+    max_entries=VEO_CACHE_MAX_ENTRIES,
+    max_bytes=VEO_CACHE_MAX_BYTES
+)
+
+
+def parse_model_limits(spec: str) -> dict[str, int]:
+    """Parse "model=N,model=N" into a per-model limit mapping"""
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Ignoring invalid model limit: {item.strip()}")
+    return limits
+
+
+def get_session_key(ctx: Context) -> str:
+    """Best-effort identifier of the MCP session behind a context"""
+    for attr in ("session_id", "client_id"):
+        try:
+            value = getattr(ctx, attr, None)
+        except Exception:
+            value = None
+        if value:
+            return str(value)
+    return "default"
+
+
+async def report_status(ctx: Context, progress: float, message: Optional[str] = None) -> None:
+    """Report progress, attaching a status message when the context supports it"""
+    if message is not None and "message" in inspect.signature(ctx.report_progress).parameters:
+        await ctx.report_progress(progress=progress, total=100, message=message)
+    else:
+        await ctx.report_progress(progress=progress, total=100)
+
+
+class _ModelQueue:
+    """Waiting and running generations for one model"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        # lane -> session -> waiting futures; session order is the round-robin order
+        self.lanes: dict[str, dict[str, deque]] = {lane: {} for lane in GenerationScheduler.LANES}
+
+
+class GenerationScheduler:
+    """Admission control in front of Veo generations
+
+    Each model has its own concurrency limit. A slot is held from submission
+    until the operation has finished, so the limit caps the generations in
+    flight per model. Waiting requests queue in an interactive and a batch
+    lane (interactive always goes first); within a lane, sessions take turns
+    so one client looping over generate_video cannot starve everyone else.
+    """
+
+    LANES = ("interactive", "batch")
+
+    def __init__(self, limits: dict[str, int], default_limit: int):
+        self.limits = limits
+        self.default_limit = max(1, default_limit)
+        self._queues: dict[str, _ModelQueue] = {}
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._queues:
+            self._queues[model] = _ModelQueue(self.limits.get(model, self.default_limit))
+        return self._queues[model]
+
+    def _order(self, queue: _ModelQueue) -> list[asyncio.Future]:
+        """Waiting futures in the order they will be admitted"""
+        order: list[asyncio.Future] = []
+        for lane in self.LANES:
+            sessions = [list(waiting) for waiting in queue.lanes[lane].values()]
+            for turn in range(max((len(waiting) for waiting in sessions), default=0)):
+                order.extend(waiting[turn] for waiting in sessions if turn < len(waiting))
+        return order
+
+    def _dispatch(self, queue: _ModelQueue) -> None:
+        while queue.active < queue.limit:
+            for lane in self.LANES:
+                sessions = queue.lanes[lane]
+                if sessions:
+                    session = next(iter(sessions))
+                    waiting = sessions.pop(session)
+                    future = waiting.popleft()
+                    if waiting:
+                        # Session goes to the back of the line for its next request
+                        sessions[session] = waiting
+                    break
+            else:
+                return
+            if not future.done():
+                queue.active += 1
+                future.set_result(True)
+
+    def _withdraw(
+        self, queue: _ModelQueue, lane: str, session: str, future: asyncio.Future
+    ) -> None:
+        waiting = queue.lanes[lane].get(session)
+        if waiting and future in waiting:
+            waiting.remove(future)
+            if not waiting:
+                del queue.lanes[lane][session]
+
+    def _release(self, queue: _ModelQueue) -> None:
+        queue.active -= 1
+        self._dispatch(queue)
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, ctx: Context, lane: str = "interactive"
+    ) -> AsyncIterator[None]:
+        """Hold one of the model's generation slots, reporting queue position while waiting"""
+        if lane not in self.LANES:
+            raise ValueError(f"Invalid priority: {lane}. Must be one of: {list(self.LANES)}")
+
+        queue = self._queue(model)
+        session = get_session_key(ctx)
+        future = asyncio.get_running_loop().create_future()
+        queue.lanes[lane].setdefault(session, deque()).append(future)
+        self._dispatch(queue)
+
+        queued_at = time.monotonic()
+        try:
+            while not future.done():
+                position = self._order(queue).index(future) + 1
+                waited = time.monotonic() - queued_at
+                message = f"Queued for {model} ({lane}): position {position}, waited {waited:.0f}s"
+                await report_status(ctx, progress=0, message=message)
+                await ctx.info(message)
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=VEO_PROGRESS_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release(queue)
+            else:
+                future.cancel()
+                self._withdraw(queue, lane, session, future)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(queue)
+
+    def stats(self) -> dict:
+        """Running and waiting generations per model"""
+        return {
+            model: {
+                "limit": queue.limit,
+                "active": queue.active,
+                "waiting": {
+                    lane: sum(len(waiting) for waiting in sessions.values())
+                    for lane, sessions in queue.lanes.items()
+                },
+            }
+            for model, queue in self._queues.items()
+        }
+
+
+generation_scheduler = GenerationScheduler(
+    limits=parse_model_limits(VEO_MODEL_CONCURRENCY),
+    default_limit=VEO_DEFAULT_MODEL_CONCURRENCY
+)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent Gemini submissions
+
+    The limit grows by roughly one slot per window of successful calls and is
+    cut multiplicatively on RESOURCE_EXHAUSTED (429) errors or when a call's
+    latency spikes well above its recent average, so throughput follows the
+    project's real quota without manual tuning.
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        initial_limit: int,
+        spike_factor: float,
+        decrease_factor: float = 0.5
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.spike_factor = spike_factor
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Hold one submission slot"""
+        cond = self._cond()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with cond:
+                self.in_flight -= 1
+                cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        """Additive increase, unless the call was a latency spike"""
+        if self.latency_ewma is not None and latency > self.latency_ewma * self.spike_factor:
+            logger.warning(
+                f"Gemini submission latency spike: {latency:.1f}s (average "
+                f"{self.latency_ewma:.1f}s)"
+            )
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.latency_ewma = (
+            latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        )
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease after a 429"""
+        self.throttled += 1
+        self._decrease()
+
+    def _decrease(self) -> None:
+        # A burst of failures from the same window only counts once
+        now = time.monotonic()
+        if now - self._last_decrease < max(1.0, self.latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        logger.info(f"Gemini submission limit reduced to {int(self.limit)}")
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency_ewma": round(self.latency_ewma, 2) if self.latency_ewma is not None else None,
+            "throttled": self.throttled
+        }
+
+
+submission_limiter = AdaptiveConcurrencyLimiter(
+    min_limit=VEO_SUBMIT_MIN_CONCURRENCY,
+    max_limit=VEO_SUBMIT_MAX_CONCURRENCY,
+    initial_limit=VEO_SUBMIT_INITIAL_CONCURRENCY,
+    spike_factor=VEO_SUBMIT_LATENCY_SPIKE_FACTOR
+)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether a Gemini error means the quota is exhausted"""
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Retry delay suggested by the server, from Retry-After or an RPC RetryInfo detail"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = headers.get("retry-after") or headers.get("Retry-After")
+        if retry_after:
+            return float(retry_after)
+    except (TypeError, ValueError):
+        pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details if isinstance(details, list) else []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+    return None
+
+
+async def submit_with_backoff(request_id: str, **kwargs: Any) -> Any:
+    """Call generate_videos under the adaptive limit, retrying 429s with jittered backoff"""
+    for attempt in range(VEO_SUBMIT_MAX_RETRIES + 1):
+        async with submission_limiter.acquire():
+            started = time.monotonic()
+            try:
+                operation = await run_gemini_call(gemini_client.models.generate_videos, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == VEO_SUBMIT_MAX_RETRIES:
+                    raise
+                submission_limiter.on_throttle()
+                error = e
+            else:
+                submission_limiter.on_success(time.monotonic() - started)
+                return operation
+
+        # Full jitter, but never earlier than the server asked for
+        delay = random.uniform(
+            0, min(VEO_SUBMIT_BACKOFF_MAX, VEO_SUBMIT_BACKOFF_BASE * (2**attempt))
+        )
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, 1))
+        logger.warning(
+            f"[{request_id}] Gemini quota exhausted, retry {attempt + 1}/{VEO_SUBMIT_MAX_RETRIES} "
+            f"in {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+
+
+class FanoutContext:
+    """Context that forwards messages and progress to every attached caller
+
+    Late joiners immediately get the most recent progress update.
+    """
+
+    def __init__(self, ctx: Context):
+        self.contexts = [ctx]
+        self.session = get_session_key(ctx)
+        self.last_progress: Optional[tuple[float, Optional[str]]] = None
+
+    @property
+    def session_id(self) -> str:
+        return self.session
+
+    def attach(self, ctx: Context) -> None:
+        self.contexts.append(ctx)
+
+    def detach(self, ctx: Context) -> None:
+        if ctx in self.contexts:
+            self.contexts.remove(ctx)
+
+    async def _forward(self, send: Callable[[Context], Any]) -> None:
+        for ctx in list(self.contexts):
+            try:
+                await send(ctx)
+            except Exception as e:
+                # A caller that went away must not break the shared generation
+                logger.debug(f"Dropping update for detached caller: {str(e)}")
+
+    async def info(self, message: str) -> None:
+        await self._forward(lambda ctx: ctx.info(message))
+
+    async def error(self, message: str) -> None:
+        await self._forward(lambda ctx: ctx.error(message))
+
+    async def report_progress(
+        self,
+        progress: float,
+        total: Optional[float] = 100,
+        message: Optional[str] = None
+    ) -> None:
+        percent = progress * 100 / total if total else progress
+        self.last_progress = (percent, message)
+        await self._forward(lambda ctx: report_status(ctx, progress=percent, message=message))
+
+
+class _Flight:
+    """One generation shared by identical concurrent requests"""
+
+    def __init__(self, ctx: FanoutContext, owner: Optional[str] = None):
+        self.ctx = ctx
+        self.owner = owner
+        self.task: Optional[asyncio.Task] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces identical in-flight generation requests
+
+    The first request for a key starts the generation in a detached task so it
+    keeps running for the followers (and still fills the cache) even if the
+    first caller goes away. Works without the persistent result cache.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    async def run(
+        self,
+        key: str,
+        ctx: Context,
+        factory: Callable[[Context], Any],
+        owner: Optional[str] = None,
+        on_join: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> tuple[dict, bool]:
+        """Run or join the generation for `key`
+
+        `owner` is the request id recorded for the generation if this caller
+        starts it; `on_join` is awaited if this caller joins one instead.
+
+        Returns:
+            tuple: (result, whether this caller started the generation)
+        """
+        existing = self._flights.get(key)
+        leader = existing is None
+        if existing is None:
+            flight = _Flight(FanoutContext(ctx), owner)
+            flight.task = asyncio.create_task(factory(cast(Context, flight.ctx)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+        else:
+            flight = existing
+            flight.ctx.attach(ctx)
+            flight.followers += 1
+            self.coalesced += 1
+            await ctx.info("Attached to an identical generation already in progress")
+            if flight.ctx.last_progress:
+                percent, message = flight.ctx.last_progress
+                await report_status(ctx, progress=percent, message=message)
+
+        assert flight.task is not None
+        try:
+            if not leader and on_join is not None:
+                await on_join()
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.ctx.detach(ctx)
+        return result, leader
+
+    def owner(self, key: str) -> Optional[str]:
+        """Request id of the generation in flight for `key`, if any"""
+        flight = self._flights.get(key)
+        return flight.owner if flight else None
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        assert flight.task is not None
+        if (
+            not flight.task.cancelled()
+            and flight.task.exception() is not None
+            and not flight.ctx.contexts
+        ):
+            logger.error(
+                f"Shared generation failed with no callers left: {str(flight.task.exception())}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "followers": sum(flight.followers for flight in self._flights.values()),
+            "coalesced_total": self.coalesced
+        }
+
+
+inflight_generations = SingleFlight()
+
+
+def read_file_bytes(path: str) -> bytes:
+    """Read a whole file into memory"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def resolve_image_path(image_path: str, ctx: Context) -> tuple[str, Optional[str]]:
+    """Resolve a local image path or download an image URL
+
+    Returns:
+        tuple: (path to use for generation, temporary file to clean up or None)
+    """
+    if is_url(image_path):
+        # Download image from URL to temporary file
+        temp_path = await download_image_from_url(image_path, ctx)
+        return temp_path, temp_path
+
+    # Handle local file path (allow relative paths within output directory for security)
+    if not os.path.isabs(image_path):
+        full_image_path = safe_join(OUTPUT_DIR, image_path)
+    else:
+        full_image_path = image_path
+
+    if not os.path.exists(full_image_path):
+        await ctx.error(f"Image file not found: {full_image_path}")
+        raise ValueError(f"Image file not found: {full_image_path}")
+
+    return full_image_path, None
+
+
+async def validate_model(model: str, ctx: Context) -> None:
+    """Reject models that Veo does not support"""
+    if model not in VALID_MODELS:
+        await ctx.error(f"Invalid model: {model}. Must be one of: {VALID_MODELS}")
+        raise ValueError(f"Invalid model: {model}")
+
+
+async def validate_number_of_videos(number_of_videos: int, ctx: Context) -> None:
+    """Reject candidate counts outside 1..VEO_MAX_CANDIDATES"""
+    if not 1 <= number_of_videos <= VEO_MAX_CANDIDATES:
+        await ctx.error(
+            f"Invalid number_of_videos: {number_of_videos}. Must be between 1 and "
+            f"{VEO_MAX_CANDIDATES}"
+        )
+        raise ValueError(f"Invalid number_of_videos: {number_of_videos}")
+
+
+def azure_block_id(index: int, upload_key: str = "") -> str:
+    """Base64 block id for the block at `index` (ids must share one length within a blob)
+
+    `upload_key` makes the ids deterministic per uploaded file and block size,
+    so a retried upload can recognize blocks it staged before.
+    """
+    return base64.b64encode(f"{upload_key or '0' * 24}-{index:08d}".encode()).decode()
+
+
+class UploadTuner:
+    """Learns the fastest block size / concurrency per Azure storage account
+
+    Every multi-block upload records its throughput for the settings it used.
+    Uploads normally use the best settings measured so far, and now and then
+    try a neighbouring setting (one step along either axis) so the choice
+    follows changes in bandwidth. AZURE_UPLOAD_BLOCK_SIZE and
+    AZURE_UPLOAD_CONCURRENCY pin their axis.
+    """
+
+    BLOCK_SIZES = tuple(size * 1024 * 1024 for size in (4, 8, 16, 32))
+    CONCURRENCIES = (2, 4, 8, 16)
+    DEFAULT = (8 * 1024 * 1024, 4)
+    SMOOTHING = 0.3  # Weight of the newest throughput sample
+
+    def __init__(self, db: StateDatabase, block_size: int, concurrency: int, explore_rate: float):
+        self.db = db
+        self.block_size = block_size
+        self.concurrency = concurrency
+        self.explore_rate = explore_rate if AZURE_UPLOAD_AUTOTUNE else 0.0
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS upload_tuning (
+                account TEXT NOT NULL,
+                block_size INTEGER NOT NULL,
+                concurrency INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                throughput REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (account, block_size, concurrency)
+            );
+        """)
+
+    def _pinned(self, block_size: int, concurrency: int) -> tuple[int, int]:
+        return (self.block_size or block_size, self.concurrency or concurrency)
+
+    def best(self, account: str) -> Optional[dict]:
+        """Fastest measured settings for an account that respect the pinned values"""
+        try:
+            rows = self.db.execute(
+                "SELECT block_size, concurrency, samples, throughput FROM upload_tuning"
+                " WHERE account = ? AND (? = 0 OR block_size = ?) AND (? = 0 OR concurrency = ?)"
+                " ORDER BY throughput DESC LIMIT 1",
+                (account, self.block_size, self.block_size, self.concurrency, self.concurrency)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read upload tuning: {str(e)}")
+            return None
+        return rows[0] if rows else None
+
+    def choose(self, account: str) -> tuple[int, int]:
+        """Block size and concurrency to use for the next upload to `account`"""
+        best = self.best(account) if AZURE_UPLOAD_AUTOTUNE else None
+        block_size, concurrency = (
+            (best["block_size"], best["concurrency"]) if best else self.DEFAULT
+        )
+
+        if best and random.random() < self.explore_rate:
+            neighbours = []
+            if not self.block_size:
+                neighbours += [
+                    (size, concurrency) for size in self._adjacent(self.BLOCK_SIZES, block_size)
+                ]
+            if not self.concurrency:
+                neighbours += [
+                    (block_size, limit) for limit in self._adjacent(self.CONCURRENCIES, concurrency)
+                ]
+            if neighbours:
+                block_size, concurrency = random.choice(neighbours)
+
+        return self._pinned(block_size, concurrency)
+
+    @staticmethod
+    def _adjacent(values: tuple[int, ...], value: int) -> list[int]:
+        if value not in values:
+            return [min(values, key=lambda candidate: abs(candidate - value))]
+        index = values.index(value)
+        return [values[i] for i in (index - 1, index + 1) if 0 <= i < len(values)]
+
+    def record(
+        self, account: str, block_size: int, concurrency: int, size: int, seconds: float
+    ) -> None:
+        """Fold the throughput of a finished upload into the settings' running average"""
+        if not AZURE_UPLOAD_AUTOTUNE or seconds <= 0:
+            return
+        throughput = size / seconds
+        try:
+            self.db.execute(
+                "INSERT INTO upload_tuning (account, block_size, concurrency, samples, throughput, "
+                "updated) VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT (account, block_size, concurrency) "
+                "DO UPDATE SET samples = samples + 1, throughput = throughput * ? + "
+                "excluded.throughput * ?, updated = excluded.updated",
+                (
+                    account,
+                    block_size,
+                    concurrency,
+                    throughput,
+                    time.time(),
+                    1 - self.SMOOTHING,
+                    self.SMOOTHING,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record upload tuning: {str(e)}")
+
+    def stats(self) -> dict:
+        try:
+            rows = self.db.execute(
+                "SELECT account, block_size, concurrency, samples, ROUND(throughput / 1048576, 1) "
+                "AS mb_per_s FROM upload_tuning ORDER BY account, throughput DESC"
+            )
+        except sqlite3.Error:
+            rows = []
+        best: dict[str, dict] = {}
+        for row in rows:
+            best.setdefault(row.pop("account"), row)
+        return {"autotune": AZURE_UPLOAD_AUTOTUNE, "best_by_account": best}
+
+
+upload_tuner = UploadTuner(
+    state_db,
+    block_size=AZURE_UPLOAD_BLOCK_SIZE,
+    concurrency=AZURE_UPLOAD_CONCURRENCY,
+    explore_rate=AZURE_UPLOAD_EXPLORE_RATE
+)
+
+
+class _TokenBucket:
+    """Byte budget refilled at `rate` per second, holding at most one second's worth
+
+    A request larger than the bucket is let through once the bucket is full
+    and leaves it in debt, so blocks of any size can pass.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = max(0.0, rate)
+        self.capacity = self.rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, nbytes: int) -> float:
+        """Seconds until `nbytes` may be sent (0 when unlimited)"""
+        if not self.rate:
+            return 0.0
+        needed = min(nbytes, self.capacity)
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+    def consume(self, nbytes: int) -> None:
+        if self.rate:
+            self.tokens -= nbytes
+
+
+class UploadBandwidthShaper:
+    """Process-wide token-bucket limits on Azure upload bandwidth
+
+    All uploads share AZURE_UPLOAD_MAX_RATE, and each lane can be capped on
+    its own. While an interactive upload (from a generation) waits for
+    bandwidth, bulk uploads (from tools) hold back, except for
+    AZURE_UPLOAD_BULK_MIN_SHARE of the shared rate so they never stall
+    completely. Bytes are granted per staged block, so the rate is shaped
+    at block granularity.
+    """
+
+    LANES = ("interactive", "bulk")
+    RATE_WINDOW = 10.0  # Seconds over which achieved rates are measured
+
+    def __init__(self, max_rate: float, lane_rates: dict[str, float], bulk_min_share: float):
+        self.total = _TokenBucket(max_rate)
+        self.lanes = {lane: _TokenBucket(lane_rates.get(lane, 0.0)) for lane in self.LANES}
+        self.bulk_min_share = min(1.0, max(0.0, bulk_min_share))
+        self.waiting = {lane: 0 for lane in self.LANES}
+        self.sent = {lane: 0 for lane in self.LANES}
+        self.waited = {lane: 0.0 for lane in self.LANES}
+        self._recent: dict[str, deque] = {lane: deque() for lane in self.LANES}
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.total.rate or any(bucket.rate for bucket in self.lanes.values()))
+
+    def achieved_rate(self, lane: str) -> float:
+        """Bytes per second granted to a lane over the last RATE_WINDOW seconds"""
+        recent = self._recent[lane]
+        cutoff = time.monotonic() - self.RATE_WINDOW
+        while recent and recent[0][0] < cutoff:
+            recent.popleft()
+        return float(sum(nbytes for _, nbytes in recent) / self.RATE_WINDOW)
+
+    def _yield_to_interactive(self, lane: str) -> bool:
+        if lane != "bulk" or not self.waiting["interactive"] or not self.total.rate:
+            return False
+        return self.achieved_rate("bulk") >= self.total.rate * self.bulk_min_share
+
+    async def acquire(self, nbytes: int, lane: str = "interactive") -> float:
+        """Wait until `nbytes` may be uploaded in `lane`; returns the seconds waited"""
+        if lane not in self.LANES:
+            raise ValueError(f"Invalid upload lane: {lane}. Must be one of: {list(self.LANES)}")
+        if not self.enabled:
+            self._record(lane, nbytes)
+            return 0.0
+
+        cond = self._cond()
+        started = time.monotonic()
+        self.waiting[lane] += 1
+        try:
+            async with cond:
+                while True:
+                    now = time.monotonic()
+                    self.total.refill(now)
+                    self.lanes[lane].refill(now)
+                    if self._yield_to_interactive(lane):
+                        delay = 1.0
+                    else:
+                        delay = max(self.total.delay(nbytes), self.lanes[lane].delay(nbytes))
+                        if delay <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                self.total.consume(nbytes)
+                self.lanes[lane].consume(nbytes)
+                # Bulk uploads re-check whether interactive ones are still waiting
+                cond.notify_all()
+        finally:
+            self.waiting[lane] -= 1
+        waited = time.monotonic() - started
+        self.waited[lane] += waited
+        self._record(lane, nbytes)
+        return waited
+
+    def _record(self, lane: str, nbytes: int) -> None:
+        self.sent[lane] += nbytes
+        self._recent[lane].append((time.monotonic(), nbytes))
+
+    def stats(self) -> dict:
+        return {
+            "max_rate": self.total.rate or None,
+            "bulk_min_share": self.bulk_min_share,
+            "lanes": {
+                lane: {
+                    "rate_limit": self.lanes[lane].rate or None,
+                    "achieved_mb_per_s": round(self.achieved_rate(lane) / 1048576, 2),
+                    "sent_mb": round(self.sent[lane] / 1048576, 1),
+                    "waited_seconds": round(self.waited[lane], 1),
+                    "waiting": self.waiting[lane]
+                }
+                for lane in self.LANES
+            }
+        }
+
+
+upload_bandwidth = UploadBandwidthShaper(
+    max_rate=AZURE_UPLOAD_MAX_RATE,
+    lane_rates={"interactive": AZURE_UPLOAD_INTERACTIVE_RATE, "bulk": AZURE_UPLOAD_BULK_RATE},
+    bulk_min_share=AZURE_UPLOAD_BULK_MIN_SHARE
+)
+
+
+class UploadCheckpointStore:
+    """Block-level checkpoints of block blob uploads that have not been committed yet
+
+    Each staged block is recorded with its id, offset, length and MD5. A retry
+    of the same file to the same blob asks Azure which of those blocks are
+    still uncommitted and stages only the rest. Azure discards uncommitted
+    blocks after a week, so older checkpoints are dropped.
+    """
+
+    RETENTION = 7 * 24 * 3600
+
+    def __init__(self, db: StateDatabase):
+        self.db = db
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS upload_checkpoints (
+                container TEXT NOT NULL,
+                blob_name TEXT NOT NULL,
+                upload_key TEXT NOT NULL,
+                block_size INTEGER NOT NULL,
+                block_index INTEGER NOT NULL,
+                block_id TEXT NOT NULL,
+                block_offset INTEGER NOT NULL,
+                block_length INTEGER NOT NULL,
+                block_md5 TEXT NOT NULL,
+                staged_at REAL NOT NULL,
+                PRIMARY KEY (container, blob_name, upload_key, block_index)
+            );
+        """)
+
+    @staticmethod
+    def file_key(file_path: str, file_size: int) -> str:
+        """Identity of the file contents being uploaded (path, size, modification time)"""
+        mtime = os.stat(file_path).st_mtime_ns
+        return hashlib.sha256(
+            f"{os.path.abspath(file_path)}|{file_size}|{mtime}".encode()
+        ).hexdigest()[:16]
+
+    def pending(self, container: str, blob_name: str, file_key: str) -> Optional[dict]:
+        """Block size and checkpointed blocks of an unfinished upload of this file, if any"""
+        try:
+            self.db.execute(
+                "DELETE FROM upload_checkpoints WHERE staged_at < ? OR"
+                " (container = ? AND blob_name = ? AND upload_key NOT LIKE ?)",
+                (time.time() - self.RETENTION, container, blob_name, f"{file_key}%")
+            )
+            rows = self.db.execute(
+                "SELECT upload_key, block_size, block_index, block_id, block_length FROM "
+                "upload_checkpoints WHERE container = ? AND blob_name = ? ORDER BY staged_at DESC",
+                (container, blob_name),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read upload checkpoints for {blob_name}: {str(e)}")
+            return None
+        if not rows:
+            return None
+        upload_key = rows[0]["upload_key"]
+        blocks = {
+            row["block_index"]: (row["block_id"], row["block_length"])
+            for row in rows if row["upload_key"] == upload_key
+        }
+        return {"upload_key": upload_key, "block_size": rows[0]["block_size"], "blocks": blocks}
+
+    def record(
+        self,
+        container: str,
+        blob_name: str,
+        upload_key: str,
+        block_size: int,
+        block_index: int,
+        block_id: str,
+        block_length: int,
+        block_md5: str
+    ) -> None:
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO upload_checkpoints (container, blob_name, upload_key, "
+                "block_size, block_index, block_id, block_offset, block_length, block_md5, "
+                "staged_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    container,
+                    blob_name,
+                    upload_key,
+                    block_size,
+                    block_index,
+                    block_id,
+                    block_index * block_size,
+                    block_length,
+                    block_md5,
+                    time.time(),
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to checkpoint block {block_index} of {blob_name}: {str(e)}")
+
+    def clear(self, container: str, blob_name: str) -> None:
+        """Forget the checkpoints of a committed blob"""
+        try:
+            self.db.execute(
+                "DELETE FROM upload_checkpoints WHERE container = ? AND blob_name = ?",
+                (container, blob_name)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to clear upload checkpoints for {blob_name}: {str(e)}")
+
+
+upload_checkpoints = UploadCheckpointStore(state_db)
+
+
+class ContentHasher:
+    """MD5, SHA-256 and CRC64 of a byte stream, all updated in the same pass
+
+    CRC64 (Azure's polynomial) needs the optional azure-storage-extensions
+    package and is skipped without it. That package only accepts bytes, so
+    memoryviews (mapped file blocks) are fed to it in small copied chunks.
+    """
+
+    CRC64_CHUNK = 1024 * 1024
+
+    def __init__(self) -> None:
+        self.md5 = hashlib.md5(usedforsecurity=False)
+        self.sha256 = hashlib.sha256()
+        self.crc64 = 0 if crc64 else None
+
+    def update(self, data: bytes | memoryview) -> None:
+        self.md5.update(data)
+        self.sha256.update(data)
+        if self.crc64 is not None and crc64 is not None:
+            if isinstance(data, bytes):
+                self.crc64 = crc64.compute(data, self.crc64)
+            else:
+                for offset in range(0, len(data), self.CRC64_CHUNK):
+                    chunk = bytes(data[offset:offset + self.CRC64_CHUNK])
+                    self.crc64 = crc64.compute(chunk, self.crc64)
+
+    @property
+    def content_md5(self) -> str:
+        """Base64 MD5, the form Azure reports as Content-MD5"""
+        return base64.b64encode(self.md5.digest()).decode()
+
+    @property
+    def content_crc64(self) -> Optional[str]:
+        return f"{self.crc64:016x}" if self.crc64 is not None else None
+
+    @property
+    def content_sha256(self) -> str:
+        return self.sha256.hexdigest()
+
+    def content_settings(self) -> Any:
+        return ContentSettings(content_md5=bytearray(self.md5.digest()))
+
+    def metadata(self) -> dict[str, str]:
+        """Blob metadata carrying the hashes that Azure does not store natively"""
+        metadata = {"content_sha256": self.content_sha256}
+        if self.content_crc64:
+            metadata["content_crc64"] = self.content_crc64
+        return metadata
+
+    def tags(self) -> Optional[dict[str, str]]:
+        """Blob index tags to find duplicates by (AZURE_UPLOAD_DEDUP_TAGS)"""
+        return content_tags(self.content_sha256)
+
+
+def content_tags(content_sha256: str) -> Optional[dict[str, str]]:
+    """Blob index tags for a blob with this content, None unless AZURE_UPLOAD_DEDUP_TAGS"""
+    return {"content_sha256": content_sha256} if AZURE_UPLOAD_DEDUP_TAGS else None
+
+
+def read_file_block(
+    path: str, offset: int, length: int, hasher: Optional[ContentHasher] = None
+) -> bytes:
+    """Read `length` bytes of a file starting at `offset`, feeding them to `hasher` if given"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    if hasher:
+        hasher.update(data)
+    return data
+
+
+def map_file(path: str) -> Optional[memoryview]:
+    """Read-only memory map of a whole file, as a memoryview to slice blocks from
+
+    Slices share the mapping instead of copying; close_mapped_file unmaps
+    it again. Returns None for empty files, which cannot be mapped.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return memoryview(mapped)
+
+
+def close_mapped_file(view: memoryview) -> None:
+    """Release a view from map_file and unmap the file
+
+    A block still referenced elsewhere keeps the mapping alive; it is then
+    unmapped when that block is garbage collected.
+    """
+    mapped = cast(mmap.mmap, view.obj)
+    view.release()
+    try:
+        mapped.close()
+    except BufferError:
+        pass
+
+
+def release_mapped_block(view: memoryview, offset: int, length: int) -> None:
+    """Drop the pages of a finished block from this process's resident set
+
+    The file stays mapped; touching the range again (e.g. an SDK retry)
+    simply faults the pages back in from the page cache.
+    """
+    if not hasattr(mmap, "MADV_DONTNEED") or offset % mmap.PAGESIZE:
+        return
+    try:
+        cast(mmap.mmap, view.obj).madvise(mmap.MADV_DONTNEED, offset, length)
+    except (OSError, ValueError):
+        pass
+
+
+def block_md5(block: bytes | memoryview) -> bytes:
+    return hashlib.md5(block, usedforsecurity=False).digest()
+
+
+def block_crc64(block: bytes | memoryview) -> Optional[bytes]:
+    """CRC64 of one block as sent in x-ms-content-crc64, None without azure-storage-extensions"""
+    if crc64 is None:
+        return None
+    value = 0
+    for offset in range(0, len(block), ContentHasher.CRC64_CHUNK):
+        value = crc64.compute(bytes(block[offset:offset + ContentHasher.CRC64_CHUNK]), value)
+    return value.to_bytes(8, "little")
+
+
+def transactional_checksum(
+    block: bytes | memoryview, md5: Optional[bytes] = None
+) -> dict[str, bytes]:
+    """stage_block/upload_blob arguments that make Azure verify one request's body
+
+    CRC64 when azure-storage-extensions is installed, MD5 otherwise (`md5`
+    if already computed); Azure rejects a request that carries both. Empty
+    with AZURE_UPLOAD_VALIDATE_CONTENT off. Checksums are passed precomputed
+    instead of through the SDK's validate_content, which cannot hash
+    memoryviews. Hashes the block, so call it from a worker thread.
+    """
+    if not AZURE_UPLOAD_VALIDATE_CONTENT:
+        return {}
+    crc = block_crc64(block)
+    if crc is not None:
+        return {"transactional_content_crc64": crc}
+    return {"transactional_content_md5": md5 or block_md5(block)}
+
+
+async def staged_block_sizes(blob_client: Any) -> dict[str, int]:
+    """Uncommitted blocks Azure currently holds for a blob, by block id"""
+    try:
+        _, uncommitted = await blob_client.get_block_list("uncommitted")
+    except ResourceNotFoundError:
+        return {}
+    return {block.id: block.size for block in uncommitted}
+
+
+async def upload_file_in_blocks(
+    blob_client: Any,
+    blob_name: str,
+    file_path: str,
+    file_size: int,
+    block_size: int,
+    concurrency: int,
+    lane: str = "interactive"
+) -> dict:
+    """Upload a file as block blob, staging up to `concurrency` blocks at once
+
+    Blocks are read (and hashed) in order in one pass while earlier blocks
+    are still uploading. With AZURE_UPLOAD_MMAP the file is memory-mapped and
+    each block is staged as a memoryview slice of the mapping, so no per-block
+    bytes are allocated and staged pages are released again. The MD5 becomes
+    the blob's Content-MD5 and the other hashes are written as blob metadata;
+    every request carries its own CRC64 (or MD5) for Azure to verify.
+    Every request first takes its bytes from the bandwidth shaper's `lane`.
+    Every staged block is checkpointed; if an earlier attempt for the same
+    file was interrupted, its block size is reused and blocks Azure still
+    holds uncommitted are not sent again.
+
+    Returns:
+        dict: blocks (count), block_size, resumed_blocks, uploaded_bytes,
+        shaped_seconds (time spent waiting for bandwidth), properties (etag
+        and last_modified from Azure) and hasher (hashes of the whole file)
+    """
+    hasher = ContentHasher()
+
+    file_key = UploadCheckpointStore.file_key(file_path, file_size)
+    checkpoint = await asyncio.to_thread(
+        upload_checkpoints.pending, AZURE_CONTAINER_NAME, blob_name, file_key
+    )
+    if checkpoint:
+        block_size = checkpoint["block_size"]
+
+    if file_size <= block_size:
+        # One request is enough; staging would only add a commit round trip
+        data = await asyncio.to_thread(read_file_block, file_path, 0, file_size, hasher)
+        shaped_seconds = await upload_bandwidth.acquire(len(data), lane)
+        checksum = await asyncio.to_thread(transactional_checksum, data, hasher.md5.digest())
+        properties = await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            validate_content=False,
+            **checksum,
+            content_settings=hasher.content_settings(),
+            metadata=hasher.metadata(),
+            tags=hasher.tags()
+        )
+        return {
+            "blocks": 1,
+            "block_size": block_size,
+            "resumed_blocks": 0,
+            "uploaded_bytes": file_size,
+            "shaped_seconds": shaped_seconds,
+            "properties": properties,
+            "hasher": hasher
+        }
+
+    upload_key = checkpoint["upload_key"] if checkpoint else f"{file_key}{block_size:08x}"
+    block_count = math.ceil(file_size / block_size)
+    block_ids = [azure_block_id(index, upload_key) for index in range(block_count)]
+
+    # Blocks checkpointed by an earlier attempt that Azure still holds with the right size
+    already_staged = set()
+    if checkpoint:
+        staged = await staged_block_sizes(blob_client)
+        already_staged = {
+            index
+            for index, (block_id, length) in checkpoint["blocks"].items()
+            if index < block_count
+            and block_id == block_ids[index]
+            and staged.get(block_id) == length
+        }
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: list[asyncio.Task] = []
+    uploaded_bytes = 0
+    shaped_seconds = 0.0
+    view = await asyncio.to_thread(map_file, file_path) if AZURE_UPLOAD_MMAP else None
+
+    async def read_block(index: int) -> bytes | memoryview:
+        offset = index * block_size
+        if view is None:
+            return await asyncio.to_thread(read_file_block, file_path, offset, block_size, hasher)
+        block = view[offset:offset + block_size]
+        await asyncio.to_thread(hasher.update, block)
+        return block
+
+    async def stage(index: int, block: bytes | memoryview) -> None:
+        nonlocal shaped_seconds
+        try:
+            digest = await asyncio.to_thread(block_md5, block)
+            checksum = await asyncio.to_thread(transactional_checksum, block, digest)
+            shaped_seconds += await upload_bandwidth.acquire(len(block), lane)
+            await blob_client.stage_block(
+                block_ids[index],
+                block,
+                length=len(block),
+                validate_content=False,
+                **checksum
+            )
+            # Checkpoint writes wait on SQLite, so they run in a worker thread
+            await asyncio.to_thread(
+                upload_checkpoints.record,
+                AZURE_CONTAINER_NAME,
+                blob_name,
+                upload_key,
+                block_size,
+                index,
+                block_ids[index],
+                len(block),
+                base64.b64encode(digest).decode(),
+            )
+            if view is not None:
+                release_mapped_block(view, index * block_size, len(block))
+        finally:
+            if isinstance(block, memoryview):
+                block.release()
+            semaphore.release()
+
+    try:
+        for index in range(block_count):
+            # Wait for a free upload slot before reading,
+            # so at most `concurrency` blocks sit in memory
+            await semaphore.acquire()
+            for task in tasks:
+                error = task.exception() if task.done() and not task.cancelled() else None
+                if error:
+                    raise error
+            block = await read_block(index)
+            if index in already_staged:
+                # Still read for the whole-file hashes, but not sent again
+                if view is not None and isinstance(block, memoryview):
+                    release_mapped_block(view, index * block_size, len(block))
+                    block.release()
+                semaphore.release()
+                continue
+            uploaded_bytes += len(block)
+            tasks.append(asyncio.create_task(stage(index, block)))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Let the cancelled stages drop their blocks before the file is unmapped
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        if view is not None:
+            close_mapped_file(view)
+
+    properties = await blob_client.commit_block_list(
+        [BlobBlock(block_id=block_id) for block_id in block_ids],
+        content_settings=hasher.content_settings(),
+        metadata=hasher.metadata(),
+        tags=hasher.tags()
+    )
+    await asyncio.to_thread(upload_checkpoints.clear, AZURE_CONTAINER_NAME, blob_name)
+    return {
+        "blocks": block_count,
+        "block_size": block_size,
+        "resumed_blocks": len(already_staged),
+        "uploaded_bytes": uploaded_bytes,
+        "shaped_seconds": shaped_seconds,
+        "properties": properties,
+        "hasher": hasher
+    }
+
+
+_azure_blob_client: Optional[Any] = None
+_azure_container_ready = False
+_azure_container_lock: Optional[asyncio.Lock] = None
+
+
+def get_azure_blob_client() -> Optional[Any]:
+    """Return the shared async Azure Blob Service Client, creating it on first use
+    
+    One client (and so one HTTP connection pool) serves every upload, list and
+    delete for the lifetime of the server.
+    """
+    global _azure_blob_client
+    if AsyncBlobServiceClient is None or not AZURE_CONNECTION_STRING:
+        return None
+
+    if _azure_blob_client is None:
+        try:
+            _azure_blob_client = AsyncBlobServiceClient.from_connection_string(
+                AZURE_CONNECTION_STRING
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize Azure Blob client: {str(e)}")
+            return None
+    return _azure_blob_client
+
+
+async def close_azure_blob_client() -> None:
+    """Close the shared Azure client and its connection pool"""
+    global _azure_blob_client, _azure_container_ready
+    if _azure_blob_client is not None:
+        client, _azure_blob_client = _azure_blob_client, None
+        _azure_container_ready = False
+        await client.close()
+
+
+async def ensure_azure_container(blob_service_client: Any, ctx: Optional[Context] = None) -> None:
+    """Create the video container on first use and remember that it exists"""
+    global _azure_container_ready, _azure_container_lock
+    if _azure_container_lock is None:
+        _azure_container_lock = asyncio.Lock()
+
+    async with _azure_container_lock:
+        if _azure_container_ready:
+            return
+        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+        try:
+            await container_client.create_container()
+            logger.info(f"Created Azure container: {AZURE_CONTAINER_NAME}")
+            if ctx:
+                await ctx.info(f"Created Azure container: {AZURE_CONTAINER_NAME}")
+        except ResourceExistsError:
+            # Container already exists, which is fine
+            pass
+        except Exception as e:
+            # Credentials may lack create rights on an existing container; uploads will tell
+            logger.warning(f"Could not create Azure container {AZURE_CONTAINER_NAME}: {str(e)}")
+        _azure_container_ready = True
+
+
+def forget_azure_container() -> None:
+    """Check the container again on the next upload (e.g. after it was deleted)"""
+    global _azure_container_ready
+    _azure_container_ready = False
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a whole file, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+DEDUP_MAX_CANDIDATES = 4  # Index matches confirmed with a HEAD request per upload
+
+
+async def find_duplicate_blob(
+    container_client: Any, blob_name: str, content_sha256: str, size: int
+) -> Optional[Any]:
+    """Properties of a blob in the container that already holds exactly this content
+
+    Candidates are the target name itself, then blobs the blob inventory (or,
+    without one, blob index tags) lists under the same SHA-256. Index entries
+    can be stale, so each candidate is confirmed with a HEAD request against
+    its size and content_sha256 metadata.
+    """
+    candidates = [blob_name]
+    if blob_inventory.ready:
+        candidates += await asyncio.to_thread(
+            blob_inventory.find_content, content_sha256, size, DEDUP_MAX_CANDIDATES
+        )
+    elif AZURE_UPLOAD_DEDUP_TAGS:
+        async for blob in container_client.find_blobs_by_tags(
+            f"\"content_sha256\" = '{content_sha256}'"
+        ):
+            candidates.append(blob.name)
+            if len(candidates) > DEDUP_MAX_CANDIDATES:
+                break
+
+    for name in dict.fromkeys(candidates):
+        try:
+            properties = await container_client.get_blob_client(name).get_blob_properties()
+        except ResourceNotFoundError:
+            continue
+        if (
+            properties.size == size
+            and (properties.metadata or {}).get("content_sha256") == content_sha256
+        ):
+            return properties
+    return None
+
+
+async def copy_blob_in_container(container_client: Any, source: Any, blob_name: str) -> dict:
+    """Server-side copy of a blob in the video container; no data passes through this server
+
+    `source` is the source blob's properties. Copies within one account
+    normally complete at once; a pending copy is polled for up to a minute
+    and aborted after that.
+
+    Returns:
+        dict: etag and last_modified of the copy
+    """
+    target = container_client.get_blob_client(blob_name)
+    copy = await target.start_copy_from_url(
+        container_client.get_blob_client(source.name).url,
+        tags=content_tags(source.metadata["content_sha256"])
+    )
+    status = copy.get("copy_status")
+    deadline = time.time() + 60
+    while status == "pending":
+        if time.time() > deadline:
+            await target.abort_copy(copy["copy_id"])
+            raise TimeoutError(f"Copy of {source.name} to {blob_name} did not finish within 60s")
+        await asyncio.sleep(1)
+        properties = await target.get_blob_properties()
+        status = properties.copy.status
+        copy = {"etag": properties.etag, "last_modified": properties.last_modified}
+    if status != "success":
+        raise RuntimeError(f"Copy of {source.name} to {blob_name} ended with status {status}")
+    return dict(copy)
+
+
+async def reuse_duplicate_blob(
+    blob_service_client: Any,
+    file_path: str,
+    blob_name: str,
+    file_size: int,
+    mode: str
+) -> Optional[tuple[str, Any]]:
+    """Serve an upload from a blob that already holds the same bytes, if there is one
+
+    The file is hashed before anything is sent. If blob_name already holds
+    it, nothing is written. Otherwise mode "reuse" answers with the existing
+    blob and "copy" creates blob_name as a server-side copy of it.
+
+    Returns:
+        tuple: (name of the blob serving the upload, properties of the existing
+        blob), or None when the file has to be uploaded
+    """
+    content_sha256 = await asyncio.to_thread(file_sha256, file_path)
+    container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+    existing = await find_duplicate_blob(container_client, blob_name, content_sha256, file_size)
+    if not existing:
+        return None
+    if existing.name == blob_name or mode == "reuse":
+        return existing.name, existing
+    try:
+        copy = await copy_blob_in_container(container_client, existing, blob_name)
+    except Exception as e:
+        logger.warning(
+            f"Server-side copy of {existing.name} to {blob_name} failed, uploading instead: "
+            f"{str(e)}"
+        )
+        return None
+    await record_blob_written(blob_name, file_size, existing.metadata, copy)
+    return blob_name, existing
+
+
+async def upload_to_azure_blob(
+    file_path: str, 
+    blob_name: str, 
+    ctx: Context,
+    lane: str = "interactive",
+    dedup: Optional[str] = None
+) -> AzureBlobUploadResponse:
+    """Upload a file to Azure Blob Storage
+
+    `lane` is the bandwidth shaper lane: "interactive" for freshly generated
+    videos, "bulk" for uploads requested through tools. `dedup` overrides
+    AZURE_UPLOAD_DEDUP: with "reuse" or "copy", a file whose bytes the
+    container already holds is not sent again (see reuse_duplicate_blob).
+    """
+    start_time = time.time()
+    upload_id = f"azure_{int(start_time)}"
+    
+    logger.info(f"[{upload_id}] Starting Azure Blob upload")
+    logger.info(f"[{upload_id}] File: {file_path}")
+    logger.info(f"[{upload_id}] Blob name: {blob_name}")
+    logger.info(f"[{upload_id}] Container: {AZURE_CONTAINER_NAME}")
+    
+    if not AZURE_UPLOAD_ENABLED:
+        logger.info(f"[{upload_id}] Azure upload is disabled")
+        await ctx.info("Azure upload is disabled")
+        return AzureBlobUploadResponse(
+            success=False,
+            error_message="Azure upload is disabled",
+            upload_time=0,
+            file_size=0
+        )
+    
+    if not BlobServiceClient:
+        await ctx.error("Azure Storage SDK not available. Install: pip install azure-storage-blob")
+        return AzureBlobUploadResponse(
+            success=False,
+            error_message="Azure Storage SDK not available",
+            upload_time=0,
+            file_size=0
+        )
+    
+    if not AZURE_CONNECTION_STRING:
+        await ctx.error("Azure connection string not configured")
+        return AzureBlobUploadResponse(
+            success=False,
+            error_message="Azure connection string not configured",
+            upload_time=0,
+            file_size=0
+        )
+    
+    try:
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            raise Exception("Failed to initialize Azure Blob client")
+        
+        # Create container if it doesn't exist (checked once per server)
+        await ensure_azure_container(blob_service_client, ctx)
+        
+        # Upload the file as parallel blocks with the tuned settings for this account
+        await ctx.info(f"Uploading {blob_name} to Azure Blob Storage...")
+        
+        blob_client = blob_service_client.get_blob_client(
+            container=AZURE_CONTAINER_NAME,
+            blob=blob_name
+        )
+        file_size = os.path.getsize(file_path)
+        account = blob_service_client.account_name
+
+        mode = dedup or AZURE_UPLOAD_DEDUP
+        if mode in ("reuse", "copy"):
+            duplicate = await reuse_duplicate_blob(
+                blob_service_client, file_path, blob_name, file_size, mode
+            )
+            if duplicate:
+                served_name, existing = duplicate
+                blob_url = (
+                    f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{served_name}"
+                )
+                content_md5 = (
+                    existing.content_settings.content_md5 if existing.content_settings else None
+                )
+                logger.info(
+                    f"[{upload_id}] ♻️ Content already stored as {existing.name}, no data uploaded"
+                )
+                logger.info(f"[{upload_id}] 🔗 Blob URL: {blob_url}")
+                await ctx.info(f"Video already in Azure Blob as {existing.name}: {blob_url}")
+                return AzureBlobUploadResponse(
+                    success=True,
+                    blob_url=blob_url,
+                    upload_time=time.time() - start_time,
+                    file_size=file_size,
+                    content_md5=base64.b64encode(content_md5).decode() if content_md5 else None,
+                    content_crc64=existing.metadata.get("content_crc64"),
+                    content_sha256=existing.metadata.get("content_sha256"),
+                    deduplicated_from=existing.name
+                )
+
+        block_size, concurrency = upload_tuner.choose(account)
+        logger.info(
+            f"[{upload_id}] Block size: {block_size // (1024 * 1024)} MB, concurrency: "
+            f"{concurrency}"
+        )
+
+        transfer_start = time.time()
+        transfer = await upload_file_in_blocks(
+            blob_client, blob_name, file_path, file_size, block_size, concurrency, lane
+        )
+        hasher = transfer["hasher"]
+        if transfer["resumed_blocks"]:
+            logger.info(
+                f"[{upload_id}] Resumed upload: {transfer['resumed_blocks']}/{transfer['blocks']} "
+                "blocks were already staged"
+            )
+        if (
+            transfer["blocks"] > 1
+            and transfer["block_size"] == block_size
+            and transfer["shaped_seconds"] < 0.1
+        ):
+            # Single-request and throttled uploads say nothing about block size or concurrency
+            upload_tuner.record(
+                account,
+                block_size,
+                concurrency,
+                transfer["uploaded_bytes"],
+                time.time() - transfer_start,
+            )
+        
+        await record_blob_written(blob_name, file_size, hasher.metadata(), transfer["properties"])
+
+        # Get the blob URL
+        blob_url = f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob_name}"
+        
+        upload_time = time.time() - start_time
+        
+        logger.info(f"[{upload_id}] ✅ Azure upload completed successfully!")
+        logger.info(f"[{upload_id}] 🔗 Blob URL: {blob_url}")
+        logger.info(f"[{upload_id}] Upload time: {upload_time:.2f}s")
+        logger.info(f"[{upload_id}] File size: {file_size} bytes ({file_size/1024/1024:.1f} MB)")
+        logger.info(f"[{upload_id}] Upload speed: {(file_size/1024/1024)/upload_time:.1f} MB/s")
+        logger.info(
+            f"[{upload_id}] SHA-256: {hasher.content_sha256}, MD5: {hasher.content_md5}, CRC64: "
+            f"{hasher.content_crc64 or 'n/a'}"
+        )
+        
+        await ctx.info(f"Successfully uploaded to Azure Blob: {blob_url}")
+        
+        return AzureBlobUploadResponse(
+            success=True,
+            blob_url=blob_url,
+            upload_time=upload_time,
+            file_size=file_size,
+            content_md5=hasher.content_md5,
+            content_crc64=hasher.content_crc64,
+            content_sha256=hasher.content_sha256
+        )
+        
+    except Exception as e:
+        upload_time = time.time() - start_time
+        error_msg = f"Azure upload failed: {str(e)}"
+        if isinstance(e, ResourceNotFoundError):
+            forget_azure_container()
+        
+        logger.error(f"[{upload_id}] ❌ Azure upload failed!")
+        logger.error(f"[{upload_id}] Error: {str(e)}")
+        logger.error(f"[{upload_id}] Exception type: {type(e).__name__}")
+        logger.error(f"[{upload_id}] Upload time before failure: {upload_time:.2f}s")
+        
+        await ctx.error(error_msg)
+        
+        return AzureBlobUploadResponse(
+            success=False,
+            error_message=error_msg,
+            upload_time=upload_time,
+            file_size=os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        )
+
+
+def azure_blob_url(blob_name: str) -> Optional[str]:
+    """Public URL a blob in the video container has (or will have once uploaded)"""
+    blob_service_client = get_azure_blob_client()
+    if not blob_service_client:
+        return None
+    account = blob_service_client.account_name
+    return f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob_name}"
+
+
+def parse_blob_time(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an ISO-8601 date/time filter; times without a zone are taken as UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(
+            f"Invalid {name}: {value}. Use ISO-8601, e.g. 2025-09-19 or 2025-09-19T15:18:06Z"
+        )
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def blob_video_info(blob: Any, account: str) -> dict:
+    """Listing entry for one blob as returned by list_azure_blob_videos"""
+    return {
+        "name": blob.name,
+        "url": f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob.name}",
+        "size": blob.size,
+        "size_mb": round(blob.size / 1024 / 1024, 1) if blob.size else 0,
+        "created": blob.creation_time.isoformat() if blob.creation_time else None,
+        "modified": blob.last_modified.isoformat() if blob.last_modified else None,
+        "content_type": blob.content_settings.content_type if blob.content_settings else None
+    }
+
+
+async def list_blob_video_page(
+    container_client: Any,
+    account: str,
+    prefix: Optional[str],
+    page_size: int,
+    continuation_token: Optional[str] = None,
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None
+) -> tuple[list[dict], Optional[str]]:
+    """Fill one page of video blobs, in Azure's name order
+
+    The prefix is applied by Azure (name_starts_with); extension and date
+    filters are applied to each Azure page as it arrives. Azure pages are
+    requested only for the rows still missing, so the returned token always
+    resumes right after the last blob looked at. At most
+    AZURE_LIST_MAX_SCAN_PAGES pages are read per call; a short page with a
+    token just means the filters matched little so far.
+
+    Returns:
+        tuple: (videos, continuation token or None when the listing is complete)
+    """
+    videos: list[dict] = []
+    token = continuation_token or None
+    for _ in range(max(1, AZURE_LIST_MAX_SCAN_PAGES)):
+        pages = container_client.list_blobs(
+            name_starts_with=prefix or None,
+            results_per_page=page_size - len(videos)
+        ).by_page(continuation_token=token)
+        try:
+            page = await pages.__anext__()
+        except StopAsyncIteration:
+            return videos, None
+        async for blob in page:
+            if not blob.name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            if modified_after and (not blob.last_modified or blob.last_modified < modified_after):
+                continue
+            if modified_before and (
+                not blob.last_modified or blob.last_modified >= modified_before
+            ):
+                continue
+            videos.append(blob_video_info(blob, account))
+        token = pages.continuation_token
+        if not token or len(videos) >= page_size:
+            break
+    return videos, token or None
+
+
+async def list_all_blob_videos(
+    container_client: Any,
+    account: str,
+    prefix: Optional[str],
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None
+) -> list[dict]:
+    """Every video blob matching the filters, following Azure's pages to the end"""
+    videos: list[dict] = []
+    token = None
+    while True:
+        page, token = await list_blob_video_page(
+            container_client,
+            account,
+            prefix,
+            AZURE_LIST_MAX_PAGE_SIZE,
+            token,
+            modified_after,
+            modified_before
+        )
+        videos += page
+        if not token:
+            return videos
+
+
+class CatalogManifest:
+    """Catalog of the container kept in the container itself, for replicas sharing it
+
+    Entries are compact JSON lines ({"n": name, "s": size, "m": last_modified,
+    ...}) split over AZURE_CATALOG_SHARDS shard blobs under
+    AZURE_CATALOG_PREFIX by a hash of the blob name. Writers read a shard,
+    change it and write it back conditioned on the ETag they read, retrying
+    when another replica got there first. Readers load the catalog with one
+    GET per shard, and shards unchanged since the last load answer 304.
+    A manifest.json header, written by a full publish, marks the shards as
+    complete. Readers list the container and publish again when the header
+    is missing, has another shard count or is older than full_sync_interval,
+    and after an update of their own failed, so blobs written by other
+    clients and missed updates reach the manifest.
+    """
+
+    CONTENT_TYPE = "application/x-ndjson"
+
+    def __init__(
+        self, enabled: bool, prefix: str, shards: int, max_retries: int, full_sync_interval: float
+    ):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.shards = max(1, shards)
+        self.max_retries = max(1, max_retries)
+        self.full_sync_interval = full_sync_interval
+        self.writes = 0
+        self.conflicts = 0
+        self.failures = 0
+        self.publishes = 0
+        # Set when an update failed; the next sync then rebuilds from a listing
+        self.needs_publish = False
+        self._cache: dict[int, tuple[Optional[str], dict[str, dict]]] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    @staticmethod
+    def entry(
+        name: str,
+        size: int,
+        modified: float,
+        created: Optional[float] = None,
+        content_type: Optional[str] = None,
+        etag: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """Compact catalog entry for one blob; the blob inventory uses the same form"""
+        entry = {
+            "n": name,
+            "s": size,
+            "m": modified,
+            "c": created,
+            "t": content_type,
+            "e": etag,
+            "md": metadata or None,
+        }
+        return {key: value for key, value in entry.items() if value is not None}
+
+    def is_manifest_blob(self, name: str) -> bool:
+        return name.startswith(self.prefix)
+
+    def shard_of(self, name: str) -> int:
+        return int(hashlib.sha256(name.encode("utf-8")).hexdigest()[:8], 16) % self.shards
+
+    def _blob_client(self, blob_service_client: Any, shard: int) -> Any:
+        return blob_service_client.get_blob_client(
+            container=AZURE_CONTAINER_NAME, blob=f"{self.prefix}shard-{shard:03d}.ndjson"
+        )
+
+    def _header_client(self, blob_service_client: Any) -> Any:
+        return blob_service_client.get_blob_client(
+            container=AZURE_CONTAINER_NAME, blob=f"{self.prefix}manifest.json"
+        )
+
+    async def _read(self, blob_client: Any, shard: int) -> tuple[Optional[str], dict[str, dict]]:
+        """ETag and entries of a shard (None, {} when it does not exist yet)"""
+        cached = self._cache.get(shard)
+        try:
+            if cached and cached[0]:
+                downloader = await blob_client.download_blob(
+                    etag=cached[0], match_condition=MatchConditions.IfModified
+                )
+            else:
+                downloader = await blob_client.download_blob()
+            data = await downloader.readall()
+        except ResourceNotFoundError:
+            self._cache.pop(shard, None)
+            return None, {}
+        except HttpResponseError as e:
+            # Downloads report 304 Not Modified as a plain HttpResponseError
+            if e.status_code == 304 and cached:
+                return cached
+            raise
+        entries = {}
+        for line in data.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry["n"]] = entry
+        self._cache[shard] = (downloader.properties.etag, entries)
+        return self._cache[shard]
+
+    async def _write(
+        self, blob_client: Any, shard: int, etag: Optional[str], entries: dict[str, dict]
+    ) -> None:
+        body = "".join(
+            json.dumps(entries[name], separators=(",", ":"), ensure_ascii=False) + "\n"
+            for name in sorted(entries)
+        ).encode("utf-8")
+        content_settings = ContentSettings(content_type=self.CONTENT_TYPE)
+        if etag:
+            properties = await blob_client.upload_blob(
+                body, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified,
+                content_settings=content_settings
+            )
+        else:
+            # Only create the shard if no other replica has in the meantime
+            properties = await blob_client.upload_blob(
+                body, overwrite=False, content_settings=content_settings
+            )
+        self._cache[shard] = (properties.get("etag"), entries)
+        self.writes += 1
+
+    async def _update_shard(
+        self,
+        blob_service_client: Any,
+        shard: int,
+        changes: dict[str, Optional[dict]],
+        replace: bool = False
+    ) -> None:
+        lock = self._locks.setdefault(shard, asyncio.Lock())
+        blob_client = self._blob_client(blob_service_client, shard)
+        async with lock:
+            for attempt in range(self.max_retries):
+                etag, current = await self._read(blob_client, shard)
+                entries = {} if replace else dict(current)
+                for name, entry in changes.items():
+                    if entry is None:
+                        entries.pop(name, None)
+                    else:
+                        entries[name] = entry
+                if entries == current and etag:
+                    return
+                try:
+                    await self._write(blob_client, shard, etag, entries)
+                    return
+                except (ResourceModifiedError, ResourceExistsError):
+                    # Another replica wrote the shard after we read it
+                    self.conflicts += 1
+                    await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        raise RuntimeError(
+            f"Catalog shard {shard} kept changing; gave up after {self.max_retries} attempts"
+        )
+
+    async def update(self, changes: dict[str, Optional[dict]]) -> None:
+        """Write entries (None removes a blob) into their shards
+
+        Failures are logged, not raised: the upload or delete itself has
+        already succeeded. They set needs_publish, so the next inventory sync
+        lists the container and republishes the manifest instead of loading it.
+        """
+        if not self.enabled or not changes:
+            return
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            return
+        by_shard: dict[int, dict[str, Optional[dict]]] = {}
+        for name, entry in changes.items():
+            by_shard.setdefault(self.shard_of(name), {})[name] = entry
+        results = await asyncio.gather(
+            *(
+                self._update_shard(blob_service_client, shard, shard_changes)
+                for shard, shard_changes in by_shard.items()
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                self.failures += 1
+                self.needs_publish = True
+                logger.warning(f"Failed to update catalog manifest: {str(result)}")
+
+    async def load(self) -> Optional[list[dict]]:
+        """Every catalog entry, or None when the manifest has to be rebuilt from a listing
+
+        That is while none has been published, when its shard count differs
+        from the configured one, and once the last publish is older than
+        full_sync_interval.
+        """
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            raise RuntimeError("Azure Blob client not available")
+        try:
+            downloader = await self._header_client(blob_service_client).download_blob()
+            header = json.loads(await downloader.readall())
+        except ResourceNotFoundError:
+            return None
+        if header.get("shards") != self.shards:
+            logger.info(
+                f"Catalog manifest has {header.get('shards')} shards, {self.shards} configured; "
+                "rebuilding"
+            )
+            return None
+        age = time.time() - header.get("published", 0)
+        if self.full_sync_interval > 0 and age > self.full_sync_interval:
+            logger.info(
+                f"Catalog manifest was published {age:.0f}s ago; rebuilding from a full listing"
+            )
+            return None
+        shards = await asyncio.gather(
+            *(
+                self._read(self._blob_client(blob_service_client, shard), shard)
+                for shard in range(self.shards)
+            )
+        )
+        return [entry for _, entries in shards for entry in entries.values()]
+
+    async def publish(self, entries: list[dict]) -> None:
+        """Rewrite every shard from a complete listing (bootstraps or repairs the manifest)"""
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            raise RuntimeError("Azure Blob client not available")
+        by_shard: dict[int, dict[str, Optional[dict]]] = {shard: {} for shard in range(self.shards)}
+        for entry in entries:
+            by_shard[self.shard_of(entry["n"])][entry["n"]] = entry
+        await asyncio.gather(
+            *(self._update_shard(blob_service_client, shard, shard_entries, replace=True)
+              for shard, shard_entries in by_shard.items())
+        )
+        header = {
+            "version": 1,
+            "shards": self.shards,
+            "blobs": len(entries),
+            "published": time.time(),
+        }
+        # Updates that failed before this point are covered by the listing
+        self.needs_publish = False
+        await self._header_client(blob_service_client).upload_blob(
+            json.dumps(header).encode("utf-8"),
+            overwrite=True,
+            content_settings=ContentSettings(content_type="application/json"),
+        )
+        self.publishes += 1
+        logger.info(f"Published catalog manifest: {len(entries)} blobs in {self.shards} shards")
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "shards": self.shards,
+            "writes": self.writes,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+            "publishes": self.publishes,
+            "needs_publish": self.needs_publish
+        }
+
+
+catalog_manifest = CatalogManifest(
+    enabled=AZURE_CATALOG_MANIFEST,
+    prefix=AZURE_CATALOG_PREFIX,
+    shards=AZURE_CATALOG_SHARDS,
+    max_retries=AZURE_CATALOG_MAX_RETRIES,
+    full_sync_interval=AZURE_CATALOG_FULL_SYNC_INTERVAL
+)
+
+
+class BlobInventory:
+    """Local SQLite index of the blobs in the video container
+
+    Uploads and deletes made by this server update it immediately. A
+    background sync enumerates the container every
+    AZURE_INVENTORY_SYNC_INTERVAL seconds. Azure cannot filter a listing by
+    date, so the delta is taken against the index itself: only blobs that are
+    new or whose last_modified moved are written, and blobs that disappeared
+    are removed. Rows this server records while a sync runs are newer than
+    the listing and are neither overwritten nor removed by it (indexed_at).
+    With AZURE_CATALOG_MANIFEST the sync reads the shared catalog manifest
+    instead of enumerating the container. A full listing followed by a
+    publish still runs when the manifest is missing or due for a rebuild
+    (see CatalogManifest) and on every forced refresh. Once a first sync
+    has completed, listings, counts and sizes are answered from the index
+    instead of Azure.
+    """
+
+    ORDERS = ("name", "newest", "oldest")
+    TOKEN_PREFIX = "idx:"
+    WRITE_BATCH = 500
+    # Azure reports this for blobs uploaded without an explicit content type
+    DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+    def __init__(self, db: StateDatabase, enabled: bool, sync_interval: float):
+        self.db = db
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.last_sync_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS blob_inventory (
+                container TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_modified REAL NOT NULL,
+                created REAL,
+                content_type TEXT,
+                etag TEXT,
+                metadata TEXT,
+                PRIMARY KEY (container, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_blob_inventory_modified
+                ON blob_inventory (container, last_modified);
+            CREATE INDEX IF NOT EXISTS idx_blob_inventory_sha256
+                ON blob_inventory (container, json_extract(metadata, '$.content_sha256'));
+            CREATE TABLE IF NOT EXISTS blob_inventory_state (
+                container TEXT PRIMARY KEY,
+                synced_at REAL,
+                sync_seconds REAL
+            );
+        """)
+        db.register_column("blob_inventory", "indexed_at", "REAL")
+
+    def start(self) -> None:
+        """Start the background delta sync (idempotent)"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Blob inventory sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+    def _state(self) -> dict:
+        rows = self.db.execute(
+            "SELECT * FROM blob_inventory_state WHERE container = ?", (AZURE_CONTAINER_NAME,)
+        )
+        return rows[0] if rows else {}
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index holds a complete listing to serve queries from"""
+        if not self.enabled:
+            return False
+        try:
+            return bool(self._state().get("synced_at"))
+        except sqlite3.Error:
+            return False
+
+    def record(self, entry: dict) -> None:
+        """Add or update a blob this server just wrote (a CatalogManifest.entry)"""
+        if not self.enabled:
+            return
+        try:
+            self.db.execute(
+                "INSERT INTO blob_inventory (container, name, size, last_modified, created, "
+                "content_type, etag, metadata, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON "
+                "CONFLICT (container, name) DO UPDATE SET size = excluded.size, last_modified = "
+                "excluded.last_modified, content_type = excluded.content_type, etag = "
+                "excluded.etag, metadata = excluded.metadata, indexed_at = excluded.indexed_at",
+                self._row(entry, time.time()),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record {entry['n']} in the blob inventory: {str(e)}")
+
+    @staticmethod
+    def _row(entry: dict, indexed_at: float) -> tuple:
+        return (
+            AZURE_CONTAINER_NAME,
+            entry["n"],
+            entry.get("s", 0),
+            entry.get("m", 0.0),
+            entry.get("c"),
+            entry.get("t"),
+            entry.get("e"),
+            json.dumps(entry.get("md") or {}),
+            indexed_at,
+        )
+
+    def find_content(self, content_sha256: str, size: int, limit: int) -> list[str]:
+        """Names of indexed blobs whose content_sha256 metadata and size match"""
+        if not self.enabled:
+            return []
+        rows = self.db.execute(
+            "SELECT name FROM blob_inventory WHERE container = ? AND json_extract(metadata, "
+            "'$.content_sha256') = ? AND size = ? LIMIT ?",
+            (AZURE_CONTAINER_NAME, content_sha256, size, limit),
+        )
+        return [row["name"] for row in rows]
+
+    def remove(self, names: list[str]) -> None:
+        """Forget blobs this server just deleted"""
+        if not self.enabled or not names:
+            return
+        try:
+            self.db.execute_many(
+                "DELETE FROM blob_inventory WHERE container = ? AND name = ?",
+                [(AZURE_CONTAINER_NAME, name) for name in names]
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to remove {len(names)} blobs from the blob inventory: {str(e)}")
+
+    async def sync(self, full: bool = False) -> dict:
+        """Bring the index up to date with the container
+
+        `full` lists the container even when a catalog manifest could be
+        loaded instead, and republishes the manifest from that listing.
+
+        Returns:
+            dict: Blobs seen, written (new or changed) and removed, and seconds taken
+        """
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            return await self._sync(full)
+
+    async def _listed_entries(self, blob_service_client: Any) -> list[dict]:
+        """Catalog entries for every blob in the container, from a full listing"""
+        entries = []
+        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+        try:
+            async for blob in container_client.list_blobs(include=["metadata"]):
+                if catalog_manifest.enabled and catalog_manifest.is_manifest_blob(blob.name):
+                    continue
+                entries.append(CatalogManifest.entry(
+                    blob.name,
+                    blob.size or 0,
+                    blob.last_modified.timestamp() if blob.last_modified else 0.0,
+                    blob.creation_time.timestamp() if blob.creation_time else None,
+                    blob.content_settings.content_type if blob.content_settings else None,
+                    blob.etag,
+                    blob.metadata
+                ))
+        except Exception as e:
+            if "ContainerNotFound" not in str(e):
+                raise
+        return entries
+
+    async def _sync(self, full: bool) -> dict:
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            raise RuntimeError("Azure Blob client not available")
+        start_time = time.time()
+
+        # Snapshot the index before enumerating: blobs recorded by uploads
+        # while the listing runs are not in it, so they are never taken for
+        # blobs deleted elsewhere
+        known = {
+            row["name"]: row["last_modified"]
+            for row in await asyncio.to_thread(
+                self.db.execute,
+                "SELECT name, last_modified FROM blob_inventory WHERE container = ?",
+                (AZURE_CONTAINER_NAME,)
+            )
+        }
+
+        source = "azure"
+        try:
+            entries = None
+            if catalog_manifest.enabled and not full and not catalog_manifest.needs_publish:
+                entries = await catalog_manifest.load()
+            if entries is not None:
+                source = "manifest"
+            else:
+                entries = await self._listed_entries(blob_service_client)
+                if catalog_manifest.enabled:
+                    await catalog_manifest.publish(entries)
+        except Exception as e:
+            self.last_sync_error = str(e)
+            raise
+
+        batch: list[tuple] = []
+        written = 0
+        for entry in entries:
+            if known.pop(entry["n"], None) == entry.get("m", 0.0):
+                # Unchanged since it was indexed
+                continue
+            batch.append(self._row(entry, start_time))
+            if len(batch) >= self.WRITE_BATCH:
+                written += len(batch)
+                await asyncio.to_thread(self._write, batch)
+                batch = []
+        written += len(batch)
+        await asyncio.to_thread(self._write, batch)
+
+        # Whatever was not listed has been deleted by someone else, unless
+        # this server recorded it again since the sync started
+        removed = list(known)
+        for offset in range(0, len(removed), self.WRITE_BATCH):
+            stale = removed[offset:offset + self.WRITE_BATCH]
+            await asyncio.to_thread(self._remove_stale, stale, start_time)
+
+        sync_seconds = time.time() - start_time
+        self.db.execute(
+            "INSERT OR REPLACE INTO blob_inventory_state (container, synced_at, sync_seconds)"
+            " VALUES (?, ?, ?)",
+            (AZURE_CONTAINER_NAME, time.time(), sync_seconds),
+        )
+        self.last_sync_error = None
+        logger.info(
+            f"Blob inventory synced from {source}: {len(entries)} blobs, {written} written,"
+            f" {len(removed)} removed in {sync_seconds:.1f}s"
+        )
+        return {
+            "source": source,
+            "seen": len(entries),
+            "written": written,
+            "removed": len(removed),
+            "sync_seconds": round(sync_seconds, 2)
+        }
+
+    def _write(self, rows: list[tuple]) -> None:
+        """Write listed rows, except over rows recorded after the listing started"""
+        if rows:
+            self.db.execute_many(
+                "INSERT INTO blob_inventory (container, name, size, last_modified, created, "
+                "content_type, etag, metadata, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON "
+                "CONFLICT (container, name) DO UPDATE SET size = excluded.size, last_modified = "
+                "excluded.last_modified, created = excluded.created, content_type = "
+                "excluded.content_type, etag = excluded.etag, metadata = excluded.metadata, "
+                "indexed_at = excluded.indexed_at WHERE COALESCE(blob_inventory.indexed_at, 0) <= "
+                "excluded.indexed_at",
+                rows,
+            )
+
+    def _remove_stale(self, names: list[str], before: float) -> None:
+        """Remove rows missing from a listing that started at `before`"""
+        self.db.execute_many(
+            "DELETE FROM blob_inventory WHERE container = ? AND name = ?"
+            " AND COALESCE(indexed_at, 0) < ?",
+            [(AZURE_CONTAINER_NAME, name, before) for name in names],
+        )
+
+    @staticmethod
+    def _filters(
+        prefix: Optional[str],
+        modified_after: Optional[datetime],
+        modified_before: Optional[datetime]
+    ) -> tuple[list[str], list[Any]]:
+        conditions = ["container = ?"]
+        params: list[Any] = [AZURE_CONTAINER_NAME]
+        # Azure matches suffixes case-insensitively in list_blob_video_page as well
+        conditions.append("(" + " OR ".join("lower(name) LIKE ?" for _ in VIDEO_EXTENSIONS) + ")")
+        params += [f"%{extension}" for extension in VIDEO_EXTENSIONS]
+        if prefix:
+            # Range on the primary key, then an exact (case-sensitive) prefix check
+            conditions.append("name >= ? AND name < ? AND substr(name, 1, ?) = ?")
+            params += [prefix, prefix + chr(0x10FFFF), len(prefix), prefix]
+        if modified_after:
+            conditions.append("last_modified >= ?")
+            params.append(modified_after.timestamp())
+        if modified_before:
+            conditions.append("last_modified < ?")
+            params.append(modified_before.timestamp())
+        return conditions, params
+
+    def list_page(
+        self,
+        account: str,
+        prefix: Optional[str],
+        page_size: Optional[int],
+        continuation_token: Optional[str] = None,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None,
+        order: str = "name"
+    ) -> tuple[list[dict], Optional[str]]:
+        """One page of videos from the index, ordered across the whole container
+
+        Pages continue from the last row returned (keyset pagination), so
+        blobs added or removed meanwhile do not shift later pages. Without a
+        page_size every matching video is returned.
+        """
+        conditions, params = self._filters(prefix, modified_after, modified_before)
+        if continuation_token:
+            try:
+                token_order, last_modified, last_name = json.loads(
+                    base64.urlsafe_b64decode(continuation_token[len(self.TOKEN_PREFIX):]).decode()
+                )
+            except (ValueError, TypeError):
+                raise ValueError("Invalid continuation_token")
+            if token_order != order:
+                raise ValueError("continuation_token belongs to a listing with a different order")
+            if order == "name":
+                conditions.append("name > ?")
+                params.append(last_name)
+            else:
+                comparison = "<" if order == "newest" else ">"
+                conditions.append(
+                    f"(last_modified {comparison} ? OR (last_modified = ? AND name {comparison} ?))"
+                )
+                params += [last_modified, last_modified, last_name]
+
+        sort = {
+            "name": "name",
+            "newest": "last_modified DESC, name DESC",
+            "oldest": "last_modified, name"
+        }[order]
+        rows = self.db.execute(
+            f"SELECT * FROM blob_inventory WHERE {' AND '.join(conditions)}"
+            f" ORDER BY {sort} LIMIT ?",
+            (*params, page_size + 1 if page_size else -1),
+        )
+        more = page_size is not None and len(rows) > page_size
+        rows = rows[:page_size]
+        token = None
+        if more:
+            last = rows[-1]
+            token = self.TOKEN_PREFIX + base64.urlsafe_b64encode(
+                json.dumps([order, last["last_modified"], last["name"]]).encode()
+            ).decode()
+        return [self._video_info(row, account) for row in rows], token
+
+    @staticmethod
+    def _video_info(row: dict, account: str) -> dict:
+        """Same shape as blob_video_info for a listed blob"""
+        def iso(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value, timezone.utc).isoformat() if value else None
+        return {
+            "name": row["name"],
+            "url": f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{row['name']}",
+            "size": row["size"],
+            "size_mb": round(row["size"] / 1024 / 1024, 1) if row["size"] else 0,
+            "created": iso(row["created"]),
+            "modified": iso(row["last_modified"]),
+            "content_type": row["content_type"]
+        }
+
+    def summary(
+        self,
+        prefix: Optional[str] = None,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None
+    ) -> dict:
+        """Count, total size and date range of the indexed videos matching the filters"""
+        conditions, params = self._filters(prefix, modified_after, modified_before)
+        row = self.db.execute(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS total_size, MIN(last_modified) "
+            "AS oldest, MAX(last_modified) AS newest FROM blob_inventory WHERE "
+            f"{' AND '.join(conditions)}",
+            tuple(params),
+        )[0]
+        return {
+            "count": row["count"],
+            "total_size": row["total_size"],
+            "total_size_mb": round(row["total_size"] / 1024 / 1024, 1),
+            "oldest": (
+                datetime.fromtimestamp(row["oldest"], timezone.utc).isoformat()
+                if row["oldest"]
+                else None
+            ),
+            "newest": (
+                datetime.fromtimestamp(row["newest"], timezone.utc).isoformat()
+                if row["newest"]
+                else None
+            ),
+        }
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        try:
+            state = self._state()
+            blobs = self.db.execute(
+                "SELECT COUNT(*) AS count FROM blob_inventory WHERE container = ?",
+                (AZURE_CONTAINER_NAME,),
+            )[0]["count"]
+        except sqlite3.Error:
+            state, blobs = {}, None
+        return {
+            "enabled": True,
+            "blobs": blobs,
+            "synced_at": (
+                datetime.fromtimestamp(state["synced_at"]).isoformat()
+                if state.get("synced_at")
+                else None
+            ),
+            "last_sync_seconds": (
+                round(state["sync_seconds"], 2) if state.get("sync_seconds") is not None else None
+            ),
+            "last_sync_error": self.last_sync_error,
+        }
+
+
+blob_inventory = BlobInventory(
+    state_db, enabled=AZURE_INVENTORY_ENABLED, sync_interval=AZURE_INVENTORY_SYNC_INTERVAL
+)
+
+
+async def record_blob_written(
+    name: str, size: int, metadata: dict, properties: Optional[dict]
+) -> None:
+    """Add a blob this server just uploaded to the inventory and the catalog manifest"""
+    properties = properties or {}
+    last_modified = properties.get("last_modified")
+    modified = last_modified.timestamp() if last_modified else time.time()
+    entry = CatalogManifest.entry(
+        name,
+        size,
+        modified,
+        modified,
+        BlobInventory.DEFAULT_CONTENT_TYPE,
+        properties.get("etag"),
+        metadata,
+    )
+    await asyncio.to_thread(blob_inventory.record, entry)
+    await catalog_manifest.update({name: entry})
+
+
+async def record_blobs_deleted(names: list[str]) -> None:
+    """Drop blobs this server just deleted from the inventory and the catalog manifest"""
+    await asyncio.to_thread(blob_inventory.remove, names)
+    await catalog_manifest.update({name: None for name in names})
+
+
+AZURE_BATCH_LIMIT = 256  # Subrequests Azure accepts in one Blob Batch request
+
+
+async def delete_blob_quietly(container_client: Any, name: str) -> dict:
+    """Delete one blob; a 404 is reported as not_found rather than raised"""
+    try:
+        await container_client.delete_blob(name)
+        return {"name": name, "status": "deleted"}
+    except ResourceNotFoundError:
+        return {"name": name, "status": "not_found"}
+    except Exception as e:
+        return {"name": name, "status": "failed", "error": str(e)}
+
+
+async def delete_blob_batch(container_client: Any, names: list[str]) -> list[dict]:
+    """Delete up to AZURE_BATCH_LIMIT blobs with one Blob Batch request
+
+    Each blob gets its own result: deleted (202), not_found (404) or failed
+    with Azure's error code. If the batch request itself is refused (e.g.
+    accounts with a hierarchical namespace), the blobs are deleted one by one.
+    """
+    try:
+        responses = await container_client.delete_blobs(*names, raise_on_any_failure=False)
+        statuses = [response async for response in responses]
+    except Exception as e:
+        logger.warning(
+            f"Blob batch delete failed ({str(e)}); deleting {len(names)} blobs one by one"
+        )
+        return list(
+            await asyncio.gather(*(delete_blob_quietly(container_client, name) for name in names))
+        )
+
+    results = []
+    for name, response in zip(names, statuses):
+        if response.status_code == 202:
+            results.append({"name": name, "status": "deleted"})
+        elif response.status_code == 404:
+            results.append({"name": name, "status": "not_found"})
+        else:
+            error = (
+                response.headers.get("x-ms-error-code")
+                or f"{response.status_code} {response.reason}"
+            )
+            results.append({"name": name, "status": "failed", "error": error})
+    return results
+
+
+async def delete_blobs_in_batches(container_client: Any, names: list[str]) -> list[dict]:
+    """Delete blobs in Blob Batch requests of AZURE_DELETE_BATCH_SIZE blobs each
+
+    Up to AZURE_DELETE_CONCURRENCY requests run at a time.
+
+    Blobs that are gone afterwards (deleted or already missing) are dropped
+    from the inventory and the catalog manifest in one update.
+    """
+    size = max(1, min(AZURE_DELETE_BATCH_SIZE, AZURE_BATCH_LIMIT))
+    semaphore = asyncio.Semaphore(max(1, AZURE_DELETE_CONCURRENCY))
+
+    async def run(batch: list[str]) -> list[dict]:
+        async with semaphore:
+            return await delete_blob_batch(container_client, batch)
+
+    batches = await asyncio.gather(*(run(names[i:i + size]) for i in range(0, len(names), size)))
+    results = [result for batch in batches for result in batch]
+    gone = [result["name"] for result in results if result["status"] != "failed"]
+    if gone:
+        await record_blobs_deleted(gone)
+    return results
+
+
+class UploadQueueContext:
+    """Stand-in for the MCP context while the upload queue works in the background"""
+
+    def __init__(self, upload_id: str):
+        self.upload_id = upload_id
+
+    async def info(self, message: str) -> None:
+        logger.debug(f"[{self.upload_id}] {message}")
+
+    async def error(self, message: str) -> None:
+        logger.error(f"[{self.upload_id}] {message}")
+
+    async def report_progress(
+        self,
+        progress: float,
+        total: Optional[float] = 100,
+        message: Optional[str] = None
+    ) -> None:
+        pass
+
+
+class BackgroundUploadQueue:
+    """Durable queue of Azure uploads worked off by a pool of background workers
+
+    Failed uploads are retried with exponential backoff; after
+    AZURE_UPLOAD_MAX_ATTEMPTS they are moved to the dead-letter list, where
+    list_upload_queue shows them and retry_failed_uploads puts them back.
+    Uploads still queued when the server stops are picked up on the next start.
+    """
+
+    STATUSES = ("pending", "uploading", "succeeded", "dead")
+
+    def __init__(self, db: StateDatabase, workers: int, max_attempts: int):
+        self.db = db
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Workers claim from worker threads; one claim at a time keeps entries unique
+        self._claim_lock = threading.Lock()
+        db.register_schema("""
+            CREATE TABLE IF NOT EXISTS upload_queue (
+                upload_id TEXT PRIMARY KEY,
+                request_id TEXT,
+                file_path TEXT NOT NULL,
+                blob_name TEXT NOT NULL,
+                blob_url TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                last_error TEXT,
+                created TEXT NOT NULL,
+                updated TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_upload_queue_status
+                ON upload_queue (status, next_attempt);
+        """)
+
+    def start(self) -> None:
+        """Start the workers (idempotent); uploads interrupted by a restart are retried"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self.db.execute("UPDATE upload_queue SET status = 'pending' WHERE status = 'uploading'")
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        logger.info(f"Background upload queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _wake(self) -> None:
+        """Start the workers if needed and tell idle ones there is work"""
+        self.start()
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    async def enqueue(
+        self, file_path: str, blob_name: str, request_id: Optional[str] = None
+    ) -> dict:
+        """Queue a file for upload and return its entry, including the blob URL it will have"""
+        now = datetime.now().isoformat()
+        entry = {
+            "upload_id": f"upload_{uuid.uuid4().hex[:12]}",
+            "request_id": request_id,
+            "file_path": file_path,
+            "blob_name": blob_name,
+            "blob_url": azure_blob_url(blob_name),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt": time.time(),
+            "last_error": None,
+            "created": now,
+            "updated": now
+        }
+        await asyncio.to_thread(
+            self.db.execute,
+            f"INSERT INTO upload_queue ({', '.join(entry)}) VALUES "
+            f"({', '.join('?' for _ in entry)})",
+            tuple(entry.values()),
+        )
+        self._wake()
+        logger.info(
+            f"[{request_id or entry['upload_id']}] Queued Azure upload {entry['upload_id']}: "
+            f"{blob_name}"
+        )
+        return entry
+
+    def list(self, status: Optional[str] = None) -> list[dict]:
+        if status:
+            return self.db.execute(
+                "SELECT * FROM upload_queue WHERE status = ? ORDER BY created DESC", (status,)
+            )
+        return self.db.execute("SELECT * FROM upload_queue ORDER BY created DESC")
+
+    async def replay(self, upload_id: Optional[str] = None) -> int:
+        """Move dead-lettered uploads (one, or all of them) back to the queue"""
+        count = await asyncio.to_thread(self._requeue_dead, upload_id)
+        if count:
+            self._wake()
+        return count
+
+    def _requeue_dead(self, upload_id: Optional[str]) -> int:
+        condition, params = (
+            ("status = 'dead' AND upload_id = ?", (upload_id,))
+            if upload_id
+            else ("status = 'dead'", ())
+        )
+        count = self.db.execute(
+            f"SELECT COUNT(*) AS count FROM upload_queue WHERE {condition}", params
+        )[0]["count"]
+        self.db.execute(
+            "UPDATE upload_queue SET status = 'pending', attempts = 0, next_attempt = ?,"
+            f" updated = ? WHERE {condition}",
+            (time.time(), datetime.now().isoformat()) + params,
+        )
+        return int(count)
+
+    def stats(self) -> dict:
+        try:
+            rows = self.db.execute(
+                "SELECT status, COUNT(*) AS count FROM upload_queue GROUP BY status"
+            )
+        except sqlite3.Error:
+            rows = []
+        return {
+            "enabled": AZURE_UPLOAD_ASYNC,
+            "workers": len(self._tasks),
+            **{row["status"]: row["count"] for row in rows},
+        }
+
+    def _claim(self) -> tuple[Optional[dict], Optional[float]]:
+        """Take the next due upload, or report when the next one becomes due"""
+        with self._claim_lock:
+            rows = self.db.execute(
+                "SELECT * FROM upload_queue WHERE status = 'pending' ORDER BY next_attempt LIMIT 1"
+            )
+            if not rows:
+                return None, None
+            entry = rows[0]
+            if entry["next_attempt"] > time.time():
+                return None, entry["next_attempt"]
+            self.db.execute(
+                "UPDATE upload_queue SET status = 'uploading', updated = ? WHERE upload_id = ?",
+                (datetime.now().isoformat(), entry["upload_id"])
+            )
+        return entry, None
+
+    async def _worker(self, index: int) -> None:
+        wakeup = self._wakeup
+        assert wakeup is not None
+        while True:
+            try:
+                entry, due = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                logger.error(f"Upload queue worker {index} failed to read the queue: {str(e)}")
+                entry, due = None, time.time() + AZURE_UPLOAD_RETRY_BASE
+
+            if entry is None:
+                wakeup.clear()
+                timeout = max(0.0, due - time.time()) if due else None
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Other idle workers may have more to do
+            wakeup.set()
+            try:
+                await self._process(entry)
+            except Exception as e:
+                # A worker must outlive any single upload; the entry goes back for a retry
+                logger.exception(
+                    f"[{entry['upload_id']}] Upload queue worker {index} failed while processing: "
+                    f"{str(e)}"
+                )
+                try:
+                    await asyncio.to_thread(
+                        self._retry_or_dead_letter,
+                        entry["upload_id"],
+                        entry["attempts"] + 1,
+                        f"Upload worker error: {str(e)}",
+                    )
+                except sqlite3.Error as db_error:
+                    logger.error(
+                        f"[{entry['upload_id']}] Failed to reschedule upload: {str(db_error)}"
+                    )
+
+    async def _process(self, entry: dict) -> None:
+        upload_id = entry["upload_id"]
+        attempts = entry["attempts"] + 1
+        result = None
+        if os.path.exists(entry["file_path"]):
+            # Videos queued by a generation keep their interactive priority
+            lane = "interactive" if entry["request_id"] else "bulk"
+            result = await upload_to_azure_blob(
+                entry["file_path"],
+                entry["blob_name"],
+                cast(Context, UploadQueueContext(upload_id)),
+                lane,
+            )
+            error = None if result.success else result.error_message
+        else:
+            error = f"Video file not found: {entry['file_path']}"
+            attempts = self.max_attempts  # Retrying cannot bring the file back
+
+        # Queue writes run in a worker thread so the event loop never waits on SQLite
+        if result is not None and error is None:
+            await asyncio.to_thread(
+                self._succeed, upload_id, attempts, result.blob_url, entry["request_id"]
+            )
+            logger.info(f"[{upload_id}] ✅ Background upload succeeded: {result.blob_url}")
+        else:
+            await asyncio.to_thread(
+                self._retry_or_dead_letter, upload_id, attempts, error or "Upload failed"
+            )
+
+    def _succeed(
+        self, upload_id: str, attempts: int, blob_url: Optional[str], request_id: Optional[str]
+    ) -> None:
+        self.db.execute(
+            "UPDATE upload_queue SET status = 'succeeded', attempts = ?, blob_url = ?, "
+            "last_error = NULL, updated = ? WHERE upload_id = ?",
+            (attempts, blob_url, datetime.now().isoformat(), upload_id),
+        )
+        self._finish_generation(request_id)
+
+    def _retry_or_dead_letter(self, upload_id: str, attempts: int, error: str) -> None:
+        """Schedule a failed upload for another attempt with backoff, or dead-letter it"""
+        now = datetime.now().isoformat()
+        if attempts >= self.max_attempts:
+            self.db.execute(
+                "UPDATE upload_queue SET status = 'dead', attempts = ?, last_error = ?, updated = ?"
+                " WHERE upload_id = ?",
+                (attempts, error, now, upload_id),
+            )
+            logger.error(
+                f"[{upload_id}] ❌ Background upload dead-lettered after {attempts} attempts: "
+                f"{error}"
+            )
+        else:
+            delay = min(AZURE_UPLOAD_RETRY_MAX, AZURE_UPLOAD_RETRY_BASE * 2 ** (attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            self.db.execute(
+                "UPDATE upload_queue SET status = 'pending', attempts = ?, next_attempt = ?, "
+                "last_error = ?, updated = ? WHERE upload_id = ?",
+                (attempts, time.time() + delay, error, now, upload_id),
+            )
+            logger.warning(
+                f"[{upload_id}] Background upload attempt {attempts} failed, retrying in "
+                f"{delay:.0f}s: {error}"
+            )
+
+    def _finish_generation(self, request_id: Optional[str]) -> None:
+        """Mark a generation uploaded once every one of its queued videos is in Azure"""
+        if not request_id:
+            return
+        rows = self.db.execute(
+            "SELECT COUNT(*) AS open FROM upload_queue"
+            " WHERE request_id = ? AND status != 'succeeded'",
+            (request_id,),
+        )
+        if not rows[0]["open"]:
+            generation_store.update(request_id, stage="uploaded", error=None)
+
+
+upload_queue = BackgroundUploadQueue(
+    state_db, workers=AZURE_UPLOAD_WORKERS, max_attempts=AZURE_UPLOAD_MAX_ATTEMPTS
+)
+
+
+async def load_image_input(image_path: str, request_id: str) -> tuple[Any, bytes]:
+    """Read an image file and wrap it for the Gemini API
+
+    Returns:
+        tuple: (genai Image object, raw image bytes)
+    """
+    # Read image file as bytes
+    logger.info(f"[{request_id}] Reading image file as bytes")
+    image_bytes = await run_gemini_call(read_file_bytes, image_path)
+
+    # Get MIME type with better detection
+    mime_type, _ = mimetypes.guess_type(image_path)
+
+    # If mimetypes fails, try to detect from file extension
+    if not mime_type:
+        ext = os.path.splitext(image_path)[1].lower()
+        mime_type_map = {
+            '.jpg': 'image/jpeg',
+            '.jpeg': 'image/jpeg',
+            '.png': 'image/png',
+            '.gif': 'image/gif',
+            '.webp': 'image/webp',
+            '.bmp': 'image/bmp',
+            '.tiff': 'image/tiff',
+            '.tif': 'image/tiff'
+        }
+        mime_type = mime_type_map.get(ext, 'image/jpeg')
+
+    # Ensure it's an image MIME type
+    if not mime_type.startswith('image/'):
+        mime_type = 'image/jpeg'  # Default fallback
+
+    logger.info(f"[{request_id}] Image loaded successfully")
+    logger.info(f"[{request_id}] - MIME type: {mime_type}")
+    logger.info(f"[{request_id}] - File size: {len(image_bytes)} bytes")
+
+    # Validate MIME type is supported
+    supported_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp']
+    if mime_type not in supported_types:
+        logger.warning(f"[{request_id}] Unusual MIME type: {mime_type}, using image/jpeg instead")
+        mime_type = 'image/jpeg'
+
+    # Create image object using GenAI types
+    return genai_types.Image(image_bytes=image_bytes, mime_type=mime_type), image_bytes
+
+
+async def submit_generation(
+    prompt: str,
+    model: str,
+    request_id: str,
+    image_obj: Optional[Any] = None,
+    number_of_videos: int = 1
+) -> Any:
+    """Start a Veo generation and return the long-running operation
+
+    `number_of_videos` > 1 asks the operation for several candidates at once.
+    """
+    options = {}
+    if number_of_videos > 1:
+        options["config"] = genai_types.GenerateVideosConfig(number_of_videos=number_of_videos)
+        logger.info(f"[{request_id}] Requesting {number_of_videos} candidate videos")
+
+    if image_obj is not None:
+        # For image-to-video, we need to pass the image object
+        logger.info(f"[{request_id}] Calling Gemini API for image-to-video generation")
+        logger.info(f"[{request_id}] API Request - Model: {model}, Prompt: {prompt}")
+
+        operation = await submit_with_backoff(
+            request_id,
+            model=model,
+            prompt=prompt,
+            image=image_obj,
+            **options
+        )
+    else:
+        # For text-to-video, only model and prompt are needed
+        logger.info(f"[{request_id}] Calling Gemini API for text-to-video generation")
+        logger.info(f"[{request_id}] API Request - Model: {model}, Prompt: {prompt}")
+        operation = await submit_with_backoff(
+            request_id,
+            model=model,
+            prompt=prompt,
+            **options
+        )
+
+    logger.info(f"[{request_id}] API call initiated, operation name: {operation.name}")
+    return operation
+
+
+async def wait_for_operation(
+    operation: Any,
+    model: str,
+    ctx: Context,
+    request_id: str,
+    submitted_at: float,
+    poll_interval: Optional[int],
+    max_poll_time: int,
+    record_latency: bool = True
+) -> Any:
+    """Wait for an operation through the shared poller, reporting progress meanwhile"""
+    if operation.done:
+        return operation
+
+    operation_name = operation.name
+    progress_updates = 0
+    operation_future = operation_poller.watch(operation, interval=poll_interval, model=model)
+    try:
+        while not operation_future.done():
+            elapsed = time.time() - submitted_at
+            progress_updates += 1
+
+            if elapsed > max_poll_time:
+                logger.error(f"[{request_id}] Video generation timed out after {max_poll_time}s")
+                await ctx.report_progress(progress=0, total=100)  # Reset on timeout
+                raise TimeoutError(f"Video generation timed out after {max_poll_time} seconds")
+
+            # Estimate progress and ETA from this model's latency history
+            eta = latency_history.eta(model, elapsed)
+            estimated_progress = min(
+                10 + latency_history.progress_fraction(model, elapsed) * 80, 85
+            )  # Cap at 85% until done
+            await report_status(
+                ctx,
+                progress=int(estimated_progress),
+                message=f"Generating video, ~{eta:.0f}s remaining",
+            )
+
+            # Log polling status every 5 updates to avoid spam
+            if progress_updates % 5 == 0:
+                logger.info(
+                    f"[{request_id}] Waiting for operation - Elapsed: {elapsed:.1f}s, ETA: "
+                    f"{eta:.0f}s, Progress: {estimated_progress:.1f}%"
+                )
+
+            await ctx.info(f"Generating video... ({elapsed:.1f}s elapsed, ~{eta:.0f}s remaining)")
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(operation_future),
+                    timeout=max(0.1, min(VEO_PROGRESS_INTERVAL, max_poll_time - elapsed))
+                )
+            except asyncio.TimeoutError:
+                pass
+        operation = operation_future.result()
+        if record_latency:
+            latency_history.record(model, time.time() - submitted_at)
+        return operation
+    finally:
+        operation_poller.release(operation_name)
+
+
+def parse_content_range_total(content_range: Optional[str]) -> Optional[int]:
+    """Total size from a "bytes start-end/total" Content-Range header, if known"""
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+async def stream_gemini_video(uri: str, request_id: str, offset: int = 0) -> AsyncIterator[bytes]:
+    """Yield a generated video from Gemini in chunks of at most VEO_DOWNLOAD_CHUNK_SIZE
+
+    A dropped connection is resumed with an HTTP Range request from the last
+    byte received, and the bytes yielded are checked against the size the
+    server advertised. Starts at `offset` when part of the video is already held.
+    """
+    expected_size = None
+    failures = 0
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=30, sock_read=VEO_DOWNLOAD_READ_TIMEOUT
+    )
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while expected_size is None or offset < expected_size:
+            headers = {"x-goog-api-key": API_KEY}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            received = 0
+
+            try:
+                async with session.get(uri, headers=headers) as response:
+                    if response.status == 416 and offset and expected_size in (None, offset):
+                        # Nothing left past the bytes we already hold
+                        break
+                    if response.status == 429 or response.status >= 500:
+                        response.raise_for_status()  # Transient: retried below
+                    if response.status not in (200, 206):
+                        raise RuntimeError(f"Video download failed: HTTP {response.status}")
+
+                    if response.status == 206:
+                        expected_size = (
+                            parse_content_range_total(response.headers.get("Content-Range"))
+                            or expected_size
+                        )
+                        skip = 0
+                    else:
+                        # Full body (first request, or the server ignored the Range header)
+                        if response.content_length is not None:
+                            expected_size = response.content_length
+                        skip = offset
+
+                    async for chunk in response.content.iter_chunked(VEO_DOWNLOAD_CHUNK_SIZE):
+                        if skip:
+                            dropped = min(skip, len(chunk))
+                            chunk = chunk[dropped:]
+                            skip -= dropped
+                            if not chunk:
+                                continue
+                        offset += len(chunk)
+                        received += len(chunk)
+                        yield chunk
+
+                if expected_size is None:
+                    # No advertised size: a cleanly finished body is all there is
+                    break
+                if offset > expected_size:
+                    raise RuntimeError(
+                        f"Video download overran advertised size: {offset} > {expected_size} bytes"
+                    )
+                if offset < expected_size:
+                    raise aiohttp.ClientPayloadError(
+                        f"Connection closed at {offset}/{expected_size} bytes"
+                    )
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Reconnects that made progress do not count against the retry budget
+                failures = 0 if received else failures + 1
+                if failures > VEO_DOWNLOAD_MAX_RETRIES:
+                    # Still a connection problem:
+                    # callers may keep what was received and resume later
+                    raise ConnectionError(
+                        f"Video download failed after {VEO_DOWNLOAD_MAX_RETRIES} retries: {str(e)}"
+                    ) from e
+                delay = min(VEO_SUBMIT_BACKOFF_MAX, 0.5 * 2 ** failures)
+                logger.warning(
+                    f"[{request_id}] Video download interrupted at {offset} bytes ({str(e)}), "
+                    f"resuming in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    if expected_size is not None and offset != expected_size:
+        raise RuntimeError(f"Video download incomplete: {offset}/{expected_size} bytes")
+
+
+async def stream_video_to_file(
+    uri: str, output_path: Path, part_path: Path, request_id: str
+) -> int:
+    """Stream a generated video into `part_path`, then rename it to `output_path`
+
+    Bytes already in `part_path` are kept and the download resumes after them.
+    The partial file survives connection failures and cancellation so a later
+    attempt can pick up where this one stopped; it is only discarded when the
+    download itself is bad (HTTP error, size mismatch).
+
+    Returns:
+        int: Size of the downloaded file in bytes
+    """
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    if offset:
+        logger.info(f"[{request_id}] Resuming partial download at {offset} bytes: {part_path}")
+
+    try:
+        with open(part_path, "ab") as part_file:
+            async for chunk in stream_gemini_video(uri, request_id, offset):
+                part_file.write(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError, asyncio.CancelledError):
+        raise
+    except BaseException:
+        if part_path.exists():
+            part_path.unlink()
+        raise
+
+    # Only a complete, size-checked download becomes visible in OUTPUT_DIR
+    os.replace(part_path, output_path)
+    return output_path.stat().st_size
+
+
+def partial_video_path(request_id: str, index: Optional[int] = None) -> Path:
+    """Stable `.part` path for one video of a generation, shared by every download attempt"""
+    return Path(OUTPUT_DIR) / f".{request_id}_{(index or 0) + 1}.mp4.part"
+
+
+def generated_video_filename(request_id: str, index: Optional[int] = None) -> str:
+    """Filename for a generated video
+
+    `index` numbers the candidates of a multi-video generation.
+    """
+    # Request suffix keeps concurrent generations apart
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    candidate = f"_{index + 1}" if index is not None else ""
+    return f"veo3_video_{timestamp}_{request_id[-6:]}{candidate}.mp4"
+
+
+async def download_generated_video(
+    generated_video: Any,
+    request_id: str,
+    ctx: Context,
+    index: Optional[int] = None
+) -> Path:
+    """Download a finished video from Gemini into OUTPUT_DIR
+
+    `index` numbers the candidates of a multi-video generation.
+    """
+    # Ensure output directory exists
+    output_dir = Path(OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / generated_video_filename(request_id, index)
+
+    # Download the video
+    await ctx.info(f"Downloading video to: {output_path}")
+    logger.info(f"[{request_id}] Downloading video from Gemini to local path: {output_path}")
+
+    uri = getattr(generated_video.video, "uri", None)
+    part_path = partial_video_path(request_id, index)
+    streamed = False
+    if VEO_STREAMING_DOWNLOAD and uri and is_url(uri):
+        try:
+            await stream_video_to_file(uri, output_path, part_path, request_id)
+            streamed = True
+        except Exception as e:
+            logger.warning(
+                f"[{request_id}] Streaming download failed, falling back to SDK download: {str(e)}"
+            )
+
+    if not streamed:
+        # Download the video file (the SDK holds the whole video in memory)
+        await run_gemini_call(gemini_client.files.download, file=generated_video.video)
+        await run_gemini_call(generated_video.video.save, str(output_path))
+        if part_path.exists():
+            part_path.unlink()
+
+    file_size = output_path.stat().st_size if output_path.exists() else 0
+    logger.info(f"[{request_id}] Video downloaded successfully, size: {file_size} bytes")
+
+    return output_path
+
+
+async def queue_generated_video(output_path: Path, request_id: str) -> dict:
+    """Hand one generated video to the background upload queue
+
+    Returns:
+        dict: Same shape as upload_generated_video, with the blob URL the
+        video will have and azure_upload_status "pending"
+    """
+    entry = await upload_queue.enqueue(str(output_path), output_path.name, request_id)
+    return {
+        "video_path": str(output_path),
+        "filename": output_path.name,
+        "file_size": output_path.stat().st_size if output_path.exists() else 0,
+        "azure_blob_url": entry["blob_url"],
+        "azure_upload_success": False,
+        "azure_upload_status": "pending",
+        "upload_id": entry["upload_id"],
+        "content_sha256": None,
+        "error": None
+    }
+
+
+async def upload_generated_video(output_path: Path, request_id: str, ctx: Context) -> dict:
+    """Upload one generated video to Azure Blob Storage if enabled
+
+    Returns:
+        dict: Local path, filename, size and Azure upload outcome for the video
+    """
+    filename = output_path.name
+    file_size = output_path.stat().st_size if output_path.exists() else 0
+
+    # Upload to Azure Blob Storage if enabled
+    azure_blob_url = None
+    azure_upload_success = False
+    upload_error = None
+    content_sha256 = None
+
+    if AZURE_UPLOAD_ENABLED and output_path.exists():
+        await ctx.info("Uploading video to Azure Blob Storage...")
+        logger.info(f"[{request_id}] Starting Azure Blob Storage upload")
+        logger.info(f"[{request_id}] Azure upload - File: {output_path}, Blob name: {filename}")
+
+        upload_result = await upload_to_azure_blob(
+            file_path=str(output_path),
+            blob_name=filename,
+            ctx=ctx
+        )
+        azure_upload_success = upload_result.success
+        azure_blob_url = upload_result.blob_url
+        upload_error = upload_result.error_message
+        content_sha256 = upload_result.content_sha256
+
+        if azure_upload_success:
+            logger.info(f"[{request_id}] ✅ Azure upload successful!")
+            logger.info(f"[{request_id}] 🔗 Azure Blob URL: {azure_blob_url}")
+            logger.info(f"[{request_id}] Azure upload time: {upload_result.upload_time:.2f}s")
+        else:
+            logger.error(f"[{request_id}] ❌ Azure upload failed: {upload_result.error_message}")
+    else:
+        if not AZURE_UPLOAD_ENABLED:
+            logger.info(f"[{request_id}] Azure upload disabled")
+        else:
+            upload_error = f"Video file not found for Azure upload: {output_path}"
+            logger.warning(f"[{request_id}] {upload_error}")
+
+    return {
+        "video_path": str(output_path),
+        "filename": filename,
+        "file_size": file_size,
+        "azure_blob_url": azure_blob_url,
+        "azure_upload_success": azure_upload_success,
+        "content_sha256": content_sha256,
+        "error": upload_error
+    }
+
+
+async def stream_video_to_azure(
+    uri: str,
+    blob_name: str,
+    request_id: str,
+    ctx: Context,
+    local_path: Optional[Path] = None
+) -> AzureBlobUploadResponse:
+    """Stream a generated video from Gemini straight into Azure staged blocks
+
+    Downloaded bytes are cut into AZURE_STREAM_BLOCK_SIZE blocks, each staged
+    while the next one is still downloading, and the block list is committed
+    once the download has been size-checked. Content hashes are computed on
+    the way through. The bytes are also written to `local_path` when given;
+    otherwise nothing is written to OUTPUT_DIR.
+    """
+    start_time = time.time()
+    blob_service_client = get_azure_blob_client()
+    if not blob_service_client:
+        raise RuntimeError("Failed to initialize Azure Blob client")
+
+    await ensure_azure_container(blob_service_client, ctx)
+    blob_client = blob_service_client.get_blob_client(
+        container=AZURE_CONTAINER_NAME, blob=blob_name
+    )
+
+    # Block ids are unique to this video, so blocks left uncommitted by another
+    # upload to the same blob name are never mixed into this one
+    upload_key = (
+        hashlib.sha256(f"{blob_name}|{uri}".encode()).hexdigest()[:16]
+        + f"{AZURE_STREAM_BLOCK_SIZE:08x}"
+    )
+    block_ids: list[str] = []
+    staging: Optional[asyncio.Future] = None
+
+    async def stage(block: bytes) -> None:
+        nonlocal staging
+        # At most one block uploads while the next one downloads
+        if staging is not None:
+            await staging
+        block_id = azure_block_id(len(block_ids), upload_key)
+        block_ids.append(block_id)
+        checksum = await asyncio.to_thread(transactional_checksum, block)
+        await upload_bandwidth.acquire(len(block), "interactive")
+        staging = asyncio.ensure_future(
+            blob_client.stage_block(block_id, block, validate_content=False, **checksum)
+        )
+
+    await ctx.info(f"Streaming {blob_name} to Azure Blob Storage...")
+    logger.info(f"[{request_id}] Streaming video from Gemini to Azure blob: {blob_name}")
+
+    part_path = local_path.with_name(local_path.name + ".part") if local_path else None
+    buffer = bytearray()
+    file_size = 0
+    hasher = ContentHasher()
+    try:
+        with open(part_path, "wb") if part_path else nullcontext() as local_file:
+            async for chunk in stream_gemini_video(uri, request_id):
+                file_size += len(chunk)
+                await asyncio.to_thread(hasher.update, chunk)
+                if local_file:
+                    local_file.write(chunk)
+                buffer += chunk
+                while len(buffer) >= AZURE_STREAM_BLOCK_SIZE:
+                    await stage(bytes(buffer[:AZURE_STREAM_BLOCK_SIZE]))
+                    del buffer[:AZURE_STREAM_BLOCK_SIZE]
+
+        if not file_size:
+            raise RuntimeError("Video download returned no data")
+        if buffer:
+            await stage(bytes(buffer))
+        assert staging is not None
+        await staging
+        properties = await blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=hasher.content_settings(),
+            metadata=hasher.metadata(),
+            tags=hasher.tags()
+        )
+    except BaseException:
+        # Never leave the block upload in flight behind a failed download or commit
+        if staging is not None:
+            staging.cancel()
+            await asyncio.gather(staging, return_exceptions=True)
+        if part_path and part_path.exists():
+            part_path.unlink()
+        raise
+
+    if part_path and local_path:
+        os.replace(part_path, local_path)
+    await record_blob_written(blob_name, file_size, hasher.metadata(), properties)
+
+    account = blob_service_client.account_name
+    blob_url = f"https://{account}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob_name}"
+    upload_time = time.time() - start_time
+    logger.info(
+        f"[{request_id}] ✅ Streamed {file_size} bytes in {len(block_ids)} blocks to {blob_url} "
+        f"({upload_time:.2f}s)"
+    )
+    await ctx.info(f"Successfully uploaded to Azure Blob: {blob_url}")
+
+    return AzureBlobUploadResponse(
+        success=True,
+        blob_url=blob_url,
+        upload_time=upload_time,
+        file_size=file_size,
+        content_md5=hasher.content_md5,
+        content_crc64=hasher.content_crc64,
+        content_sha256=hasher.content_sha256
+    )
+
+
+def zero_disk_enabled(generated_videos: list) -> bool:
+    """Whether the videos can be streamed from Gemini straight into Azure"""
+    return (
+        AZURE_STREAM_UPLOAD_ENABLED
+        and AZURE_UPLOAD_ENABLED
+        and BlobServiceClient is not None
+        and bool(AZURE_CONNECTION_STRING)
+        and all(is_url(getattr(video.video, "uri", None) or "") for video in generated_videos)
+    )
+
+
+async def stream_generated_video(
+    generated_video: Any,
+    request_id: str,
+    ctx: Context,
+    index: Optional[int] = None
+) -> dict:
+    """Deliver one generated video to Azure without a local round trip
+
+    Falls back to a regular download and upload if streaming fails.
+
+    Returns:
+        dict: Same shape as upload_generated_video; video_path is None when
+        VEO_KEEP_LOCAL_COPY is off
+    """
+    filename = generated_video_filename(request_id, index)
+    local_path = None
+    if VEO_KEEP_LOCAL_COPY:
+        Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+        local_path = Path(OUTPUT_DIR) / filename
+
+    try:
+        upload_result = await stream_video_to_azure(
+            generated_video.video.uri, filename, request_id, ctx, local_path
+        )
+    except Exception as e:
+        logger.warning(
+            f"[{request_id}] Streaming to Azure failed, falling back to download and upload: "
+            f"{str(e)}"
+        )
+        output_path = await download_generated_video(generated_video, request_id, ctx, index)
+        return await upload_generated_video(output_path, request_id, ctx)
+
+    return {
+        "video_path": str(local_path) if local_path else None,
+        "filename": filename,
+        "file_size": upload_result.file_size,
+        "azure_blob_url": upload_result.blob_url,
+        "azure_upload_success": True,
+        "content_sha256": upload_result.content_sha256,
+        "error": None
+    }
+
+
+async def run_generation_pipeline(
+    prompt: str,
+    model: str,
+    ctx: Context,
+    request_id: str,
+    start_time: float,
+    cache_key: str,
+    poll_interval: Optional[int],
+    max_poll_time: int,
+    job_id: Optional[str] = None,
+    image_path: Optional[str] = None,
+    image_obj: Optional[Any] = None,
+    image_sha256: Optional[str] = None,
+    resume: Optional[dict] = None,
+    priority: str = "interactive",
+    number_of_videos: int = 1
+) -> dict:
+    """Submit (or resume), wait for, download and upload one generation
+
+    Every candidate returned by the operation is downloaded and uploaded
+    concurrently; the first one is reported as the primary video.
+    """
+    stage = resume["stage"] if resume else None
+    videos = None
+
+    if resume and stage == "downloaded":
+        # Only the upload is left to do
+        output_paths = [
+            Path(path)
+            for path in json.loads(resume["video_paths"] or "null") or [resume["video_path"]]
+        ]
+    else:
+        resuming = bool(resume and stage in ("submitted", "polling", "uploading"))
+        # New generations wait for a scheduler slot and keep it until Veo has
+        # finished; resumed operations are already running and skip the queue
+        slot = nullcontext() if resuming else generation_scheduler.slot(model, ctx, lane=priority)
+        async with slot:
+            if resume and resuming:
+                # Re-attach to the operation that was already paid for
+                operation = genai_types.GenerateVideosOperation(  # type: ignore[call-arg]
+                    name=resume["operation_name"]
+                )
+                submitted_at = resume["submitted_at"]
+                await ctx.info(f"Resuming operation: {operation.name}")
+            else:
+                # Start video generation - using official API format
+                await ctx.report_progress(progress=5, total=100)
+
+                await asyncio.to_thread(
+                    generation_store.create,
+                    request_id=request_id,
+                    job_id=job_id,
+                    model=model,
+                    prompt=prompt,
+                    image_path=image_path,
+                    image_sha256=image_sha256,
+                    number_of_videos=number_of_videos
+                )
+                operation = await submit_generation(
+                    prompt, model, request_id, image_obj, number_of_videos
+                )
+                submitted_at = time.time()
+                await asyncio.to_thread(
+                    generation_store.update,
+                    request_id,
+                    stage="submitted",
+                    operation_name=operation.name,
+                    submitted_at=submitted_at
+                )
+
+            await ctx.report_progress(progress=10, total=100)
+
+            # Hand the operation to the shared poller and report progress while waiting
+            await asyncio.to_thread(generation_store.update, request_id, stage="polling")
+            operation = await wait_for_operation(
+                operation,
+                model=model,
+                ctx=ctx,
+                request_id=request_id,
+                submitted_at=submitted_at,
+                poll_interval=poll_interval,
+                max_poll_time=max_poll_time,
+                record_latency=resume is None
+            )
+
+        # Check if generation was successful
+        if not hasattr(operation.response, 'generated_videos') or not operation.response.generated_videos:
+            logger.error(f"[{request_id}] Video generation failed - no videos in response")
+            await ctx.report_progress(progress=0, total=100)  # Reset on error
+            raise RuntimeError("Video generation failed - no videos in response")
+
+        generated_videos = operation.response.generated_videos
+        logger.info(
+            f"[{request_id}] Video generation completed successfully ({len(generated_videos)} "
+            "video(s))"
+        )
+        for generated_video in generated_videos:
+            logger.info(f"[{request_id}] Generated video URI: {generated_video.video.uri}")
+
+        await ctx.report_progress(progress=90, total=100)
+
+        if zero_disk_enabled(generated_videos):
+            # Zero-disk mode: download and upload overlap, block by block. Nothing is
+            # on disk to resume from, so a restart re-attaches to the finished operation
+            await asyncio.to_thread(generation_store.update, request_id, stage="uploading")
+            videos = list(await asyncio.gather(*(
+                stream_generated_video(
+                    generated_video,
+                    request_id,
+                    ctx,
+                    index=index if len(generated_videos) > 1 else None
+                )
+                for index, generated_video in enumerate(generated_videos)
+            )))
+            await asyncio.to_thread(
+                generation_store.update,
+                request_id,
+                video_path=videos[0]["video_path"],
+                video_paths=json.dumps([video["video_path"] for video in videos]),
+                filename=videos[0]["filename"]
+            )
+        else:
+            # Download every returned candidate concurrently
+            output_paths = list(await asyncio.gather(*(
+                download_generated_video(
+                    generated_video,
+                    request_id,
+                    ctx,
+                    index=index if len(generated_videos) > 1 else None
+                )
+                for index, generated_video in enumerate(generated_videos)
+            )))
+            await asyncio.to_thread(
+                generation_store.update,
+                request_id,
+                stage="downloaded",
+                video_path=str(output_paths[0]),
+                video_paths=json.dumps([str(path) for path in output_paths]),
+                filename=output_paths[0].name
+            )
+
+    await ctx.report_progress(progress=95, total=100)
+
+    generation_time = time.time() - start_time
+
+    await ctx.info(f"Video generation completed in {generation_time:.1f} seconds")
+
+    if videos is None and AZURE_UPLOAD_ASYNC and AZURE_UPLOAD_ENABLED and get_azure_blob_client():
+        # Return as soon as the files are saved; the upload queue delivers them. The
+        # stage is recorded first so a fast upload's "uploaded" cannot be overwritten
+        urls = [azure_blob_url(output_path.name) for output_path in output_paths]
+        await asyncio.to_thread(
+            generation_store.update,
+            request_id,
+            stage="upload_queued",
+            azure_blob_url=urls[0],
+            azure_blob_urls=json.dumps(urls)
+        )
+        videos = [
+            await queue_generated_video(output_path, request_id) for output_path in output_paths
+        ]
+    elif videos is None:
+        # Upload every candidate concurrently, each to its own blob
+        videos = list(await asyncio.gather(*(
+            upload_generated_video(output_path, request_id, ctx) for output_path in output_paths
+        )))
+    azure_upload_success = all(video["azure_upload_success"] for video in videos)
+    upload_queued = any(video.get("azure_upload_status") == "pending" for video in videos)
+    primary = videos[0]
+
+    # A failed upload stays at "downloaded" so it is retried on the next start;
+    # queued uploads recorded their stage before they were queued
+    if azure_upload_success:
+        await asyncio.to_thread(
+            generation_store.update,
+            request_id,
+            stage="uploaded",
+            azure_blob_url=primary["azure_blob_url"],
+            azure_blob_urls=json.dumps([video["azure_blob_url"] for video in videos]),
+            error=None
+        )
+    elif not AZURE_UPLOAD_ENABLED:
+        await asyncio.to_thread(generation_store.update, request_id, stage="completed")
+    elif not upload_queued:
+        await asyncio.to_thread(
+            generation_store.update,
+            request_id,
+            error="; ".join(video["error"] for video in videos if video["error"])
+        )
+
+    await ctx.report_progress(progress=100, total=100)
+
+    # Log final results
+    logger.info(f"[{request_id}] 🎉 Video generation process completed!")
+    logger.info(f"[{request_id}] Final results:")
+    for video in videos:
+        logger.info(f"[{request_id}]   - Local file: {video['video_path']}")
+        logger.info(
+            f"[{request_id}]   - File size: {video['file_size']} bytes "
+            f"({video['file_size']/1024/1024:.1f} MB)"
+        )
+        logger.info(
+            f"[{request_id}]   - Azure URL: "
+            f"{video['azure_blob_url'] if video['azure_blob_url'] else 'Not uploaded'}"
+        )
+    logger.info(f"[{request_id}]   - Generation time: {generation_time:.1f}s")
+    logger.info(f"[{request_id}]   - Azure upload success: {azure_upload_success}")
+
+    result = {
+        "video_path": primary["video_path"],
+        "filename": primary["filename"],
+        "model": model,
+        "prompt": prompt,
+        "negative_prompt": None,  # Not supported in current API
+        "generation_time": generation_time,
+        "file_size": primary["file_size"],
+        "aspect_ratio": "16:9",  # Default for Veo 3
+        "azure_blob_url": primary["azure_blob_url"],
+        "azure_upload_success": azure_upload_success,
+        "videos": videos,
+        "cached": False
+    }
+    if upload_queued:
+        result["azure_upload_status"] = "pending"
+
+    if (
+        VEO_CACHE_ENABLED
+        and len(videos) == 1
+        and (azure_upload_success or not AZURE_UPLOAD_ENABLED)
+    ):
+        result_cache.put(cache_key, result)
+
+    return result
+
+
+async def generate_video_with_progress(
+    prompt: str,
+    model: str,
+    ctx: Context,
+    image_path: Optional[str] = None,
+    poll_interval: Optional[int] = None,  # Fixed poll interval; None schedules from latency history
+    max_poll_time: int = 2700,  # Increased to 45 minutes (3x original)
+    job_id: Optional[str] = None,
+    resume: Optional[dict] = None,
+    priority: str = "interactive",
+    bypass_cache: bool = False,
+    number_of_videos: int = 1
+) -> dict:
+    """Generate a video using Veo 3 with progress tracking
+
+    `number_of_videos` requests several candidates from one operation; all of
+    them are listed under `videos` in the result and only single-video
+    results are cached.
+
+    When the result cache is enabled, an identical earlier request (same model,
+    normalized prompt and image) is answered from the cache unless
+    `bypass_cache` is set, and identical requests already in flight share a
+    single generation. New submissions first wait for a slot from the
+    generation scheduler (`priority` picks the interactive or batch lane).
+    Every stage is recorded in the generation store. Passing a stored record
+    as `resume` continues an interrupted request from its last recorded stage
+    instead of starting a new generation.
+    """
+    
+    start_time = time.time()
+    request_id = (
+        resume["request_id"] if resume else f"veo3_{int(start_time)}_{uuid.uuid4().hex[:6]}"
+    )
+    stage = resume["stage"] if resume else None
+    
+    try:
+        # Log detailed request information
+        logger.info(
+            f"[{request_id}] {'Resuming' if resume else 'Starting'} video generation request"
+        )
+        logger.info(f"[{request_id}] Model: {model}")
+        logger.info(f"[{request_id}] Prompt: {prompt}")
+        logger.info(f"[{request_id}] Image path: {image_path if image_path else 'None'}")
+        logger.info(f"[{request_id}] Max poll time: {max_poll_time}s")
+        
+        await ctx.info(
+            f"{'Resuming' if resume else 'Starting'} video generation with model: {model}"
+        )
+        await ctx.info(f"Prompt: {prompt[:100]}...")
+        
+        image_obj = None
+        image_sha256 = resume["image_sha256"] if resume else None
+        if not stage and image_path and os.path.exists(image_path):
+            await ctx.info(f"Processing image: {image_path}")
+            logger.info(f"[{request_id}] Processing image file: {image_path}")
+            image_obj, image_bytes = await load_image_input(image_path, request_id)
+            image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+
+        cache_key = generation_cache_key(model, prompt, image_sha256, number_of_videos)
+        if VEO_CACHE_ENABLED and not stage and not bypass_cache and number_of_videos == 1:
+            cached = result_cache.get(cache_key)
+            if cached:
+                video_path = cached["video_path"]
+                file_size = (
+                    os.path.getsize(video_path)
+                    if video_path and os.path.exists(video_path)
+                    else cached["file_size"]
+                )
+                logger.info(
+                    f"[{request_id}] ⚡ Cache hit - returning "
+                    f"{cached['azure_blob_url'] or video_path}"
+                )
+                await ctx.info("Returning cached video for identical request")
+                await ctx.report_progress(progress=100, total=100)
+                return {
+                    "video_path": video_path,
+                    "filename": cached["filename"],
+                    "model": model,
+                    "prompt": prompt,
+                    "negative_prompt": None,
+                    "generation_time": time.time() - start_time,
+                    "file_size": file_size,
+                    "aspect_ratio": "16:9",
+                    "azure_blob_url": cached["azure_blob_url"],
+                    "azure_upload_success": bool(cached["azure_blob_url"]),
+                    "videos": [{
+                        "video_path": video_path,
+                        "filename": cached["filename"],
+                        "file_size": file_size,
+                        "azure_blob_url": cached["azure_blob_url"],
+                        "azure_upload_success": bool(cached["azure_blob_url"]),
+                        "error": None
+                    }],
+                    "cached": True
+                }
+
+        if stage:
+            return await run_generation_pipeline(
+                prompt=prompt,
+                model=model,
+                ctx=ctx,
+                request_id=request_id,
+                start_time=start_time,
+                cache_key=cache_key,
+                poll_interval=poll_interval,
+                max_poll_time=max_poll_time,
+                job_id=job_id,
+                resume=resume
+            )
+        
+        # Identical requests already in flight share one generation. A follower is
+        # recorded against its leader so a restart can hand it the leader's outcome
+        leader_request_id = inflight_generations.owner(cache_key)
+
+        async def record_follower() -> None:
+            await asyncio.to_thread(
+                generation_store.create,
+                request_id=request_id,
+                job_id=job_id,
+                model=model,
+                prompt=prompt,
+                image_path=image_path,
+                image_sha256=image_sha256,
+                number_of_videos=number_of_videos,
+                leader_request_id=leader_request_id
+            )
+
+        result, leader = await inflight_generations.run(
+            cache_key,
+            ctx,
+            lambda flight_ctx: run_generation_pipeline(
+                prompt=prompt,
+                model=model,
+                ctx=flight_ctx,
+                request_id=request_id,
+                start_time=start_time,
+                cache_key=cache_key,
+                poll_interval=poll_interval,
+                max_poll_time=max_poll_time,
+                job_id=job_id,
+                image_path=image_path,
+                image_obj=image_obj,
+                image_sha256=image_sha256,
+                priority=priority,
+                number_of_videos=number_of_videos
+            ),
+            owner=request_id,
+            on_join=record_follower
+        )
+        if not leader and leader_request_id:
+            await asyncio.to_thread(generation_store.copy_outcome, request_id, leader_request_id)
+        if not leader:
+            logger.info(
+                f"[{request_id}] Coalesced with an identical in-flight request: "
+                f"{result['filename']}"
+            )
+            result = {**result, "coalesced": True}
+        return result
+        
+    except Exception as e:
+        await asyncio.to_thread(generation_store.update, request_id, stage="failed", error=str(e))
+        logger.error(f"[{request_id}] ❌ Video generation failed with exception: {str(e)}")
+        logger.error(f"[{request_id}] Exception type: {type(e).__name__}")
+        logger.error(f"[{request_id}] Total elapsed time: {time.time() - start_time:.1f}s")
+        await ctx.report_progress(progress=0, total=100)  # Reset on error
+        await ctx.error(f"Video generation failed: {str(e)}")
+        raise ValueError(f"Video generation failed: {str(e)}")
+
+
+def candidate_urls(result: dict) -> Optional[list[str]]:
+    """Azure URLs of every candidate in a multi-video result (None for single-video results)"""
+    videos = result.get("videos") or []
+    if len(videos) < 2:
+        return None
+    return [video.get("azure_blob_url") for video in videos]
+
+
+class JobContext:
+    """Stand-in for the MCP context while a job runs in the background
+
+    The submitting tool call has already returned, so messages and progress
+    are recorded on the job for get_video_job/wait_video_job instead.
+    """
+
+    def __init__(self, job: "VideoJob"):
+        self.job = job
+
+    async def info(self, message: str) -> None:
+        self.job.message = message
+        self.job.touch()
+
+    async def error(self, message: str) -> None:
+        self.job.message = message
+        self.job.touch()
+        logger.error(f"[{self.job.job_id}] {message}")
+
+    @property
+    def session_id(self) -> str:
+        return self.job.session
+
+    async def report_progress(
+        self,
+        progress: float,
+        total: Optional[float] = 100,
+        message: Optional[str] = None
+    ) -> None:
+        self.job.progress = int(progress * 100 / total) if total else int(progress)
+        if message:
+            self.job.message = message
+        self.job.touch()
+
+
+class BatchItemContext:
+    """Context for one item of a batch
+
+    Keeps per-item chatter out of the batch caller's stream; the batch reports
+    each item once it finishes instead.
+    """
+
+    def __init__(self, parent: Context, index: int):
+        self.parent = parent
+        self.index = index
+        self.session = get_session_key(parent)
+        self.progress = 0.0
+
+    @property
+    def session_id(self) -> str:
+        return self.session
+
+    async def info(self, message: str) -> None:
+        logger.debug(f"[batch item {self.index}] {message}")
+
+    async def error(self, message: str) -> None:
+        logger.error(f"[batch item {self.index}] {message}")
+
+    async def report_progress(
+        self,
+        progress: float,
+        total: Optional[float] = 100,
+        message: Optional[str] = None
+    ) -> None:
+        self.progress = progress * 100 / total if total else progress
+
+
+class VideoJob:
+    """A video generation running in the background"""
+
+    def __init__(
+        self,
+        prompt: str,
+        model: str,
+        image_path: Optional[str] = None,
+        job_id: Optional[str] = None,
+        session: str = "default",
+        priority: str = "interactive",
+        number_of_videos: int = 1
+    ):
+        self.job_id = job_id or f"job_{uuid.uuid4().hex[:12]}"
+        self.prompt = prompt
+        self.model = model
+        self.image_path = image_path
+        self.session = session
+        self.priority = priority
+        self.number_of_videos = number_of_videos
+        self.status = "queued"
+        self.progress = 0
+        self.message: Optional[str] = None
+        self.created = datetime.now().isoformat()
+        self.updated = self.created
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.finished = asyncio.Event()
+
+    @classmethod
+    def from_record(cls, record: dict) -> "VideoJob":
+        """Rebuild a job that is no longer in memory from its stored generation record"""
+        job = cls(record["prompt"], record["model"], record["image_path"], job_id=record["job_id"])
+        if record["stage"] in ("uploaded", "completed", "upload_queued"):
+            job.status = "succeeded"
+            job.progress = 100
+            job.result = {
+                "video_path": record["video_path"],
+                "azure_blob_url": record["azure_blob_url"],
+            }
+            if record.get("azure_blob_urls"):
+                job.result["videos"] = [
+                    {"azure_blob_url": url} for url in json.loads(record["azure_blob_urls"])
+                ]
+        elif record["stage"] == "failed":
+            job.status = "failed"
+            job.error = record["error"]
+        else:
+            job.status = "interrupted"
+        job.created = record["created"]
+        job.updated = record["updated"]
+        job.finished.set()
+        return job
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "interrupted")
+
+    def touch(self) -> None:
+        self.updated = datetime.now().isoformat()
+
+    def to_response(self) -> VideoJobResponse:
+        return VideoJobResponse(
+            job_id=self.job_id,
+            status=self.status,
+            prompt=self.prompt,
+            model=self.model,
+            image_path=self.image_path,
+            progress=self.progress,
+            message=self.message,
+            created=self.created,
+            updated=self.updated,
+            video_path=self.result.get("video_path") if self.result else None,
+            azure_video_url=self.result.get("azure_blob_url") if self.result else None,
+            azure_video_urls=candidate_urls(self.result) if self.result else None,
+            error=self.error
+        )
+
+
+class VideoJobManager:
+    """Runs generate_video_with_progress in the background and tracks the jobs"""
+
+    def __init__(self, history_limit: int):
+        self.history_limit = max(1, history_limit)
+        self._jobs: dict[str, VideoJob] = {}
+
+    def submit(
+        self,
+        prompt: str,
+        model: str,
+        image_path: Optional[str] = None,
+        session: str = "default",
+        priority: str = "interactive",
+        number_of_videos: int = 1
+    ) -> VideoJob:
+        """Create a job and start it without waiting for the result"""
+        job = VideoJob(
+            prompt,
+            model,
+            image_path,
+            session=session,
+            priority=priority,
+            number_of_videos=number_of_videos,
+        )
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job))
+        self._evict()
+        logger.info(f"[{job.job_id}] Job submitted - Model: {model}, Prompt: {prompt}")
+        return job
+
+    def resume(self, record: dict) -> VideoJob:
+        """Continue an interrupted generation as a background job"""
+        job = VideoJob(
+            record["prompt"], record["model"], record["image_path"], job_id=record["job_id"]
+        )
+        if not record["job_id"]:
+            generation_store.update(record["request_id"], job_id=job.job_id)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, resume=record))
+        logger.info(
+            f"[{job.job_id}] Resuming {record['request_id']} from stage '{record['stage']}'"
+        )
+        return job
+
+    def follow(self, record: dict, leader: VideoJob) -> VideoJob:
+        """Reattach a coalesced request to its resumed leader after a restart"""
+        job = VideoJob(
+            record["prompt"], record["model"], record["image_path"], job_id=record["job_id"]
+        )
+        if not record["job_id"]:
+            generation_store.update(record["request_id"], job_id=job.job_id)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._follow(job, record, leader))
+        logger.info(
+            f"[{job.job_id}] Waiting for {record['leader_request_id']} again after restart"
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[VideoJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            try:
+                record = generation_store.find_job(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"[{job_id}] Failed to look up stored job: {str(e)}")
+                record = None
+            if record:
+                job = VideoJob.from_record(record)
+        return job
+
+    def list(self, status: Optional[str] = None) -> list[VideoJob]:
+        jobs = [job for job in self._jobs.values() if status is None or job.status == status]
+        return sorted(jobs, key=lambda job: job.created, reverse=True)
+
+    async def _run(self, job: VideoJob, resume: Optional[dict] = None) -> None:
+        ctx = cast(Context, JobContext(job))
+        temp_image_path = None
+        job.status = "running"
+        job.touch()
+        try:
+            full_image_path = None
+            if job.image_path and not resume:
+                full_image_path, temp_image_path = await resolve_image_path(job.image_path, ctx)
+            job.result = await generate_video_with_progress(
+                prompt=job.prompt,
+                model=job.model,
+                ctx=ctx,
+                image_path=full_image_path or job.image_path,
+                job_id=job.job_id,
+                resume=resume,
+                priority=job.priority,
+                number_of_videos=job.number_of_videos
+            )
+            job.status = "succeeded"
+            job.progress = 100
+            logger.info(f"[{job.job_id}] ✅ Job succeeded: {job.result.get('azure_blob_url')}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"[{job.job_id}] ❌ Job failed: {str(e)}")
+        finally:
+            if temp_image_path and os.path.exists(temp_image_path):
+                try:
+                    os.unlink(temp_image_path)
+                except Exception as e:
+                    logger.warning(
+                        f"[{job.job_id}] Failed to clean up temporary file {temp_image_path}: "
+                        f"{str(e)}"
+                    )
+            job.touch()
+            job.finished.set()
+
+    async def _follow(self, job: VideoJob, record: dict, leader: VideoJob) -> None:
+        job.status = "running"
+        job.message = f"Attached to identical generation {leader.job_id}"
+        job.touch()
+        try:
+            await leader.finished.wait()
+            job.status = leader.status
+            job.progress = leader.progress
+            job.error = leader.error
+            if leader.result is not None:
+                job.result = {**leader.result, "coalesced": True}
+            if await asyncio.to_thread(
+                generation_store.copy_outcome, record["request_id"], record["leader_request_id"]
+            ) is None:
+                await asyncio.to_thread(
+                    generation_store.update,
+                    record["request_id"],
+                    stage="failed",
+                    error=job.error or "Leader was lost"
+                )
+        finally:
+            job.touch()
+            job.finished.set()
+
+    def _evict(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(self._jobs) - self.history_limit
+        for job in sorted(finished, key=lambda job: job.updated)[:max(0, excess)]:
+            self._jobs.pop(job.job_id, None)
+
+
+job_manager = VideoJobManager(history_limit=VEO_JOB_HISTORY_LIMIT)
+
+
+async def resume_unfinished_generations() -> int:
+    """Pick up generations interrupted by a restart instead of regenerating them
+
+    Returns:
+        int: Number of generations resumed
+    """
+    try:
+        records = generation_store.unfinished()
+        # Requests that never got an operation name cannot be recovered
+        generation_store.db.execute(
+            "UPDATE generations SET stage = 'failed', error = ?, updated = ?"
+            " WHERE stage = 'pending'",
+            ("Interrupted before submission", datetime.now().isoformat()),
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Failed to load unfinished generations: {str(e)}")
+        return 0
+
+    resumed = 0
+    leaders: dict[str, VideoJob] = {}
+    for record in records:
+        if (
+            record["stage"] != "downloaded"
+            and time.time() - (record["submitted_at"] or 0) > VEO_OPERATION_RETENTION
+        ):
+            generation_store.update(
+                record["request_id"],
+                stage="failed",
+                error="Operation expired before it could be resumed",
+            )
+            continue
+        if record["stage"] == "downloaded" and not os.path.exists(record["video_path"] or ""):
+            generation_store.update(
+                record["request_id"], stage="failed", error="Downloaded video is missing"
+            )
+            continue
+        leaders[record["request_id"]] = job_manager.resume(record)
+        resumed += 1
+
+    # Coalesced requests wait for their resumed leader or take its stored outcome
+    try:
+        followers = generation_store.following()
+    except sqlite3.Error as e:
+        logger.error(f"Failed to load coalesced generations: {str(e)}")
+        followers = []
+    for record in followers:
+        leader_job = leaders.get(record["leader_request_id"])
+        if leader_job is not None:
+            job_manager.follow(record, leader_job)
+            resumed += 1
+        elif generation_store.copy_outcome(
+            record["request_id"], record["leader_request_id"]
+        ) is None:
+            generation_store.update(
+                record["request_id"],
+                stage="failed",
+                error="Interrupted before the identical generation was submitted",
             )
-        
-        logger.info(f"[{request_id}] API call initiated, operation name: {operation.name}")
-        
-        await ctx.report_progress(progress=10, total=100)
-        
-        # Poll for completion with progress updates
-        poll_count = 0
-        while not operation.done:
-            elapsed = time.time() - start_time
-            poll_count += 1
-            
-            if elapsed > max_poll_time:
-                logger.error(f"[{request_id}] Video generation timed out after {max_poll_time}s, {poll_count} polls")
-                await ctx.report_progress(progress=0, total=100)  # Reset on timeout
-                raise TimeoutError(f"Video generation timed out after {max_poll_time} seconds")
-            
-            # Calculate progress based on elapsed time (rough estimate)
-            # Most generations take 30-300 seconds, so we'll estimate progress
-            estimated_progress = min(10 + (elapsed / 300) * 80, 85)  # Cap at 85% until done
-            await ctx.report_progress(progress=int(estimated_progress), total=100)
-            
-            # Log polling status every 5 polls to avoid spam
-            if poll_count % 5 == 0:
-                logger.info(f"[{request_id}] Polling status - Poll #{poll_count}, Elapsed: {elapsed:.1f}s, Progress: {estimated_progress:.1f}%")
-            
-            await ctx.info(f"Generating video... ({elapsed:.1f}s elapsed)")
-            await asyncio.sleep(poll_interval)
-            operation = gemini_client.operations.get(operation)
-        
-        # Check if generation was successful
-        if not hasattr(operation.response, 'generated_videos') or not operation.response.generated_videos:
-            logger.error(f"[{request_id}] Video generation failed - no videos in response")
-            await ctx.report_progress(progress=0, total=100)  # Reset on error
-            raise RuntimeError("Video generation failed - no videos in response")
-        
-        generated_video = operation.response.generated_videos[0]
-        logger.info(f"[{request_id}] Video generation completed successfully")
-        logger.info(f"[{request_id}] Generated video URI: {generated_video.video.uri}")
-        
-        await ctx.report_progress(progress=90, total=100)
-        
-        # Ensure output directory exists
-        output_dir = Path(OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"veo3_video_{timestamp}.mp4"
-        output_path = output_dir / filename
-        
-        # Download the video
-        await ctx.info(f"Downloading video to: {output_path}")
-        logger.info(f"[{request_id}] Downloading video from Gemini to local path: {output_path}")
-        # Download the video file
-        gemini_client.files.download(file=generated_video.video)
-        generated_video.video.save(str(output_path))
-        
-        file_size = output_path.stat().st_size if output_path.exists() else 0
-        logger.info(f"[{request_id}] Video downloaded successfully, size: {file_size} bytes")
-        
-        await ctx.report_progress(progress=95, total=100)
-        
-        file_size = output_path.stat().st_size if output_path.exists() else 0
-        generation_time = time.time() - start_time
-        
-        await ctx.info(f"Video generation completed in {generation_time:.1f} seconds")
-        
-        # Upload to Azure Blob Storage if enabled
-        azure_blob_url = None
-        azure_upload_success = False
-        
-        if AZURE_UPLOAD_ENABLED and output_path.exists():
-            await ctx.info("Uploading video to Azure Blob Storage...")
-            logger.info(f"[{request_id}] Starting Azure Blob Storage upload")
-            logger.info(f"[{request_id}] Azure upload - File: {output_path}, Blob name: {filename}")
-            
-            upload_result = await upload_to_azure_blob(
-                file_path=str(output_path),
-                blob_name=filename,
-                ctx=ctx
-            )
-            azure_upload_success = upload_result.success
-            azure_blob_url = upload_result.blob_url
-            
-            if azure_upload_success:
-                logger.info(f"[{request_id}] ✅ Azure upload successful!")
-                logger.info(f"[{request_id}] 🔗 Azure Blob URL: {azure_blob_url}")
-                logger.info(f"[{request_id}] Azure upload time: {upload_result.upload_time:.2f}s")
-            else:
-                logger.error(f"[{request_id}] ❌ Azure upload failed: {upload_result.error_message}")
-        else:
-            if not AZURE_UPLOAD_ENABLED:
-                logger.info(f"[{request_id}] Azure upload disabled")
-            else:
-                logger.warning(f"[{request_id}] Video file not found for Azure upload: {output_path}")
-        
-        await ctx.report_progress(progress=100, total=100)
-        
-        # Log final results
-        logger.info(f"[{request_id}] 🎉 Video generation process completed!")
-        logger.info(f"[{request_id}] Final results:")
-        logger.info(f"[{request_id}]   - Local file: {output_path}")
-        logger.info(f"[{request_id}]   - File size: {file_size} bytes ({file_size/1024/1024:.1f} MB)")
-        logger.info(f"[{request_id}]   - Generation time: {generation_time:.1f}s")
-        logger.info(f"[{request_id}]   - Azure URL: {azure_blob_url if azure_blob_url else 'Not uploaded'}")
-        logger.info(f"[{request_id}]   - Azure upload success: {azure_upload_success}")
-        
-        result = {
-            "video_path": str(output_path),
-            "filename": filename,
-            "model": model,
-            "prompt": prompt,
-            "negative_prompt": None,  # Not supported in current API
-            "generation_time": generation_time,
-            "file_size": file_size,
-            "aspect_ratio": "16:9",  # Default for Veo 3
-            "azure_blob_url": azure_blob_url,
-            "azure_upload_success": azure_upload_success
-        }
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"[{request_id}] ❌ Video generation failed with exception: {str(e)}")
-        logger.error(f"[{request_id}] Exception type: {type(e).__name__}")
-        logger.error(f"[{request_id}] Total elapsed time: {time.time() - start_time:.1f}s")
-        await ctx.report_progress(progress=0, total=100)  # Reset on error
-        await ctx.error(f"Video generation failed: {str(e)}")
-        raise ValueError(f"Video generation failed: {str(e)}")
+
+    if resumed:
+        logger.info(f"Resumed {resumed} unfinished video generation(s)")
+    return resumed
+
 
 @mcp.tool()
 async def generate_video(
     prompt: str,
     ctx: Context,
-    model: str = "veo-3.0-generate-preview"
+    model: str = "veo-3.0-generate-preview",
+    bypass_cache: bool = False,
+    number_of_videos: int = 1
 ) -> dict:
     """Generate a video using Google Veo 3 from a text prompt
     
     Args:
         prompt: Text prompt describing the video to generate
         model: Veo model to use (veo-3.0-generate-preview, veo-3.0-fast-generate-preview, veo-2.0-generate-001)
+        bypass_cache: Always generate a new video even if an identical request is cached
+        number_of_videos: Candidate videos to generate from one request (1 to VEO_MAX_CANDIDATES)
     
     Returns:
-        dict: JSON containing the Azure Blob Storage video URL
+        dict: JSON containing the Azure Blob Storage video URL, plus
+        azure_video_urls listing every candidate when number_of_videos > 1
     
     Note: Veo 3 generates 8-second 720p videos with audio. Aspect ratio and other advanced 
     parameters are not currently supported in the public API.
@@ -551,7 +5240,10 @@ async def generate_video(
     
     tool_call_id = f"generate_video_{int(time.time())}"
     logger.info(f"[{tool_call_id}] 🎬 MCP Tool Called: generate_video")
-    logger.info(f"[{tool_call_id}] Parameters: prompt='{prompt}', model='{model}'")
+    logger.info(
+        f"[{tool_call_id}] Parameters: prompt='{prompt}', model='{model}', "
+        f"bypass_cache={bypass_cache}, number_of_videos={number_of_videos}"
+    )
     
     await ctx.info(f"Starting video generation with prompt: {prompt[:100]}...")
     
@@ -560,16 +5252,16 @@ async def generate_video(
         raise ValueError("Prompt cannot be empty")
     
     # Validate model
-    valid_models = ["veo-3.0-generate-preview", "veo-3.0-fast-generate-preview", "veo-2.0-generate-001"]
-    if model not in valid_models:
-        await ctx.error(f"Invalid model: {model}. Must be one of: {valid_models}")
-        raise ValueError(f"Invalid model: {model}")
+    await validate_model(model, ctx)
+    await validate_number_of_videos(number_of_videos, ctx)
     
     try:
         result = await generate_video_with_progress(
             prompt=prompt,
             model=model,
-            ctx=ctx
+            ctx=ctx,
+            bypass_cache=bypass_cache,
+            number_of_videos=number_of_videos
         )
         
         await ctx.info(f"Video generated successfully: {result['filename']}")
@@ -578,6 +5270,10 @@ async def generate_video(
         response = {
             "azure_video_url": result.get('azure_blob_url')
         }
+        if candidate_urls(result):
+            response["azure_video_urls"] = candidate_urls(result)
+        if result.get("azure_upload_status"):
+            response["azure_upload_status"] = result["azure_upload_status"]
         
         logger.info(f"[{tool_call_id}] ✅ MCP Tool Response: {response}")
         logger.info(f"[{tool_call_id}] 🎬 generate_video completed successfully")
@@ -595,7 +5291,9 @@ async def generate_video_from_image(
     prompt: str,
     image_path: str,
     ctx: Context,
-    model: str = "veo-3.0-generate-preview"
+    model: str = "veo-3.0-generate-preview",
+    bypass_cache: bool = False,
+    number_of_videos: int = 1
 ) -> dict:
     """Generate a video using Google Veo 3 from an image and text prompt
     
@@ -603,9 +5301,12 @@ async def generate_video_from_image(
         prompt: Text prompt describing the video motion/action
         image_path: Path to the starting image file or URL to an online image
         model: Veo model to use (veo-3.0-generate-preview, veo-3.0-fast-generate-preview, veo-2.0-generate-001)
+        bypass_cache: Always generate a new video even if an identical request is cached
+        number_of_videos: Candidate videos to generate from one request (1 to VEO_MAX_CANDIDATES)
     
     Returns:
-        dict: JSON containing the Azure Blob Storage video URL
+        dict: JSON containing the Azure Blob Storage video URL, plus
+        azure_video_urls listing every candidate when number_of_videos > 1
         
     Note: Veo 3 generates 8-second 720p videos with audio. Advanced parameters like 
     negative prompts and aspect ratios are not currently supported in the public API.
@@ -626,41 +5327,34 @@ async def generate_video_from_image(
     full_image_path = None
     
     try:
-        if is_url(image_path):
-            # Download image from URL to temporary file
-            full_image_path = await download_image_from_url(image_path, ctx)
-            temp_image_path = full_image_path  # Keep track for cleanup
-        else:
-            # Handle local file path (allow relative paths within output directory for security)
-            if not os.path.isabs(image_path):
-                full_image_path = safe_join(OUTPUT_DIR, image_path)
-            else:
-                full_image_path = image_path
-            
-            if not os.path.exists(full_image_path):
-                await ctx.error(f"Image file not found: {full_image_path}")
-                raise ValueError(f"Image file not found: {full_image_path}")
+        # Download URL images to a temporary file (kept track of for cleanup)
+        full_image_path, temp_image_path = await resolve_image_path(image_path, ctx)
         
         # Validate model
-        valid_models = ["veo-3.0-generate-preview", "veo-3.0-fast-generate-preview", "veo-2.0-generate-001"]
-        if model not in valid_models:
-            await ctx.error(f"Invalid model: {model}. Must be one of: {valid_models}")
-            raise ValueError(f"Invalid model: {model}")
+        await validate_model(model, ctx)
+        await validate_number_of_videos(number_of_videos, ctx)
         
         # Generate video
         result = await generate_video_with_progress(
             prompt=prompt,
             model=model,
             ctx=ctx,
-            image_path=full_image_path
+            image_path=full_image_path,
+            bypass_cache=bypass_cache,
+            number_of_videos=number_of_videos
         )
         
         await ctx.info(f"Image-to-video generation successful: {result['filename']}")
         
         # Return simple JSON with only Azure video URL
-        return {
+        response = {
             "azure_video_url": result.get('azure_blob_url')
         }
+        if candidate_urls(result):
+            response["azure_video_urls"] = candidate_urls(result)
+        if result.get("azure_upload_status"):
+            response["azure_upload_status"] = result["azure_upload_status"]
+        return response
         
     except Exception as e:
         await ctx.error(f"Image-to-video generation failed: {str(e)}")
@@ -676,6 +5370,264 @@ async def generate_video_from_image(
                 await ctx.info(f"Warning: Failed to clean up temporary file {temp_image_path}: {str(e)}")
 
 
+@mcp.tool()
+async def generate_videos_batch(
+    items: list[dict],
+    ctx: Context,
+    concurrency: int = VEO_BATCH_DEFAULT_CONCURRENCY,
+    bypass_cache: bool = False
+) -> VideoBatchResponse:
+    """Generate many videos in one call, reporting each result as soon as it finishes
+
+    Args:
+        items: List of {"prompt": str, "model": str (optional),
+            "image_path": local path or URL (optional), "number_of_videos": int (optional)}
+        concurrency: Maximum items generating at once (capped by VEO_BATCH_MAX_CONCURRENCY)
+        bypass_cache: Always generate new videos even if identical requests are cached
+
+    Returns:
+        VideoBatchResponse with one result per item, in input order. Failed items
+        carry their error and do not stop the rest of the batch.
+
+    Note: Batch items run in the scheduler's batch lane, behind interactive requests.
+    For batches that outlive the client timeout, use submit_video_job per item.
+    """
+
+    if not items:
+        await ctx.error("Batch must contain at least one item")
+        raise ValueError("Batch must contain at least one item")
+
+    if len(items) > VEO_BATCH_MAX_ITEMS:
+        await ctx.error(f"Batch too large: {len(items)} items (max {VEO_BATCH_MAX_ITEMS})")
+        raise ValueError(f"Batch too large: {len(items)} items (max {VEO_BATCH_MAX_ITEMS})")
+
+    batch_id = f"batch_{int(time.time())}_{uuid.uuid4().hex[:6]}"
+    concurrency = max(1, min(concurrency, VEO_BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.info(f"[{batch_id}] 🎬 Batch of {len(items)} items, concurrency {concurrency}")
+    await ctx.info(f"Starting batch of {len(items)} videos ({concurrency} at a time)")
+
+    async def run_item(index: int, item: dict) -> dict:
+        prompt = str(item.get("prompt") or "")
+        model = item.get("model") or "veo-3.0-generate-preview"
+        image_path = item.get("image_path") or None
+        number_of_videos = item.get("number_of_videos") or 1
+        outcome = {"index": index, "prompt": prompt, "model": model, "image_path": image_path}
+        item_ctx = cast(Context, BatchItemContext(ctx, index))
+        temp_image_path = None
+
+        try:
+            if not prompt.strip():
+                raise ValueError("Prompt cannot be empty")
+            if model not in VALID_MODELS:
+                raise ValueError(f"Invalid model: {model}. Must be one of: {VALID_MODELS}")
+            if (
+                not isinstance(number_of_videos, int)
+                or not 1 <= number_of_videos <= VEO_MAX_CANDIDATES
+            ):
+                raise ValueError(
+                    f"Invalid number_of_videos: {number_of_videos}. Must be between 1 and "
+                    f"{VEO_MAX_CANDIDATES}"
+                )
+
+            async with semaphore:
+                full_image_path = None
+                if image_path:
+                    full_image_path, temp_image_path = await resolve_image_path(
+                        image_path, item_ctx
+                    )
+                result = await generate_video_with_progress(
+                    prompt=prompt,
+                    model=model,
+                    ctx=item_ctx,
+                    image_path=full_image_path,
+                    priority="batch",
+                    bypass_cache=bypass_cache,
+                    number_of_videos=number_of_videos
+                )
+            outcome.update({
+                "status": "succeeded",
+                "azure_video_url": result.get("azure_blob_url"),
+                "azure_video_urls": candidate_urls(result),
+                "azure_upload_status": result.get("azure_upload_status"),
+                "video_path": result.get("video_path"),
+                "cached": result.get("cached", False),
+                "coalesced": result.get("coalesced", False)
+            })
+        except Exception as e:
+            outcome.update({"status": "failed", "error": str(e)})
+        finally:
+            if temp_image_path and os.path.exists(temp_image_path):
+                try:
+                    os.unlink(temp_image_path)
+                except Exception as e:
+                    logger.warning(
+                        f"[{batch_id}] Failed to clean up temporary file {temp_image_path}: "
+                        f"{str(e)}"
+                    )
+        return outcome
+
+    tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+    results = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            outcome = await finished
+            results.append(outcome)
+
+            # Stream each item's result as soon as it is known
+            message = (
+                f"Item {outcome['index']} {outcome['status']} ({len(results)}/{len(items)} done)"
+            )
+            await report_status(ctx, progress=len(results) * 100 / len(items), message=message)
+            await ctx.info(json.dumps(outcome, ensure_ascii=False))
+            if outcome["status"] == "failed":
+                logger.error(f"[{batch_id}] ❌ Item {outcome['index']} failed: {outcome['error']}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    results.sort(key=lambda outcome: outcome["index"])
+    succeeded = sum(1 for outcome in results if outcome["status"] == "succeeded")
+    logger.info(f"[{batch_id}] 🎉 Batch finished: {succeeded}/{len(items)} succeeded")
+
+    return VideoBatchResponse(
+        results=results,
+        total_count=len(results),
+        succeeded_count=succeeded,
+        failed_count=len(results) - succeeded
+    )
+
+
+@mcp.tool()
+async def submit_video_job(
+    prompt: str,
+    ctx: Context,
+    model: str = "veo-3.0-generate-preview",
+    image_path: Optional[str] = None,
+    priority: str = "interactive",
+    number_of_videos: int = 1
+) -> VideoJobResponse:
+    """Submit a video generation job and return immediately with its job id
+
+    Args:
+        prompt: Text prompt describing the video to generate
+        model: Veo model to use (veo-3.0-generate-preview, veo-3.0-fast-generate-preview, veo-2.0-generate-001)
+        image_path: Optional starting image (local path or URL) for image-to-video
+        priority: Scheduling lane, "interactive" (default) or "batch"
+        number_of_videos: Candidate videos to generate from one request (1 to VEO_MAX_CANDIDATES)
+
+    Returns:
+        VideoJobResponse with the job id and initial status. Use get_video_job or
+        wait_video_job to follow the job.
+    """
+
+    if not prompt.strip():
+        await ctx.error("Prompt cannot be empty")
+        raise ValueError("Prompt cannot be empty")
+
+    await validate_model(model, ctx)
+    await validate_number_of_videos(number_of_videos, ctx)
+
+    if priority not in GenerationScheduler.LANES:
+        await ctx.error(
+            f"Invalid priority: {priority}. Must be one of: {list(GenerationScheduler.LANES)}"
+        )
+        raise ValueError(f"Invalid priority: {priority}")
+
+    job = job_manager.submit(
+        prompt=prompt,
+        model=model,
+        image_path=image_path or None,
+        session=get_session_key(ctx),
+        priority=priority,
+        number_of_videos=number_of_videos
+    )
+    await ctx.info(f"Submitted video job: {job.job_id}")
+
+    return job.to_response()
+
+
+@mcp.tool()
+async def get_video_job(job_id: str, ctx: Context) -> VideoJobResponse:
+    """Get the current status of a video generation job
+
+    Args:
+        job_id: Job id returned by submit_video_job
+
+    Returns:
+        VideoJobResponse with status, progress and, once finished, the Azure video URL
+    """
+
+    job = job_manager.get(job_id)
+    if not job:
+        await ctx.error(f"Job not found: {job_id}")
+        raise ValueError(f"Job not found: {job_id}")
+
+    return job.to_response()
+
+
+@mcp.tool()
+async def wait_video_job(
+    job_id: str,
+    ctx: Context,
+    timeout: float = 60
+) -> VideoJobResponse:
+    """Wait up to `timeout` seconds for a video generation job to finish
+
+    Args:
+        job_id: Job id returned by submit_video_job
+        timeout: Maximum seconds to wait (capped by VEO_JOB_MAX_WAIT)
+
+    Returns:
+        VideoJobResponse with the job state when it finished or the wait timed out
+    """
+
+    job = job_manager.get(job_id)
+    if not job:
+        await ctx.error(f"Job not found: {job_id}")
+        raise ValueError(f"Job not found: {job_id}")
+
+    timeout = max(0.0, min(timeout, VEO_JOB_MAX_WAIT))
+    deadline = time.monotonic() + timeout
+
+    while not job.done:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await ctx.report_progress(progress=job.progress, total=100)
+        try:
+            await asyncio.wait_for(
+                job.finished.wait(), timeout=min(VEO_PROGRESS_INTERVAL, remaining)
+            )
+        except asyncio.TimeoutError:
+            pass
+
+    if job.done:
+        await ctx.report_progress(progress=100, total=100)
+
+    return job.to_response()
+
+
+@mcp.tool()
+async def list_video_jobs(ctx: Context, status: Optional[str] = None) -> VideoJobListResponse:
+    """List video generation jobs, newest first
+
+    Args:
+        status: Optional filter (queued, running, succeeded, failed, interrupted)
+
+    Returns:
+        VideoJobListResponse with job summaries
+    """
+
+    jobs = [job.to_response().model_dump() for job in job_manager.list(status)]
+    await ctx.info(f"Found {len(jobs)} video jobs")
+
+    return VideoJobListResponse(
+        jobs=jobs,
+        total_count=len(jobs)
+    )
+
+
 @mcp.tool()
 async def list_generated_videos(ctx: Context) -> VideoListResponse:
     """List all generated videos in the output directory
@@ -782,13 +5734,16 @@ async def get_video_info(video_path: str, ctx: Context) -> VideoInfoResponse:
 async def upload_video_to_azure(
     video_path: str,
     ctx: Context,
-    blob_name: Optional[str] = None
+    blob_name: Optional[str] = None,
+    dedup: Optional[str] = None
 ) -> AzureBlobUploadResponse:
     """Upload a video file to Azure Blob Storage
     
     Args:
         video_path: Path to the video file (can be relative to output directory)
         blob_name: Optional custom blob name (defaults to filename)
+        dedup: "off", "reuse" (return the URL of a blob that already has the same
+            content) or "copy" (server-side copy of it to blob_name); defaults to AZURE_UPLOAD_DEDUP
     
     Returns:
         AzureBlobUploadResponse with upload status and blob URL
@@ -800,6 +5755,10 @@ async def upload_video_to_azure(
         await ctx.error("Video path cannot be empty")
         raise ValueError("Video path cannot be empty")
     
+    if dedup is not None and dedup not in DEDUP_MODES:
+        await ctx.error(f"Invalid dedup: {dedup}. Must be one of: {DEDUP_MODES}")
+        raise ValueError(f"Invalid dedup: {dedup}")
+
     # Resolve video path (allow relative paths within output directory for security)
     if not os.path.isabs(video_path):
         full_video_path = safe_join(OUTPUT_DIR, video_path)
@@ -819,20 +5778,135 @@ async def upload_video_to_azure(
     return await upload_to_azure_blob(
         file_path=str(video_file),
         blob_name=blob_name,
-        ctx=ctx
+        ctx=ctx,
+        lane="bulk",
+        dedup=dedup
+    )
+
+
+@mcp.tool()
+async def list_upload_queue(ctx: Context, status: Optional[str] = None) -> UploadQueueResponse:
+    """List uploads handled by the background upload queue
+
+    Args:
+        status: Optional filter: pending, uploading, succeeded or dead (failed for good)
+
+    Returns:
+        UploadQueueResponse with the queued uploads, newest first, including
+        attempts and the last error
+    """
+
+    if status and status not in BackgroundUploadQueue.STATUSES:
+        await ctx.error(
+            f"Invalid status: {status}. Must be one of: {list(BackgroundUploadQueue.STATUSES)}"
+        )
+        raise ValueError(f"Invalid status: {status}")
+
+    try:
+        uploads = upload_queue.list(status)
+    except sqlite3.Error as e:
+        await ctx.error(f"Failed to read upload queue: {str(e)}")
+        raise ValueError(f"Failed to read upload queue: {str(e)}")
+
+    await ctx.info(f"Found {len(uploads)} queued uploads")
+
+    return UploadQueueResponse(
+        uploads=uploads,
+        total_count=len(uploads)
     )
 
 
 @mcp.tool()
-async def list_azure_blob_videos(ctx: Context) -> AzureBlobListResponse:
-    """List all videos in Azure Blob Storage container
+async def retry_failed_uploads(ctx: Context, upload_id: Optional[str] = None) -> dict:
+    """Put dead-lettered background uploads back on the queue
+
+    Args:
+        upload_id: Upload to retry; retries every dead-lettered upload if omitted
+
+    Returns:
+        dict: Number of uploads queued again
+    """
+
+    try:
+        count = await upload_queue.replay(upload_id or None)
+    except sqlite3.Error as e:
+        await ctx.error(f"Failed to retry uploads: {str(e)}")
+        raise ValueError(f"Failed to retry uploads: {str(e)}")
+
+    if upload_id and not count:
+        await ctx.error(f"No failed upload found: {upload_id}")
+        raise ValueError(f"No failed upload found: {upload_id}")
+
+    await ctx.info(f"Queued {count} failed uploads again")
+
+    return {
+        "success": True,
+        "requeued": count
+    }
+
+
+@mcp.tool()
+async def list_azure_blob_videos(
+    ctx: Context,
+    prefix: Optional[str] = None,
+    page_size: Optional[int] = None,
+    continuation_token: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    modified_before: Optional[str] = None,
+    order: Optional[str] = None,
+    refresh: bool = False
+) -> AzureBlobListResponse:
+    """List videos in the Azure Blob Storage container
+
+    By default every matching video is returned, newest first. Passing
+    page_size or continuation_token lists one page at a time instead. With
+    AZURE_INVENTORY_ENABLED, listings are served from the local blob
+    inventory once it has been synced, and every order applies across the
+    whole container.
+
+    Args:
+        prefix: Only list blobs whose name starts with this (filtered by Azure)
+        page_size: Videos per page; pages the listing (AZURE_LIST_PAGE_SIZE when only a
+            continuation_token is given)
+        continuation_token: Token from the previous page to continue the listing
+        modified_after: Only videos modified at or after this ISO-8601 date/time (UTC if no zone)
+        modified_before: Only videos modified before this ISO-8601 date/time (UTC if no zone)
+        order: "name" (Azure's listing order), "newest" or "oldest". Defaults to
+            newest for a full listing and name for pages. Only the blob inventory
+            can order pages by date across the whole container; a page listed
+            straight from Azure still follows name order across pages, its own
+            videos are sorted by date and sorted_within_page is set
+        refresh: List the container into the inventory (and the catalog manifest) before answering
     
     Returns:
-        AzureBlobListResponse with list of blob videos and metadata
+        AzureBlobListResponse with the blob videos and metadata, and a
+        continuation_token while more pages remain
     """
     
     await ctx.info(f"Listing videos in Azure Blob container: {AZURE_CONTAINER_NAME}")
     
+    paged = page_size is not None or bool(continuation_token)
+    if page_size is None:
+        page_size = AZURE_LIST_PAGE_SIZE
+    if not 1 <= page_size <= AZURE_LIST_MAX_PAGE_SIZE:
+        await ctx.error(
+            f"Invalid page_size: {page_size}. Must be between 1 and {AZURE_LIST_MAX_PAGE_SIZE}"
+        )
+        raise ValueError(f"Invalid page_size: {page_size}")
+
+    if order is None:
+        order = "name" if paged else "newest"
+    if order not in ("name", "newest", "oldest"):
+        await ctx.error(f"Invalid order: {order}. Must be one of: ['name', 'newest', 'oldest']")
+        raise ValueError(f"Invalid order: {order}")
+
+    try:
+        after = parse_blob_time(modified_after, "modified_after")
+        before = parse_blob_time(modified_before, "modified_before")
+    except ValueError as e:
+        await ctx.error(str(e))
+        raise
+
     if not BlobServiceClient:
         await ctx.error("Azure Storage SDK not available. Install: pip install azure-storage-blob")
         raise ValueError("Azure Storage SDK not available")
@@ -846,25 +5920,53 @@ async def list_azure_blob_videos(ctx: Context) -> AzureBlobListResponse:
         if not blob_service_client:
             raise Exception("Failed to initialize Azure Blob client")
         
+        if refresh and blob_inventory.enabled:
+            await ctx.info("Syncing blob inventory with Azure...")
+            await blob_inventory.sync(full=True)
+
+        if blob_inventory.ready and (
+            not continuation_token or continuation_token.startswith(BlobInventory.TOKEN_PREFIX)
+        ):
+            blobs, next_token = await asyncio.to_thread(
+                blob_inventory.list_page,
+                blob_service_client.account_name,
+                prefix,
+                page_size if paged else None,
+                continuation_token,
+                after,
+                before,
+                order,
+            )
+            await ctx.info(
+                f"Found {len(blobs)} video files in the blob inventory"
+                + (" (more available)" if next_token else "")
+            )
+            return AzureBlobListResponse(
+                blobs=blobs,
+                total_count=len(blobs),
+                container_name=AZURE_CONTAINER_NAME,
+                continuation_token=next_token,
+                source="inventory"
+            )
+
         container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
         
-        # List all blobs in the container
-        blobs = []
-        try:
-            blob_list = container_client.list_blobs()
-            for blob in blob_list:
-                # Filter for video files
-                if blob.name.lower().endswith(('.mp4', '.mov', '.avi', '.mkv')):
-                    blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{AZURE_CONTAINER_NAME}/{blob.name}"
-                    blobs.append({
-                        "name": blob.name,
-                        "url": blob_url,
-                        "size": blob.size,
-                        "size_mb": round(blob.size / 1024 / 1024, 1) if blob.size else 0,
-                        "created": blob.creation_time.isoformat() if blob.creation_time else None,
-                        "modified": blob.last_modified.isoformat() if blob.last_modified else None,
-                        "content_type": blob.content_settings.content_type if blob.content_settings else None
-                    })
+        try:
+            if paged:
+                blobs, next_token = await list_blob_video_page(
+                    container_client,
+                    blob_service_client.account_name,
+                    prefix,
+                    page_size,
+                    continuation_token,
+                    after,
+                    before
+                )
+            else:
+                blobs = await list_all_blob_videos(
+                    container_client, blob_service_client.account_name, prefix, after, before
+                )
+                next_token = None
         except Exception as e:
             if "ContainerNotFound" in str(e):
                 await ctx.info(f"Container {AZURE_CONTAINER_NAME} does not exist yet")
@@ -876,15 +5978,26 @@ async def list_azure_blob_videos(ctx: Context) -> AzureBlobListResponse:
             else:
                 raise e
         
-        # Sort by modification time (newest first)
-        blobs.sort(key=lambda x: x.get('modified', ''), reverse=True)
+        if order != "name":
+            # Azure lists by name only, so a date order cannot reach past this page
+            blobs.sort(key=lambda x: x.get('modified') or '', reverse=order == "newest")
+            if paged:
+                await ctx.info(
+                    f"Order '{order}' applies within this page only; enable the blob inventory "
+                    "to order the whole container"
+                )
         
-        await ctx.info(f"Found {len(blobs)} video files in Azure Blob Storage")
+        await ctx.info(
+            f"Found {len(blobs)} video files in Azure Blob Storage"
+            + (" (more available)" if next_token else "")
+        )
         
         return AzureBlobListResponse(
             blobs=blobs,
             total_count=len(blobs),
-            container_name=AZURE_CONTAINER_NAME
+            container_name=AZURE_CONTAINER_NAME,
+            continuation_token=next_token,
+            sorted_within_page=paged and order != "name"
         )
         
     except Exception as e:
@@ -892,6 +6005,56 @@ async def list_azure_blob_videos(ctx: Context) -> AzureBlobListResponse:
         raise ValueError(f"Failed to list Azure Blob videos: {str(e)}")
 
 
+@mcp.tool()
+async def get_azure_blob_stats(
+    ctx: Context,
+    prefix: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    modified_before: Optional[str] = None,
+    refresh: bool = False
+) -> dict:
+    """Count and total size of the videos in Azure Blob Storage, from the local blob inventory
+
+    Args:
+        prefix: Only blobs whose name starts with this
+        modified_after: Only videos modified at or after this ISO-8601 date/time (UTC if no zone)
+        modified_before: Only videos modified before this ISO-8601 date/time (UTC if no zone)
+        refresh: List the container into the inventory (and the catalog manifest) first
+
+    Returns:
+        dict: count, total_size, oldest and newest modification time, and when
+        the inventory was last synced
+    """
+
+    if not blob_inventory.enabled:
+        await ctx.error("Blob inventory is disabled. Set AZURE_INVENTORY_ENABLED=true")
+        raise ValueError("Blob inventory is disabled")
+
+    try:
+        after = parse_blob_time(modified_after, "modified_after")
+        before = parse_blob_time(modified_before, "modified_before")
+    except ValueError as e:
+        await ctx.error(str(e))
+        raise
+
+    try:
+        if refresh or not blob_inventory.ready:
+            await ctx.info("Syncing blob inventory with Azure...")
+            await blob_inventory.sync(full=refresh)
+        summary = await asyncio.to_thread(blob_inventory.summary, prefix, after, before)
+    except Exception as e:
+        await ctx.error(f"Failed to read blob inventory: {str(e)}")
+        raise ValueError(f"Failed to read blob inventory: {str(e)}")
+
+    await ctx.info(f"{summary['count']} videos, {summary['total_size_mb']} MB")
+
+    return {
+        **summary,
+        "container_name": AZURE_CONTAINER_NAME,
+        "synced_at": blob_inventory.stats()["synced_at"]
+    }
+
+
 @mcp.tool()
 async def test_connection(ctx: Context) -> dict:
     """Test MCP server connection and configuration
@@ -910,6 +6073,17 @@ async def test_connection(ctx: Context) -> dict:
             "azure_upload_enabled": AZURE_UPLOAD_ENABLED,
             "azure_container": AZURE_CONTAINER_NAME,
             "output_directory": OUTPUT_DIR,
+            "operation_poller": operation_poller.stats(),
+            "model_latency": latency_history.stats(),
+            "scheduler": generation_scheduler.stats(),
+            "submission_limiter": submission_limiter.stats(),
+            "result_cache": result_cache.stats(),
+            "coalescing": inflight_generations.stats(),
+            "upload_tuner": upload_tuner.stats(),
+            "upload_queue": upload_queue.stats(),
+            "upload_bandwidth": upload_bandwidth.stats(),
+            "blob_inventory": blob_inventory.stats(),
+            "catalog_manifest": catalog_manifest.stats(),
             "server_status": "online"
         }
         
@@ -964,19 +6138,18 @@ async def delete_azure_blob_video(
         if not blob_service_client:
             raise Exception("Failed to initialize Azure Blob client")
         
-        blob_client = blob_service_client.get_blob_client(
-            container=AZURE_CONTAINER_NAME,
-            blob=blob_name
-        )
+        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
         
-        # Check if blob exists
-        if not blob_client.exists():
+        # Delete the blob in one request; a 404 means it does not exist
+        result = await delete_blob_quietly(container_client, blob_name)
+        if result["status"] == "failed":
+            raise Exception(result["error"])
+        await record_blobs_deleted([blob_name])
+        
+        if result["status"] == "not_found":
             await ctx.error(f"Blob not found: {blob_name}")
             raise ValueError(f"Blob not found: {blob_name}")
         
-        # Delete the blob
-        blob_client.delete_blob()
-        
         await ctx.info(f"Successfully deleted blob: {blob_name}")
         
         return {
@@ -990,6 +6163,138 @@ async def delete_azure_blob_video(
         raise ValueError(f"Failed to delete Azure Blob video: {str(e)}")
 
 
+@mcp.tool()
+async def delete_azure_blob_videos(
+    ctx: Context,
+    blob_names: Optional[list[str]] = None,
+    prefix: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    modified_before: Optional[str] = None,
+    dry_run: bool = False
+) -> dict:
+    """Delete many videos from Azure Blob Storage, by name or by prefix and age
+
+    Deletes go out as Blob Batch requests of up to AZURE_DELETE_BATCH_SIZE
+    blobs, AZURE_DELETE_CONCURRENCY requests at a time. At most
+    AZURE_DELETE_MAX_BLOBS blobs are deleted per call; when a filter matches
+    more, "truncated" is set and the call can simply be repeated.
+
+    Args:
+        blob_names: Names of the blobs to delete
+        prefix: Delete the videos whose name starts with this (instead of blob_names)
+        modified_after: Only videos modified at or after this ISO-8601 date/time (UTC if no zone)
+        modified_before: Only videos modified before this ISO-8601 date/time (UTC if no zone)
+        dry_run: Only return the blobs that would be deleted
+
+    Returns:
+        Dictionary with deleted/not_found/failed counts and a result per blob
+    """
+
+    filtered = bool(prefix or modified_after or modified_before)
+    if blob_names and filtered:
+        await ctx.error("Give either blob_names or prefix/modified_after/modified_before, not both")
+        raise ValueError(
+            "Give either blob_names or prefix/modified_after/modified_before, not both"
+        )
+
+    if not blob_names and not filtered:
+        await ctx.error("Give blob_names, or a prefix and/or modified_after/modified_before")
+        raise ValueError("Give blob_names, or a prefix and/or modified_after/modified_before")
+
+    names = list(dict.fromkeys(name.strip() for name in blob_names or [] if name.strip()))
+    if blob_names and not names:
+        await ctx.error("Blob names cannot be empty")
+        raise ValueError("Blob names cannot be empty")
+
+    if len(names) > AZURE_DELETE_MAX_BLOBS:
+        await ctx.error(f"Too many blobs: {len(names)}. At most {AZURE_DELETE_MAX_BLOBS} per call")
+        raise ValueError(f"Too many blobs: {len(names)}")
+
+    try:
+        after = parse_blob_time(modified_after, "modified_after")
+        before = parse_blob_time(modified_before, "modified_before")
+    except ValueError as e:
+        await ctx.error(str(e))
+        raise
+
+    if BlobServiceClient is None:
+        await ctx.error("Azure Storage SDK not available. Install: pip install azure-storage-blob")
+        raise ValueError("Azure Storage SDK not available")
+
+    if not AZURE_CONNECTION_STRING:
+        await ctx.error("Azure connection string not configured")
+        raise ValueError("Azure connection string not configured")
+
+    try:
+        blob_service_client = get_azure_blob_client()
+        if not blob_service_client:
+            raise Exception("Failed to initialize Azure Blob client")
+
+        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+        truncated = False
+
+        if filtered:
+            await ctx.info(
+                f"Finding videos to delete in Azure Blob container: {AZURE_CONTAINER_NAME}"
+            )
+            token = None
+            try:
+                while len(names) < AZURE_DELETE_MAX_BLOBS:
+                    page, token = await list_blob_video_page(
+                        container_client,
+                        blob_service_client.account_name,
+                        prefix,
+                        min(AZURE_LIST_MAX_PAGE_SIZE, AZURE_DELETE_MAX_BLOBS - len(names)),
+                        token,
+                        after,
+                        before
+                    )
+                    names += [blob["name"] for blob in page]
+                    if not token:
+                        break
+            except Exception as e:
+                if "ContainerNotFound" not in str(e):
+                    raise e
+                token = None
+            truncated = bool(token)
+
+        if dry_run:
+            await ctx.info(
+                f"{len(names)} videos would be deleted" + (" (more match)" if truncated else "")
+            )
+            return {
+                "dry_run": True,
+                "matched": len(names),
+                "blob_names": names,
+                "truncated": truncated,
+                "container_name": AZURE_CONTAINER_NAME
+            }
+
+        await ctx.info(f"Deleting {len(names)} videos from Azure Blob Storage")
+        results = await delete_blobs_in_batches(container_client, names)
+
+        counts = {status: sum(1 for result in results if result["status"] == status)
+                  for status in ("deleted", "not_found", "failed")}
+        await ctx.info(
+            f"Deleted {counts['deleted']} videos, {counts['not_found']} not found, "
+            f"{counts['failed']} failed"
+            + (" (more match)" if truncated else "")
+        )
+
+        return {
+            "success": counts["failed"] == 0,
+            "requested": len(names),
+            **counts,
+            "results": results,
+            "truncated": truncated,
+            "container_name": AZURE_CONTAINER_NAME
+        }
+
+    except Exception as e:
+        await ctx.error(f"Failed to delete Azure Blob videos: {str(e)}")
+        raise ValueError(f"Failed to delete Azure Blob videos: {str(e)}")
+
+
 def main():
     """Main entry point for the MCP Veo 3 server"""
     mcp.run()
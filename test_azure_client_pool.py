@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test the shared async Azure client and the remembered container check
+Usage: python test_azure_client_pool.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_azure_client_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=pooled;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+os.environ["AZURE_UPLOAD_DEDUP"] = "off"
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+class FakeBlobClient:
+    async def upload_blob(self, *args, **kwargs):
+        raise ResourceNotFoundError("The specified container does not exist.")
+
+
+class FakeServiceClient:
+    """Async service client fake that counts container creation round trips"""
+    account_name = "pooled"
+
+    def __init__(self, exists: bool = False):
+        self.exists = exists
+        self.create_calls = 0
+        service = self
+
+        class ContainerClient:
+            async def create_container(self):
+                service.create_calls += 1
+                await asyncio.sleep(0.02)
+                if service.exists:
+                    raise ResourceExistsError("The specified container already exists.")
+                service.exists = True
+
+        self.container = ContainerClient()
+
+    def get_container_client(self, container):
+        return self.container
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient()
+
+
+async def test_one_shared_client():
+    """Every caller gets the same lazily created aio client until it is closed"""
+    print("=== Testing the shared client ===")
+    await server.close_azure_blob_client()
+    first = server.get_azure_blob_client()
+    assert first is not None and first is server.get_azure_blob_client(), "Client must be reused"
+    assert type(first).__module__.startswith("azure.storage.blob.aio"), type(first)
+
+    await server.close_azure_blob_client()
+    second = server.get_azure_blob_client()
+    assert second is not first, "A closed client is replaced on next use"
+    await server.close_azure_blob_client()
+
+    print("✅ One aio client serves every call")
+    return True
+
+
+async def test_container_checked_once():
+    """Concurrent uploads check the container once; a missing-resource error forgets it"""
+    print("=== Testing the remembered container check ===")
+    service = FakeServiceClient(exists=True)
+    server.forget_azure_container()
+    await asyncio.gather(*(server.ensure_azure_container(service) for _ in range(10)))
+    await server.ensure_azure_container(service)
+    assert service.create_calls == 1, f"Expected one create_container, got {service.create_calls}"
+
+    path = os.path.join(TEST_OUTPUT_DIR, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(b"small video")
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    try:
+        result = await server.upload_to_azure_blob(path, "video.mp4", FakeContext())
+    finally:
+        server.get_azure_blob_client = original
+    assert not result.success and "does not exist" in result.error_message, result
+
+    await server.ensure_azure_container(service)
+    assert service.create_calls == 2, "The container is checked again after a not-found error"
+
+    print("✅ Container existence is cached and re-checked after it disappears")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Azure Client Pool Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_one_shared_client, test_container_checked_once):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
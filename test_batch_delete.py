@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test bulk and single deletion of Azure videos against a fake container client
+Usage: python test_batch_delete.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_delete_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = "UseDevelopmentStorage=true"
+os.environ["AZURE_INVENTORY_ENABLED"] = "true"
+os.environ["AZURE_DELETE_BATCH_SIZE"] = "4"
+os.environ["AZURE_DELETE_CONCURRENCY"] = "2"
+
+import mcp_veo3_azure_blob as server
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+
+class FakeContainerClient:
+    """Fake async container client answering Blob Batch and single deletes from a dict of blobs"""
+    def __init__(self, names: list[str], locked: tuple = (), batch_supported: bool = True):
+        self.blobs = set(names)
+        self.locked = set(locked)
+        self.batch_supported = batch_supported
+        self.batches: list[int] = []
+        self.single_deletes: list[str] = []
+
+    def _delete(self, name: str) -> int:
+        if name in self.locked:
+            return 409
+        if name not in self.blobs:
+            return 404
+        self.blobs.discard(name)
+        return 202
+
+    async def delete_blobs(self, *names, raise_on_any_failure=True):
+        if not self.batch_supported:
+            raise HttpResponseError(message="Blob batch is not supported for this account")
+        assert len(names) <= server.AZURE_BATCH_LIMIT, "Batch exceeds Azure's subrequest limit"
+        self.batches.append(len(names))
+        responses = []
+        for name in names:
+            status = self._delete(name)
+            headers = {"x-ms-error-code": "LeaseIdMissing"} if status == 409 else {}
+            responses.append(
+                SimpleNamespace(status_code=status, headers=headers, reason="Conflict")
+            )
+
+        async def parts():
+            for response in responses:
+                yield response
+        return parts()
+
+    async def delete_blob(self, name):
+        self.single_deletes.append(name)
+        status = self._delete(name)
+        if status == 404:
+            raise ResourceNotFoundError(message="The specified blob does not exist.")
+        if status == 409:
+            raise HttpResponseError(message="LeaseIdMissing")
+
+
+class FakeServiceClient:
+    account_name = "devstoreaccount1"
+
+    def __init__(self, container_client: FakeContainerClient):
+        self.container_client = container_client
+
+    def get_container_client(self, container):
+        return self.container_client
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+def index(names: list[str]) -> None:
+    for name in names:
+        server.blob_inventory.record(server.CatalogManifest.entry(name, 10, 1.0))
+
+
+def indexed(name: str) -> bool:
+    rows = server.blob_inventory.db.execute("SELECT 1 FROM blob_inventory WHERE name = ?", (name,))
+    return bool(rows)
+
+
+def tool(function):
+    return getattr(function, "fn", function)
+
+
+async def test_batch_result_mapping():
+    """Every blob gets its own result and only the ones gone leave the inventory"""
+    print("=== Testing Blob Batch result mapping ===")
+    names = [f"batch/v{i:02d}.mp4" for i in range(10)]
+    container = FakeContainerClient(names[:9], locked=(names[3],))
+    index(names)
+
+    results = await server.delete_blobs_in_batches(container, names)
+
+    assert container.batches == [4, 4, 2], (
+        f"Expected batches of 4, 4 and 2, got {container.batches}"
+    )
+    assert not container.single_deletes, "A working batch should not fall back to single deletes"
+    statuses = {result["name"]: result["status"] for result in results}
+    assert [result["name"] for result in results] == names, (
+        "Results should follow the requested order"
+    )
+    assert statuses[names[3]] == "failed" and results[3]["error"] == "LeaseIdMissing", (
+        f"Locked blob: {results[3]}"
+    )
+    assert statuses[names[9]] == "not_found", "Missing blob should be not_found"
+    assert sum(status == "deleted" for status in statuses.values()) == 8, (
+        f"Unexpected statuses: {statuses}"
+    )
+    assert indexed(names[3]), "A blob that failed to delete must stay in the inventory"
+    assert not any(indexed(name) for name in names if name != names[3]), (
+        "Deleted and missing blobs leave the inventory"
+    )
+
+    print("✅ 202/404/409 mapped to deleted/not_found/failed per blob")
+    return True
+
+
+async def test_batch_fallback():
+    """A refused batch request falls back to deleting blob by blob"""
+    print("=== Testing fallback to individual deletes ===")
+    names = [f"fallback/v{i}.mp4" for i in range(3)]
+    container = FakeContainerClient(names[:2], locked=(names[1],), batch_supported=False)
+
+    results = await server.delete_blob_batch(container, names)
+
+    assert sorted(container.single_deletes) == sorted(names), (
+        "Every blob should be deleted on its own"
+    )
+    assert [result["status"] for result in results] == ["deleted", "failed", "not_found"], (
+        f"Got {results}"
+    )
+    assert "LeaseIdMissing" in results[1]["error"], "The per-blob error should be kept"
+
+    print("✅ Individual deletes produced the same per-blob results")
+    return True
+
+
+async def test_tools():
+    """A single delete of a missing blob raises; the bulk tool reports it as not_found"""
+    print("=== Testing delete tools ===")
+    container = FakeContainerClient(["tool/a.mp4", "tool/b.mp4"])
+    original_client = server._azure_blob_client
+    server._azure_blob_client = FakeServiceClient(container)
+    try:
+        first = await tool(server.delete_azure_blob_video)("tool/a.mp4", FakeContext())
+        assert first["success"], f"First delete: {first}"
+        try:
+            await tool(server.delete_azure_blob_video)("tool/a.mp4", FakeContext())
+            raise AssertionError("Deleting a missing blob should raise")
+        except ValueError as e:
+            assert "Blob not found: tool/a.mp4" in str(e), str(e)
+
+        bulk = await tool(server.delete_azure_blob_videos)(
+            FakeContext(), blob_names=["tool/b.mp4", "tool/a.mp4"]
+        )
+        assert bulk["success"], f"Bulk delete should succeed: {bulk}"
+        assert (bulk["deleted"], bulk["not_found"], bulk["failed"]) == (1, 1, 0), (
+            f"Bulk counts: {bulk}"
+        )
+
+        try:
+            await tool(server.delete_azure_blob_videos)(
+                FakeContext(), blob_names=["x.mp4"], prefix="tool/"
+            )
+            raise AssertionError("Names and a filter together should be rejected")
+        except ValueError:
+            pass
+    finally:
+        server._azure_blob_client = original_client
+
+    print("✅ Single delete raises for a missing blob, bulk delete reports it")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Batch Delete Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_batch_result_mapping, test_batch_fallback, test_tools):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
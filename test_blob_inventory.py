@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Test the blob inventory: delta sync against concurrent uploads and keyset pagination
+Usage: python test_blob_inventory.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_inventory_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = "UseDevelopmentStorage=true"
+os.environ["AZURE_INVENTORY_ENABLED"] = "true"
+os.environ["AZURE_CATALOG_MANIFEST"] = "false"
+
+import mcp_veo3_azure_blob as server
+
+
+def listed_blob(name: str, size: int, modified: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        name=name,
+        size=size,
+        last_modified=datetime.fromtimestamp(modified, timezone.utc),
+        creation_time=None,
+        content_settings=SimpleNamespace(content_type="video/mp4"),
+        etag=f"0x{size}",
+        metadata={}
+    )
+
+
+class FakeContainerClient:
+    """Fake async container client; `during_listing` runs halfway through an enumeration"""
+    def __init__(self):
+        self.blobs: dict[str, tuple[int, float]] = {}
+        self.during_listing = None
+
+    async def list_blobs(self, include=None):
+        names = sorted(self.blobs)
+        for position, name in enumerate(names):
+            if position == len(names) // 2 and self.during_listing:
+                self.during_listing()
+                await asyncio.sleep(0)
+            size, modified = self.blobs[name]
+            yield listed_blob(name, size, modified)
+
+
+class FakeServiceClient:
+    account_name = "devstoreaccount1"
+
+    def __init__(self):
+        self.container = FakeContainerClient()
+
+    def get_container_client(self, container):
+        return self.container
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+def indexed() -> dict[str, int]:
+    rows = server.blob_inventory.db.execute(
+        "SELECT name, size FROM blob_inventory WHERE container = ?", (server.AZURE_CONTAINER_NAME,)
+    )
+    return {row["name"]: row["size"] for row in rows}
+
+
+async def test_sync_keeps_blobs_recorded_meanwhile(service: FakeServiceClient):
+    """Uploads recorded while a listing runs are neither removed nor overwritten by it"""
+    print("=== Testing delta sync against concurrent uploads ===")
+    container = service.container
+    container.blobs = {f"v{i}.mp4": (100 + i, 1000.0 + i) for i in range(6)}
+    result = await server.blob_inventory.sync()
+    assert result["written"] == 6 and server.blob_inventory.ready, (
+        f"First sync should index every blob: {result}"
+    )
+
+    unchanged = await server.blob_inventory.sync()
+    assert unchanged["written"] == 0 and unchanged["removed"] == 0, f"Nothing changed: {unchanged}"
+
+    # Deleted elsewhere before the next sync
+    del container.blobs["v0.mp4"]
+
+    def upload_during_listing():
+        # A new blob the listing has already passed, and a listed blob rewritten with new content
+        server.blob_inventory.record(server.CatalogManifest.entry("a-new.mp4", 7, 2000.0))
+        server.blob_inventory.record(server.CatalogManifest.entry("v5.mp4", 999, 2000.0))
+
+    container.during_listing = upload_during_listing
+    result = await server.blob_inventory.sync()
+    container.during_listing = None
+
+    index = indexed()
+    assert "v0.mp4" not in index, "A blob deleted elsewhere should be removed"
+    assert index.get("a-new.mp4") == 7, "A blob recorded during the listing must not be removed"
+    assert index.get("v5.mp4") == 999, (
+        "A blob recorded during the listing must not be overwritten by it"
+    )
+    assert result["removed"] == 1, f"Only the deleted blob counts as removed: {result}"
+
+    print("✅ Sync removed the deleted blob and kept both uploads recorded meanwhile")
+    return True
+
+
+async def test_keyset_pagination(service: FakeServiceClient):
+    """Pages continue after the last row, in every order, even while rows change"""
+    print("=== Testing keyset continuation tokens ===")
+    container = service.container
+    # Equal modification times force the name tie-breaker in the date orders
+    container.blobs = {f"k{i:02d}.mp4": (i, 5000.0 + i // 2) for i in range(10)}
+    container.blobs["notes.txt"] = (1, 5000.0)
+    await server.blob_inventory.sync()
+
+    expected = {
+        "name": sorted(container.blobs),
+        "oldest": sorted(container.blobs, key=lambda name: (container.blobs[name][1], name)),
+        "newest": sorted(
+            container.blobs, key=lambda name: (container.blobs[name][1], name), reverse=True
+        ),
+    }
+    for order, names in expected.items():
+        names = [name for name in names if name.endswith(".mp4")]
+        seen, token = [], None
+        while True:
+            page, token = server.blob_inventory.list_page("acct", None, 3, token, order=order)
+            seen += [video["name"] for video in page]
+            if not token:
+                break
+            assert token.startswith(server.BlobInventory.TOKEN_PREFIX), (
+                "Inventory tokens carry their prefix"
+            )
+        assert seen == names, f"Order {order}: got {seen}"
+
+    page, token = server.blob_inventory.list_page("acct", None, 3, order="name")
+    # Rows added before the cursor and removed after it do not shift the next page
+    server.blob_inventory.record(server.CatalogManifest.entry("k00a.mp4", 1, 1.0))
+    server.blob_inventory.remove(["k03.mp4"])
+    page, _ = server.blob_inventory.list_page("acct", None, 3, token, order="name")
+    assert [video["name"] for video in page] == ["k04.mp4", "k05.mp4", "k06.mp4"], f"Got {page}"
+
+    for bad_token, message in (
+        (server.BlobInventory.TOKEN_PREFIX + "???", "Invalid"),
+        (token, "different order"),
+    ):
+        try:
+            server.blob_inventory.list_page("acct", None, 3, bad_token, order="newest")
+            raise AssertionError(f"Token should be rejected: {bad_token}")
+        except ValueError as e:
+            assert message in str(e), f"Unexpected error: {e}"
+
+    listing = await getattr(server.list_azure_blob_videos, "fn", server.list_azure_blob_videos)(
+        FakeContext(), page_size=4, order="newest"
+    )
+    assert listing.source == "inventory" and not listing.sorted_within_page, f"Listing: {listing}"
+    assert listing.continuation_token.startswith(server.BlobInventory.TOKEN_PREFIX)
+
+    everything = await getattr(
+        server.list_azure_blob_videos, "fn", server.list_azure_blob_videos
+    )(FakeContext())
+    modified = [video["modified"] for video in everything.blobs]
+    assert everything.total_count == 10 and everything.continuation_token is None, everything
+    assert modified == sorted(modified, reverse=True), "A full listing is newest first"
+
+    print("✅ Keyset tokens page through every order without gaps or repeats")
+    return True
+
+
+async def test_writes_off_the_event_loop(service: FakeServiceClient):
+    """Recording uploads and deletions writes the inventory from a worker thread"""
+    print("=== Testing inventory writes stay off the event loop ===")
+    loop_thread = threading.current_thread()
+    writes: list[threading.Thread] = []
+    original_execute = server.blob_inventory.db.execute
+    original_execute_many = server.blob_inventory.db.execute_many
+
+    def execute(sql, params=()):
+        if not sql.lstrip().startswith("SELECT"):
+            writes.append(threading.current_thread())
+        return original_execute(sql, params)
+
+    def execute_many(sql, rows):
+        writes.append(threading.current_thread())
+        return original_execute_many(sql, rows)
+
+    server.blob_inventory.db.execute = execute
+    server.blob_inventory.db.execute_many = execute_many
+    try:
+        await server.record_blob_written("threads.mp4", 42, {}, {"etag": "0x9"})
+        await server.record_blobs_deleted(["threads.mp4"])
+    finally:
+        del server.blob_inventory.db.execute
+        del server.blob_inventory.db.execute_many
+
+    assert "threads.mp4" not in indexed(), "The recorded blob should be removed again"
+    assert len(writes) >= 2, f"Expected an insert and a delete: {writes}"
+    assert loop_thread not in writes, "Inventory writes must not run on the event loop thread"
+
+    print(f"✅ {len(writes)} inventory writes ran in worker threads")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Blob Inventory Test Suite")
+    print("=" * 50)
+
+    service = FakeServiceClient()
+    original_client = server._azure_blob_client
+    server._azure_blob_client = service
+
+    passed = True
+    try:
+        for test in (
+            test_sync_keeps_blobs_recorded_meanwhile,
+            test_keyset_pagination,
+            test_writes_off_the_event_loop,
+        ):
+            try:
+                passed = await test(service) and passed
+            except Exception as e:
+                print(f"❌ Test failed: {str(e)}")
+                passed = False
+    finally:
+        server._azure_blob_client = original_client
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
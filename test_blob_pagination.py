@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Test Azure listing: full newest-first listings, prefixes, date filters and continuation tokens
+Usage: python test_blob_pagination.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_pagination_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=paged;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_INVENTORY_ENABLED"] = "false"
+os.environ["AZURE_LIST_MAX_SCAN_PAGES"] = "3"
+
+import mcp_veo3_azure_blob as server
+
+
+def listed_blob(name: str, day: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        name=name,
+        size=1024 * day,
+        last_modified=datetime(2025, 9, day, 12, tzinfo=timezone.utc),
+        creation_time=None,
+        content_settings=SimpleNamespace(content_type="video/mp4")
+    )
+
+
+class FakePages:
+    """Azure's by_page() iterator; tokens are the offset of the next blob"""
+    def __init__(self, blobs: list, per_page: int, token, requests: list):
+        self.blobs = blobs
+        self.per_page = per_page
+        self.offset = int(token or 0)
+        self.continuation_token = None
+        self.requests = requests
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.offset >= len(self.blobs):
+            raise StopAsyncIteration
+        self.requests.append((self.offset, self.per_page))
+        page = self.blobs[self.offset:self.offset + self.per_page]
+        self.offset += len(page)
+        self.continuation_token = str(self.offset) if self.offset < len(self.blobs) else None
+
+        async def items():
+            for blob in page:
+                yield blob
+        return items()
+
+
+class FakeContainerClient:
+    def __init__(self, blobs: list):
+        self.blobs = sorted(blobs, key=lambda blob: blob.name)
+        self.requests: list[tuple[int, int]] = []
+        self.prefixes: list = []
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None, **kwargs):
+        self.prefixes.append(name_starts_with)
+        blobs = [blob for blob in self.blobs if blob.name.startswith(name_starts_with or "")]
+        container = self
+        return SimpleNamespace(
+            by_page=lambda continuation_token=None: FakePages(
+                blobs, results_per_page or 5000, continuation_token, container.requests
+            )
+        )
+
+
+class FakeServiceClient:
+    account_name = "paged"
+
+    def __init__(self, blobs: list):
+        self.container = FakeContainerClient(blobs)
+
+    def get_container_client(self, container):
+        return self.container
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+BLOBS = [listed_blob(f"veo3_video_{day:02d}.mp4", day) for day in range(1, 13)]
+BLOBS += [listed_blob(f"notes_{day:02d}.txt", day) for day in range(1, 4)]
+BLOBS += [listed_blob("archive/old.mp4", 1)]
+
+
+async def list_videos(service: FakeServiceClient, **kwargs):
+    tool = getattr(server.list_azure_blob_videos, "fn", server.list_azure_blob_videos)
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    try:
+        return await tool(FakeContext(), **kwargs)
+    finally:
+        server.get_azure_blob_client = original
+
+
+async def test_default_lists_everything_newest_first():
+    """Without page_size or a token every video comes back at once, newest first"""
+    print("=== Testing the default full listing ===")
+    service = FakeServiceClient(BLOBS)
+    listing = await list_videos(service)
+    names = [blob["name"] for blob in listing.blobs]
+    expected = sorted(
+        (blob for blob in BLOBS if blob.name.endswith(".mp4")),
+        key=lambda blob: (blob.last_modified, blob.name),
+        reverse=True
+    )
+    assert listing.total_count == 13 and listing.continuation_token is None, listing
+    assert [blob["modified"] for blob in listing.blobs] == [
+        blob.last_modified.isoformat() for blob in expected
+    ], names
+    assert names[0] == "veo3_video_12.mp4" and not listing.sorted_within_page, listing
+
+    # Filters that reject most blobs still reach the end of the container in one call
+    late = await list_videos(service, modified_after="2025-09-12")
+    assert [blob["name"] for blob in late.blobs] == ["veo3_video_12.mp4"], late
+    assert late.continuation_token is None
+
+    print(f"✅ {listing.total_count} videos listed newest first without paging")
+    return True
+
+
+async def test_token_alone_pages_by_name():
+    """A continuation token without page_size keeps paging with the default page size"""
+    print("=== Testing a token without page_size ===")
+    service = FakeServiceClient(BLOBS)
+    first = await list_videos(service, page_size=4)
+    assert first.continuation_token and len(first.blobs) == 4, first
+    original = server.AZURE_LIST_PAGE_SIZE
+    server.AZURE_LIST_PAGE_SIZE = 4
+    try:
+        second = await list_videos(service, continuation_token=first.continuation_token)
+    finally:
+        server.AZURE_LIST_PAGE_SIZE = original
+    names = [blob["name"] for blob in first.blobs + second.blobs]
+    assert len(second.blobs) == 4 and second.continuation_token, second
+    assert names == sorted(names) and len(set(names)) == 8, names
+
+    print("✅ Tokens continue the paged listing in name order")
+    return True
+
+
+async def test_tokens_walk_every_video():
+    """Following continuation tokens lists every video once, in name order"""
+    print("=== Testing continuation tokens ===")
+    service = FakeServiceClient(BLOBS)
+    seen, token, pages = [], None, 0
+    while True:
+        listing = await list_videos(service, page_size=5, continuation_token=token)
+        assert listing.total_count == len(listing.blobs) <= 5, listing
+        seen += [blob["name"] for blob in listing.blobs]
+        pages += 1
+        token = listing.continuation_token
+        if not token:
+            break
+
+    expected = sorted(blob.name for blob in BLOBS if blob.name.endswith(".mp4"))
+    assert seen == expected, f"Got {seen}"
+    assert pages == 3, f"13 videos in pages of 5 need 3 calls, made {pages}"
+    assert all(per_page <= 5 for _, per_page in service.container.requests), (
+        "Azure is asked only for the rows still missing"
+    )
+
+    print(f"✅ {len(seen)} videos over {pages} pages, none repeated")
+    return True
+
+
+async def test_prefix_and_date_filters():
+    """The prefix goes to Azure; date filters and video extensions are applied per page"""
+    print("=== Testing prefix and date filters ===")
+    service = FakeServiceClient(BLOBS)
+    listing = await list_videos(
+        service,
+        prefix="veo3_video_",
+        modified_after="2025-09-04",
+        modified_before="2025-09-07T00:00:00Z",
+    )
+    names = [blob["name"] for blob in listing.blobs]
+    assert names == ["veo3_video_06.mp4", "veo3_video_05.mp4", "veo3_video_04.mp4"], names
+    assert service.container.prefixes[-1] == "veo3_video_"
+    assert listing.continuation_token is None
+
+    newest = await list_videos(service, prefix="veo3_video_0", page_size=3, order="newest")
+    assert [blob["name"] for blob in newest.blobs] == [
+        "veo3_video_03.mp4", "veo3_video_02.mp4", "veo3_video_01.mp4"
+    ], newest.blobs
+
+    for kwargs in ({"page_size": 0}, {"order": "size"}, {"modified_after": "last tuesday"}):
+        try:
+            await list_videos(service, **kwargs)
+            raise AssertionError(f"Should be rejected: {kwargs}")
+        except ValueError:
+            pass
+
+    print("✅ Filters narrow the listing, bad arguments are rejected")
+    return True
+
+
+async def test_scan_limit_returns_short_page():
+    """When filters reject most blobs, a short page comes back with a token"""
+    print("=== Testing the per-call scan limit ===")
+    service = FakeServiceClient(BLOBS)
+    listing = await list_videos(service, page_size=2, modified_after="2025-09-12")
+    assert listing.total_count == 0 and listing.continuation_token, listing
+    assert len(service.container.requests) == 3, service.container.requests
+
+    found, token = [], listing.continuation_token
+    while token:
+        before = len(service.container.requests)
+        listing = await list_videos(
+            service, page_size=2, modified_after="2025-09-12", continuation_token=token
+        )
+        assert len(service.container.requests) - before <= 3, "Every call scans at most 3 pages"
+        found += [blob["name"] for blob in listing.blobs]
+        token = listing.continuation_token
+    assert found == ["veo3_video_12.mp4"], found
+
+    print("✅ Scan stopped after AZURE_LIST_MAX_SCAN_PAGES and resumed from its token")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Blob Pagination Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_default_lists_everything_newest_first,
+        test_token_alone_pages_by_name,
+        test_tokens_walk_every_video,
+        test_prefix_and_date_filters,
+        test_scan_limit_returns_short_page,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
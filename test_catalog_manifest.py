@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test the shared catalog manifest: ETag-conditioned shard writes and 304 reads
+Usage: python test_catalog_manifest.py
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_catalog_manifest_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=catalog;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+)
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeBlobStore:
+    """Blobs with ETags and the conditional requests Azure supports on them"""
+    def __init__(self):
+        self.blobs: dict[str, tuple[bytes, str]] = {}
+        self.version = 0
+        self.not_modified = 0
+        self.rejected = 0
+        self.unavailable = False
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self, blob)
+
+
+class FakeBlobClient:
+    def __init__(self, store: FakeBlobStore, name: str):
+        self.store = store
+        self.name = name
+
+    async def download_blob(self, etag=None, match_condition=None):
+        stored = self.store.blobs.get(self.name)
+        await asyncio.sleep(0.002)  # Lets another writer change the blob after this read
+        if stored is None:
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        data, current = stored
+        if match_condition == MatchConditions.IfModified and etag == current:
+            self.store.not_modified += 1
+            error = HttpResponseError(message="Not Modified")
+            error.status_code = 304
+            raise error
+
+        async def readall():
+            return data
+        return SimpleNamespace(readall=readall, properties=SimpleNamespace(etag=current))
+
+    async def upload_blob(self, data, overwrite=False, etag=None, match_condition=None, **kwargs):
+        if self.store.unavailable:
+            raise HttpResponseError(message="Server Busy")
+        existing = self.store.blobs.get(self.name)
+        if existing and not overwrite:
+            self.store.rejected += 1
+            raise ResourceExistsError("The specified blob already exists.")
+        stale = not existing or existing[1] != etag
+        if match_condition == MatchConditions.IfNotModified and stale:
+            self.store.rejected += 1
+            raise ResourceModifiedError("The condition specified is not met.")
+        self.store.version += 1
+        etag = f'"0x{self.store.version:04d}"'
+        self.store.blobs[self.name] = (bytes(data), etag)
+        return {"etag": etag, "last_modified": None}
+
+
+def replica(shards: int = 4, **overrides):
+    """A CatalogManifest as another server process sharing the container would have"""
+    params = inspect.signature(server.CatalogManifest).parameters
+    kwargs = {
+        "enabled": True, "prefix": ".catalog/", "shards": shards, "max_retries": 20,
+        "full_sync_interval": 0, **overrides
+    }
+    return server.CatalogManifest(**{name: kwargs[name] for name in kwargs if name in params})
+
+
+def shard_names(store: FakeBlobStore, shard: int) -> list[str]:
+    data, _ = store.blobs[f".catalog/shard-{shard:03d}.ndjson"]
+    return [json.loads(line)["n"] for line in data.splitlines()]
+
+
+async def test_concurrent_replicas_keep_every_write(store: FakeBlobStore):
+    """Replicas writing the same shard retry on ETag conflicts instead of losing entries"""
+    print("=== Testing conditional shard writes ===")
+    first, second = replica(shards=1), replica(shards=1)
+    names = [f"video_{index:02d}.mp4" for index in range(12)]
+    await asyncio.gather(*(
+        (first if index % 2 else second).update(
+            {name: server.CatalogManifest.entry(name, index, 1000.0 + index)}
+        )
+        for index, name in enumerate(names)
+    ))
+    assert shard_names(store, 0) == names, shard_names(store, 0)
+    assert first.conflicts + second.conflicts > 0, "The replicas should have collided"
+    assert store.rejected == first.conflicts + second.conflicts
+    assert first.failures == second.failures == 0
+
+    await first.update({names[0]: None, names[5]: None})
+    assert shard_names(store, 0) == [n for n in names if n not in (names[0], names[5])]
+
+    print(f"✅ {len(names)} entries kept through {store.rejected} rejected writes")
+    return True
+
+
+async def test_publish_and_cached_load(store: FakeBlobStore):
+    """A publish shards the catalog; reloads fetch only shards that changed"""
+    print("=== Testing publish and If-None-Match loads ===")
+    writer, reader = replica(), replica()
+    assert await reader.load() is None, "No manifest is published yet"
+
+    entries = [server.CatalogManifest.entry(f"clip_{i:02d}.mp4", i, 2000.0 + i) for i in range(20)]
+    await writer.publish(entries)
+    assert ".catalog/manifest.json" in store.blobs
+    for shard in range(4):
+        assert all(writer.shard_of(name) == shard for name in shard_names(store, shard))
+
+    loaded = await reader.load()
+    assert sorted(entry["n"] for entry in loaded) == [entry["n"] for entry in entries]
+    assert store.not_modified == 0
+
+    changed = "clip_03.mp4"
+    await writer.update({changed: server.CatalogManifest.entry(changed, 99, 3000.0)})
+    store.not_modified = 0
+    loaded = {entry["n"]: entry for entry in await reader.load()}
+    assert loaded[changed]["s"] == 99, loaded[changed]
+    assert store.not_modified == 3, f"Unchanged shards should answer 304: {store.not_modified}"
+
+    print("✅ Unchanged shards answered 304, the changed one was read again")
+    return True
+
+
+async def test_stale_or_missed_manifest_is_rebuilt(store: FakeBlobStore):
+    """An old header or a failed update makes the next sync list the container again"""
+    print("=== Testing manifest rebuild triggers ===")
+    writer = replica(full_sync_interval=3600)
+    await writer.publish([server.CatalogManifest.entry("a.mp4", 1, 1.0)])
+    assert await writer.load() is not None, "A fresh manifest is loaded"
+
+    header_name = ".catalog/manifest.json"
+    header = json.loads(store.blobs[header_name][0])
+    header["published"] -= 7200
+    store.blobs[header_name] = (json.dumps(header).encode(), store.blobs[header_name][1])
+    assert await writer.load() is None, "A manifest older than the interval is rebuilt"
+
+    store.unavailable = True
+    await writer.update({"b.mp4": server.CatalogManifest.entry("b.mp4", 2, 2.0)})
+    assert writer.failures == 1 and writer.needs_publish, writer.stats()
+
+    print("✅ Stale and incomplete manifests trigger a full listing")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Catalog Manifest Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_concurrent_replicas_keep_every_write,
+        test_publish_and_cached_load,
+        test_stale_or_missed_manifest_is_rebuilt,
+    ):
+        store = FakeBlobStore()
+        original = server.get_azure_blob_client
+        server.get_azure_blob_client = lambda: store
+        try:
+            passed = await test(store) and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+        finally:
+            server.get_azure_blob_client = original
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
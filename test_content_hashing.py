@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test single-pass MD5 / SHA-256 / CRC64 hashing of uploaded videos
+Usage: python test_content_hashing.py
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_content_hashing_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=hashing;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_UPLOAD_BLOCK_SIZE"] = str(64 * 1024)
+os.environ["AZURE_UPLOAD_CONCURRENCY"] = "3"
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+os.environ["AZURE_UPLOAD_DEDUP"] = "off"
+os.environ["AZURE_CATALOG_MANIFEST"] = "false"
+
+import mcp_veo3_azure_blob as server
+
+CONTENT = bytes((index * 7) % 256 for index in range(5 * 64 * 1024 + 999))
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.blocks: dict[str, bytes] = {}
+        self.block_kwargs: dict[str, dict] = {}
+        self.committed: list[str] = []
+        self.commit_kwargs: dict = {}
+
+    async def stage_block(self, block_id, data, *args, **kwargs):
+        self.blocks[block_id] = bytes(data)
+        self.block_kwargs[block_id] = kwargs
+
+    async def get_block_list(self, *args, **kwargs):
+        return [], []
+
+    async def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+        self.commit_kwargs = kwargs
+        return {"etag": "0x1", "last_modified": None}
+
+    async def upload_blob(self, data, *args, **kwargs):
+        self.blocks["single"] = bytes(data)
+        self.committed = ["single"]
+        self.commit_kwargs = kwargs
+        return {"etag": "0x2", "last_modified": None}
+
+
+class FakeServiceClient:
+    account_name = "hashing"
+
+    def __init__(self):
+        self.blobs: dict[str, FakeBlobClient] = {}
+
+        class ContainerClient:
+            async def create_container(self):
+                pass
+
+        self.container = ContainerClient()
+
+    def get_container_client(self, container):
+        return self.container
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(blob, FakeBlobClient())
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+def expected_crc64(data: bytes):
+    return f"{server.crc64.compute(data, 0):016x}" if server.crc64 else None
+
+
+def test_hasher_matches_whole_file():
+    """Hashing in pieces gives the same digests as hashing the whole content"""
+    print("=== Testing ContentHasher ===")
+    hasher = server.ContentHasher()
+    for offset in range(0, len(CONTENT), 10_000):
+        hasher.update(CONTENT[offset:offset + 10_000])
+
+    assert hasher.content_sha256 == hashlib.sha256(CONTENT).hexdigest()
+    assert hasher.content_md5 == base64.b64encode(hashlib.md5(CONTENT).digest()).decode()
+    assert hasher.content_crc64 == expected_crc64(CONTENT), hasher.content_crc64
+    assert bytes(hasher.content_settings().content_md5) == hashlib.md5(CONTENT).digest()
+
+    metadata = hasher.metadata()
+    assert metadata["content_sha256"] == hasher.content_sha256, metadata
+    assert metadata.get("content_crc64") == hasher.content_crc64, metadata
+
+    print(f"✅ Digests match (CRC64 {'on' if server.crc64 else 'not installed'})")
+    return True
+
+
+async def upload(service: FakeServiceClient, name: str, content: bytes):
+    path = os.path.join(TEST_OUTPUT_DIR, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    try:
+        return await server.upload_to_azure_blob(path, name, FakeContext())
+    finally:
+        server.get_azure_blob_client = original
+
+
+async def test_upload_reports_hashes():
+    """Block and single-request uploads return and store the content hashes"""
+    print("=== Testing hashes on upload ===")
+    service = FakeServiceClient()
+    for name, content in (("blocks.mp4", CONTENT), ("single.mp4", CONTENT[:1000])):
+        result = await upload(service, name, content)
+        assert result.success, result.error_message
+        blob = service.blobs[name]
+        assert b"".join(blob.blocks[block_id] for block_id in blob.committed) == content
+
+        assert result.content_sha256 == hashlib.sha256(content).hexdigest(), name
+        assert result.content_md5 == base64.b64encode(hashlib.md5(content).digest()).decode()
+        assert result.content_crc64 == expected_crc64(content), name
+
+        settings = blob.commit_kwargs["content_settings"]
+        assert bytes(settings.content_md5) == hashlib.md5(content).digest(), (
+            f"{name}: Content-MD5 must be set on the blob"
+        )
+        assert blob.commit_kwargs["metadata"]["content_sha256"] == result.content_sha256, name
+
+    assert len(service.blobs["blocks.mp4"].committed) == 6
+
+    print("✅ Uploads carry MD5, SHA-256 and CRC64")
+    return True
+
+
+async def test_blocks_carry_transactional_checksum():
+    """Every staged block carries the CRC64 of its own bytes, or its MD5 without CRC64"""
+    print("=== Testing per-request checksums ===")
+    service = FakeServiceClient()
+    result = await upload(service, "checked.mp4", CONTENT)
+    assert result.success, result.error_message
+
+    blob = service.blobs["checked.mp4"]
+    assert len(blob.block_kwargs) == len(blob.committed) == 6
+    for block_id in blob.committed:
+        block, kwargs = blob.blocks[block_id], blob.block_kwargs[block_id]
+        if server.crc64:
+            expected = server.crc64.compute(block, 0).to_bytes(8, "little")
+            assert kwargs.get("transactional_content_crc64") == expected, kwargs
+            assert "transactional_content_md5" not in kwargs, "Azure rejects both headers"
+        else:
+            assert kwargs.get("transactional_content_md5") == hashlib.md5(block).digest(), kwargs
+
+    print("✅ Each block is verified by Azure on arrival")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Content Hashing Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_hasher_matches_whole_file,
+        test_upload_reports_hashes,
+        test_blocks_carry_transactional_checksum,
+    ):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test the per-model generation scheduler: limits, priority lanes and session fairness
+Usage: python test_generation_scheduler.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_scheduler_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_PROGRESS_INTERVAL"] = "0.05"
+
+import mcp_veo3_azure_blob as server
+
+
+class SessionContext:
+    """Fake MCP context for one session that records queue status messages"""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.messages: list[str] = []
+
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, message=None):
+        if message:
+            self.messages.append(message)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_lanes_and_fairness():
+    """Interactive requests go first, and sessions take turns within a lane"""
+    print("=== Testing priority lanes and session round-robin ===")
+    scheduler = server.GenerationScheduler(limits={"model-a": 1}, default_limit=3)
+    admitted: list[str] = []
+    release = asyncio.Event()
+
+    async def request(label: str, ctx: SessionContext, lane: str):
+        async with scheduler.slot("model-a", ctx, lane=lane):
+            admitted.append(label)
+            await release.wait()
+
+    busy, greedy, polite = (SessionContext(name) for name in ("busy", "greedy", "polite"))
+    tasks = [asyncio.create_task(request("first", busy, "interactive"))]
+    await settle()
+    # One session floods the queue before another asks once; batch work is queued first
+    for label, ctx, lane in (
+        ("batch-1", polite, "batch"),
+        ("greedy-1", greedy, "interactive"),
+        ("greedy-2", greedy, "interactive"),
+        ("greedy-3", greedy, "interactive"),
+        ("polite-1", polite, "interactive"),
+    ):
+        tasks.append(asyncio.create_task(request(label, ctx, lane)))
+        await settle()
+
+    stats = scheduler.stats()["model-a"]
+    assert stats["limit"] == 1 and stats["active"] == 1, stats
+    assert stats["waiting"] == {"interactive": 4, "batch": 1}, stats
+    assert polite.messages[-1].startswith("Queued for model-a (interactive): position 2"), (
+        f"The polite session should be next after greedy's first request: {polite.messages}"
+    )
+
+    # Admit one request at a time
+    for _ in range(5):
+        release.set()
+        await settle()
+        release.clear()
+        await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+    expected = ["first", "greedy-1", "polite-1", "greedy-2", "greedy-3", "batch-1"]
+    assert admitted == expected, admitted
+    assert scheduler.stats()["model-a"]["active"] == 0
+
+    print(f"✅ Admission order {admitted}")
+    return True
+
+
+async def test_limits_and_cancellation():
+    """Models have separate limits and a cancelled waiter leaves the queue"""
+    print("=== Testing per-model limits and cancelled waiters ===")
+    scheduler = server.GenerationScheduler(limits={"model-a": 1}, default_limit=2)
+    release = asyncio.Event()
+    running: list[str] = []
+
+    async def request(model: str, label: str):
+        async with scheduler.slot(model, SessionContext(label)):
+            running.append(label)
+            await release.wait()
+
+    tasks = [
+        asyncio.create_task(request("model-b", "b1")),
+        asyncio.create_task(request("model-b", "b2")),
+        asyncio.create_task(request("model-b", "b3")),
+        asyncio.create_task(request("model-a", "a1")),
+    ]
+    await settle()
+    assert sorted(running) == ["a1", "b1", "b2"], f"Limit 2 for model-b, 1 for model-a: {running}"
+
+    tasks[2].cancel()
+    await settle()
+    assert scheduler.stats()["model-b"]["waiting"]["interactive"] == 0, scheduler.stats()
+
+    release.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert "b3" not in running, "A cancelled request must never be admitted"
+    assert all(queue["active"] == 0 for queue in scheduler.stats().values()), scheduler.stats()
+
+    try:
+        async with scheduler.slot("model-a", SessionContext("x"), lane="urgent"):
+            pass
+        raise AssertionError("Unknown lanes should be rejected")
+    except ValueError:
+        pass
+
+    limits = server.parse_model_limits("model-a=2, model-b=x,model-c=5")
+    assert limits == {"model-a": 2, "model-c": 5}, limits
+
+    print("✅ Limits are per model and cancelled waiters free their place")
+    return True
+
+
+async def test_slot_held_until_generation_finishes():
+    """A generation keeps its slot while Veo runs, so the next one waits to submit"""
+    print("=== Testing the slot is held while polling ===")
+    scheduler = server.GenerationScheduler(limits={"model-a": 1}, default_limit=1)
+    finish = {"first": asyncio.Event(), "second": asyncio.Event()}
+    submitted: list[str] = []
+
+    async def submit_generation(prompt, model, request_id, image_obj, number_of_videos):
+        submitted.append(prompt)
+        return SimpleNamespace(name=f"operations/{prompt}")
+
+    async def wait_for_operation(operation, **kwargs):
+        await finish[operation.name.split("/")[1]].wait()
+        return SimpleNamespace(response=None)
+
+    originals = (
+        server.generation_scheduler, server.submit_generation, server.wait_for_operation
+    )
+    server.generation_scheduler = scheduler
+    server.submit_generation = submit_generation
+    server.wait_for_operation = wait_for_operation
+    try:
+        tasks = [
+            asyncio.create_task(server.run_generation_pipeline(
+                prompt, "model-a", SessionContext(prompt), f"req-{prompt}", 0.0, "",
+                poll_interval=None, max_poll_time=60
+            ))
+            for prompt in ("first", "second")
+        ]
+        await asyncio.sleep(0.05)
+        assert submitted == ["first"], f"The second must wait while the first polls: {submitted}"
+        assert scheduler.stats()["model-a"]["active"] == 1, scheduler.stats()
+
+        finish["first"].set()
+        await asyncio.sleep(0.05)
+        assert submitted == ["first", "second"], submitted
+        finish["second"].set()
+        results = await asyncio.wait_for(
+            asyncio.gather(*tasks, return_exceptions=True), timeout=5
+        )
+        assert all(isinstance(result, RuntimeError) for result in results), results
+        assert scheduler.stats()["model-a"]["active"] == 0, scheduler.stats()
+    finally:
+        (
+            server.generation_scheduler, server.submit_generation, server.wait_for_operation
+        ) = originals
+
+    print("✅ Next generation submitted only after the first finished")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Generation Scheduler Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_lanes_and_fairness,
+        test_limits_and_cancellation,
+        test_slot_held_until_generation_finishes,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test that generations interrupted by a restart are resumed from the job store
+Usage: python test_job_resume.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_resume_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STREAMING_DOWNLOAD"] = "false"  # Fake videos are saved through the SDK path
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_POLL_TICK"] = "0.05"
+os.environ["VEO_POLL_MIN_INTERVAL"] = "0.05"
+os.environ["VEO_POLL_MAX_INTERVAL"] = "0.1"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeVideoFile:
+    uri = "https://example.invalid/video.mp4"
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(b"fake-mp4")
+
+
+class FakeGeneratedVideo:
+    def __init__(self):
+        self.video = FakeVideoFile()
+
+
+class FakeResponse:
+    def __init__(self):
+        self.generated_videos = [FakeGeneratedVideo()]
+
+
+class FakeOperation:
+    def __init__(self, name: str):
+        self.name = name
+        self.done = True
+        self.response = FakeResponse()
+
+
+class ResumingGeminiClient:
+    """Fake Gemini client that records which operations get polled"""
+    def __init__(self):
+        self.submitted = 0
+        self.polled = []
+        client = self
+
+        class Models:
+            def generate_videos(self, **kwargs):
+                client.submitted += 1
+                raise AssertionError("Resumed generations must not be resubmitted")
+
+        class Operations:
+            def get(self, operation):
+                client.polled.append(operation.name)
+                return FakeOperation(operation.name)
+
+        class Files:
+            def download(self, file):
+                return b"fake-mp4"
+
+        self.models = Models()
+        self.operations = Operations()
+        self.files = Files()
+
+
+async def test_resume_polling_generation():
+    """An operation left in the polling stage is picked up again, not regenerated"""
+    print("=== Testing resume of an interrupted generation ===")
+
+    fake_client = ResumingGeminiClient()
+    original_client = server.gemini_client
+    original_upload = server.AZURE_UPLOAD_ENABLED
+    server.gemini_client = fake_client
+    server.AZURE_UPLOAD_ENABLED = False
+
+    try:
+        # Simulate a previous process that was killed while polling
+        server.generation_store.create(
+            request_id="veo3_resume_test",
+            job_id="job_resumetest1",
+            model="veo-3.0-fast-generate-preview",
+            prompt="A resumed test video"
+        )
+        server.generation_store.update(
+            "veo3_resume_test",
+            stage="polling",
+            operation_name="operations/interrupted",
+            submitted_at=time.time() - 30
+        )
+
+        resumed = await server.resume_unfinished_generations()
+        assert resumed == 1, f"Expected 1 resumed generation, got {resumed}"
+
+        job = server.job_manager.get("job_resumetest1")
+        assert job is not None, "Resumed generation should be visible as a job"
+        await asyncio.wait_for(job.finished.wait(), timeout=10)
+
+        assert job.status == "succeeded", (
+            f"Resumed job should succeed, got {job.status}: {job.error}"
+        )
+        assert fake_client.submitted == 0, "Resumed generation must not be resubmitted"
+        assert fake_client.polled == ["operations/interrupted"], "Stored operation should be polled"
+        assert os.path.exists(job.result["video_path"]), "Resumed video should be downloaded"
+
+        record = server.generation_store.find_job("job_resumetest1")
+        assert record["stage"] == "completed", f"Stage should be completed, got {record['stage']}"
+        assert not server.generation_store.unfinished(), "Nothing should be left to resume"
+    finally:
+        server.gemini_client = original_client
+        server.AZURE_UPLOAD_ENABLED = original_upload
+
+    print("✅ Interrupted generation resumed from the stored operation")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Job Resume Test Suite")
+    print("=" * 50)
+
+    try:
+        passed = await test_resume_polling_generation()
+    except Exception as e:
+        print(f"❌ Test failed: {str(e)}")
+        passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
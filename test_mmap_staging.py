@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Test staging upload blocks as slices of a memory-mapped file
+Usage: python test_mmap_staging.py
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_mmap_staging_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=mapped;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_UPLOAD_BLOCK_SIZE"] = str(64 * 1024)
+os.environ["AZURE_UPLOAD_CONCURRENCY"] = "3"
+os.environ["AZURE_UPLOAD_MMAP"] = "true"
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+os.environ["AZURE_UPLOAD_DEDUP"] = "off"
+os.environ["AZURE_CATALOG_MANIFEST"] = "false"
+
+import mcp_veo3_azure_blob as server
+
+CONTENT = bytes((index * 13) % 256 for index in range(4 * 64 * 1024 + 321))
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.blocks: dict[str, bytes] = {}
+        self.block_types: list[type] = []
+        self.block_kwargs: dict[str, dict] = {}
+        self.committed: list[str] = []
+        self.staged_views: list = []
+        self.fail_at: int = -1
+
+    async def stage_block(self, block_id, data, *args, **kwargs):
+        self.block_types.append(type(data))
+        self.staged_views.append(data)
+        if len(self.staged_views) == self.fail_at:
+            raise RuntimeError("stage failed")
+        self.block_kwargs[block_id] = kwargs
+        await asyncio.sleep(0.01)
+        self.blocks[block_id] = bytes(data)
+
+    async def get_block_list(self, *args, **kwargs):
+        return [], []
+
+    async def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+        return {"etag": "0x1", "last_modified": None}
+
+    @property
+    def content(self) -> bytes:
+        return b"".join(self.blocks[block_id] for block_id in self.committed)
+
+
+class FakeServiceClient:
+    account_name = "mapped"
+
+    def __init__(self):
+        self.blobs: dict[str, FakeBlobClient] = {}
+
+        class ContainerClient:
+            async def create_container(self):
+                pass
+
+        self.container = ContainerClient()
+
+    def get_container_client(self, container):
+        return self.container
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(blob, FakeBlobClient())
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+async def upload(service: FakeServiceClient, name: str):
+    path = os.path.join(TEST_OUTPUT_DIR, name)
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    try:
+        return await server.upload_to_azure_blob(path, name, FakeContext())
+    finally:
+        server.get_azure_blob_client = original
+
+
+def test_map_file():
+    """Files map to a read-only view; empty files are not mapped"""
+    print("=== Testing map_file ===")
+    path = os.path.join(TEST_OUTPUT_DIR, "mapped.bin")
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+    view = server.map_file(path)
+    assert isinstance(view, memoryview) and view.readonly, view
+    assert bytes(view[1000:2000]) == CONTENT[1000:2000]
+    server.release_mapped_block(view, 0, 64 * 1024)
+    assert bytes(view[:10]) == CONTENT[:10], "Released pages fault back in"
+
+    hasher = server.ContentHasher()
+    hasher.update(view[:70_000])
+    hasher.update(view[70_000:])
+    assert hasher.content_sha256 == hashlib.sha256(CONTENT).hexdigest()
+    view.release()
+
+    empty = os.path.join(TEST_OUTPUT_DIR, "empty.bin")
+    open(empty, "wb").close()
+    assert server.map_file(empty) is None
+
+    print("✅ Mapped view slices, hashes and releases cleanly")
+    return True
+
+
+async def test_blocks_staged_from_mapping():
+    """Blocks are staged as memoryviews with a precomputed transactional checksum"""
+    print("=== Testing staging from the mapping ===")
+    service = FakeServiceClient()
+    result = await upload(service, "mapped.mp4")
+    assert result.success, result.error_message
+
+    blob = service.blobs["mapped.mp4"]
+    assert blob.content == CONTENT, "Committed blocks must reassemble the file"
+    assert len(blob.committed) == 5, blob.committed
+    assert all(kind is memoryview for kind in blob.block_types), blob.block_types
+    for block_id, kwargs in blob.block_kwargs.items():
+        assert kwargs.get("validate_content") is False, kwargs
+        if "transactional_content_md5" in kwargs:
+            digest = hashlib.md5(blob.blocks[block_id]).digest()
+            assert kwargs["transactional_content_md5"] == digest, kwargs
+        else:
+            assert kwargs.get("transactional_content_crc64"), kwargs
+        assert kwargs["length"] == len(blob.blocks[block_id]), kwargs
+    assert result.content_sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+    print(f"✅ {len(blob.committed)} mapped blocks staged and committed")
+    return True
+
+
+def is_released(view: memoryview) -> bool:
+    try:
+        view[0]
+    except ValueError:
+        return True
+    return False
+
+
+async def test_mapping_closed_after_upload():
+    """The file is unmapped and every block view released, whether the upload works or fails"""
+    print("=== Testing the mapping is closed ===")
+    mappings = []
+    original_map_file = server.map_file
+
+    def map_file(path):
+        view = original_map_file(path)
+        mappings.append(view.obj)
+        return view
+
+    server.map_file = map_file
+    try:
+        service = FakeServiceClient()
+        result = await upload(service, "closed.mp4")
+        assert result.success, result.error_message
+
+        failing = FakeServiceClient()
+        failing.get_blob_client(None, "broken.mp4").fail_at = 2
+        broken = await upload(failing, "broken.mp4")
+        assert not broken.success and "stage failed" in broken.error_message, broken
+    finally:
+        server.map_file = original_map_file
+
+    assert len(mappings) == 2 and all(mapped.closed for mapped in mappings), mappings
+    for blob in (service.blobs["closed.mp4"], failing.blobs["broken.mp4"]):
+        assert all(is_released(view) for view in blob.staged_views), "Block views must be released"
+
+    print("✅ Mapping closed and block views released after success and failure")
+    return True
+
+
+async def test_read_path_without_mmap():
+    """AZURE_UPLOAD_MMAP=false stages plain bytes read from the file"""
+    print("=== Testing the read() fallback ===")
+    service = FakeServiceClient()
+    server.AZURE_UPLOAD_MMAP = False
+    try:
+        result = await upload(service, "read.mp4")
+    finally:
+        server.AZURE_UPLOAD_MMAP = True
+    assert result.success, result.error_message
+
+    blob = service.blobs["read.mp4"]
+    assert blob.content == CONTENT
+    assert all(kind is bytes for kind in blob.block_types), blob.block_types
+
+    print("✅ Fallback stages bytes")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Mmap Staging Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_map_file,
+        test_blocks_staged_from_mapping,
+        test_mapping_closed_after_upload,
+        test_read_path_without_mmap,
+    ):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test multi-candidate generation: one operation, every video downloaded in parallel
+Usage: python test_multi_candidate.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_multi_candidate_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STREAMING_DOWNLOAD"] = "false"  # Fake videos are saved through the SDK path
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_POLL_TICK"] = "0.05"
+os.environ["VEO_POLL_MIN_INTERVAL"] = "0.05"
+os.environ["VEO_POLL_MAX_INTERVAL"] = "0.1"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, **kwargs):
+        pass
+
+
+class CandidateGeminiClient:
+    """Fake Gemini client returning one finished operation with the requested candidates"""
+    def __init__(self):
+        self.requests: list[dict] = []
+        self.saving = 0
+        self.peak_saving = 0
+        self.lock = threading.Lock()
+        client = self
+
+        class FakeVideoFile:
+            def __init__(self, index: int):
+                self.uri = f"https://example.invalid/candidate-{index}.mp4"
+                self.index = index
+
+            def save(self, path: str):
+                with client.lock:
+                    client.saving += 1
+                    client.peak_saving = max(client.peak_saving, client.saving)
+                time.sleep(0.2)
+                with open(path, "wb") as f:
+                    f.write(f"candidate-{self.index}".encode())
+                with client.lock:
+                    client.saving -= 1
+
+        class FakeOperation:
+            def __init__(self, count: int):
+                self.name = f"operations/candidates-{len(client.requests)}"
+                self.done = True
+                self.response = type("Response", (), {})()
+                self.response.generated_videos = [
+                    type("Generated", (), {"video": FakeVideoFile(index)})()
+                    for index in range(count)
+                ]
+
+        class Models:
+            def generate_videos(self, **kwargs):
+                client.requests.append(kwargs)
+                config = kwargs.get("config")
+                return FakeOperation(getattr(config, "number_of_videos", None) or 1)
+
+        class Operations:
+            def get(self, operation):
+                return operation
+
+        class Files:
+            def download(self, file):
+                return b""
+
+        self.models = Models()
+        self.operations = Operations()
+        self.files = Files()
+
+
+async def test_candidates_in_one_operation():
+    """Three candidates come from a single submission and each gets its own file"""
+    print("=== Testing multi-candidate generation ===")
+    fake_client = CandidateGeminiClient()
+    original_client = server.gemini_client
+    server.gemini_client = fake_client
+    try:
+        result = await server.generate_video_with_progress(
+            prompt="Three takes of a sunrise",
+            model="veo-3.0-generate-preview",
+            ctx=FakeContext(),
+            number_of_videos=3
+        )
+        single = await server.generate_video_with_progress(
+            prompt="One take of a sunset", model="veo-3.0-generate-preview", ctx=FakeContext()
+        )
+    finally:
+        server.gemini_client = original_client
+
+    assert len(fake_client.requests) == 2, "Each call should submit exactly one operation"
+    assert fake_client.requests[0]["config"].number_of_videos == 3, fake_client.requests[0]
+    assert "config" not in fake_client.requests[1], "Single videos keep the original request"
+
+    videos = result["videos"]
+    assert len(videos) == 3, f"Expected 3 candidates, got {len(videos)}"
+    paths = [video["video_path"] for video in videos]
+    assert len(set(paths)) == 3, f"Candidates need distinct files: {paths}"
+    for index, path in enumerate(paths):
+        with open(path, "rb") as f:
+            assert f.read() == f"candidate-{index}".encode(), f"Wrong content in {path}"
+    assert result["video_path"] == paths[0], "The first candidate stays the primary result"
+    assert fake_client.peak_saving >= 2, (
+        f"Candidates should download concurrently, peak was {fake_client.peak_saving}"
+    )
+    assert len(single["videos"]) == 1 and single["video_path"] == single["videos"][0]["video_path"]
+
+    print(f"✅ {len(videos)} candidates downloaded, {fake_client.peak_saving} at a time")
+    return True
+
+
+async def test_candidate_count_validation():
+    """Counts outside 1..VEO_MAX_CANDIDATES are rejected before any submission"""
+    print("=== Testing candidate count validation ===")
+    generate = getattr(server.generate_video, "fn", server.generate_video)
+    for count in (0, server.VEO_MAX_CANDIDATES + 1):
+        try:
+            await generate("A prompt", FakeContext(), number_of_videos=count)
+            raise AssertionError(f"number_of_videos={count} should be rejected")
+        except ValueError as e:
+            assert "number_of_videos" in str(e), str(e)
+
+    print("✅ Invalid candidate counts are rejected")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Multi-Candidate Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_candidates_in_one_operation, test_candidate_count_validation):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
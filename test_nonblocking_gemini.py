@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Regression test: a slow Gemini call must not freeze other MCP tool calls
+Usage: python test_nonblocking_gemini.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_nonblocking_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STREAMING_DOWNLOAD"] = "false"  # Fake videos are saved through the SDK path
+
+import mcp_veo3_azure_blob as server
+
+
+class MockContext:
+    """Mock context for testing"""
+    def __init__(self):
+        self.messages = []
+        self.progress = 0
+
+    async def info(self, message: str):
+        self.messages.append(("info", message))
+
+    async def error(self, message: str):
+        self.messages.append(("error", message))
+
+    async def report_progress(self, progress: int, total: int):
+        self.progress = progress
+
+
+class FakeVideoFile:
+    """Fake generated video that writes a few bytes when saved"""
+    uri = "https://example.invalid/video.mp4"
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(b"fake-mp4")
+
+
+class FakeGeneratedVideo:
+    def __init__(self):
+        self.video = FakeVideoFile()
+
+
+class FakeResponse:
+    def __init__(self):
+        self.generated_videos = [FakeGeneratedVideo()]
+
+
+class FakeOperation:
+    def __init__(self, done: bool):
+        self.name = "operations/fake-slow-operation"
+        self.done = done
+        self.response = FakeResponse() if done else None
+
+
+class SlowGeminiClient:
+    """Fake Gemini client whose operations.get blocks like a slow network call"""
+    def __init__(self, delay: float):
+        self.poll_started = threading.Event()
+        self.delay = delay
+        client = self
+
+        class Models:
+            def generate_videos(self, **kwargs):
+                return FakeOperation(done=False)
+
+        class Operations:
+            def get(self, operation):
+                client.poll_started.set()
+                time.sleep(client.delay)
+                return FakeOperation(done=True)
+
+        class Files:
+            def download(self, file):
+                return b"fake-mp4"
+
+        self.models = Models()
+        self.operations = Operations()
+        self.files = Files()
+
+
+def tool_fn(tool):
+    """Return the plain coroutine function behind an MCP tool"""
+    return getattr(tool, "fn", tool)
+
+
+async def test_tool_call_not_blocked_by_slow_poll():
+    """test_connection must return promptly while a generation is stuck in operations.get"""
+    print("=== Testing concurrent tool call during slow operations.get ===")
+
+    fake_client = SlowGeminiClient(delay=2.0)
+    original_client = server.gemini_client
+    original_upload = server.AZURE_UPLOAD_ENABLED
+    server.gemini_client = fake_client
+    server.AZURE_UPLOAD_ENABLED = False
+
+    try:
+        generation = asyncio.create_task(server.generate_video_with_progress(
+            prompt="A slow test video",
+            model="veo-3.0-fast-generate-preview",
+            ctx=MockContext(),
+            poll_interval=0
+        ))
+
+        # Wait until the generation is inside the slow status call
+        while not fake_client.poll_started.is_set():
+            assert not generation.done(), "Generation finished before polling started"
+            await asyncio.sleep(0.01)
+
+        started = time.monotonic()
+        result = await asyncio.wait_for(tool_fn(server.test_connection)(MockContext()), timeout=1.0)
+        elapsed = time.monotonic() - started
+
+        assert result["status"] == "success", "test_connection should succeed"
+        assert elapsed < 0.5, f"test_connection took {elapsed:.2f}s while a poll was in flight"
+        assert not generation.done(), "Slow poll should still be running"
+
+        video = await asyncio.wait_for(generation, timeout=10)
+        assert os.path.exists(video["video_path"]), "Generated video should be saved"
+    finally:
+        server.gemini_client = original_client
+        server.AZURE_UPLOAD_ENABLED = original_upload
+
+    print(f"✅ test_connection returned in {elapsed:.3f}s during a slow poll")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Non-blocking Gemini Test Suite")
+    print("=" * 50)
+
+    try:
+        passed = await test_tool_call_not_blocked_by_slow_poll()
+    except Exception as e:
+        print(f"❌ Test failed: {str(e)}")
+        passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test the shared operation poller: hung status RPCs and replaced operations
+Usage: python test_operation_poller.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_operation_poller_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeOperation:
+    def __init__(self, name: str, done: bool = False):
+        self.name = name
+        self.done = done
+
+
+class FakeGeminiClient:
+    """operations.get blocks while an operation's gate is closed"""
+    def __init__(self):
+        self.gates: dict[str, threading.Event] = {}
+        self.calls: dict[str, int] = {}
+        self.called = threading.Event()
+        client = self
+
+        class Operations:
+            def get(self, operation):
+                name = operation.name
+                client.calls[name] = client.calls.get(name, 0) + 1
+                client.called.set()
+                gate = client.gates.get(name)
+                if gate is not None:
+                    gate.wait(timeout=10)
+                return FakeOperation(name, done=client.calls[name] >= 2)
+
+        self.operations = Operations()
+
+
+async def test_hung_rpc_holds_one_thread():
+    """A status RPC past its deadline is not joined by more threads for the same operation"""
+    print("=== Testing a hung operations.get ===")
+    client = FakeGeminiClient()
+    client.gates["operations/hung"] = threading.Event()
+    poller = server.OperationPoller(concurrency=4, tick=0.1, max_errors=5, rpc_timeout=1.0)
+    original = server.gemini_client
+    server.gemini_client = client
+    try:
+        hung = poller.watch(FakeOperation("operations/hung"), interval=0.1)
+        healthy = poller.watch(FakeOperation("operations/ok"), interval=0.1)
+        finished = await asyncio.wait_for(healthy, timeout=2)
+        assert finished.done, "Other operations keep being polled"
+
+        await asyncio.sleep(2.5)
+        assert client.calls["operations/hung"] == 1, (
+            f"Timed-out checks must not start new RPCs: {client.calls}"
+        )
+        stats = poller.stats()
+        assert stats["stuck_status_rpcs"] == 1 and not hung.done(), stats
+
+        client.gates["operations/hung"].set()
+        operation = await asyncio.wait_for(hung, timeout=3)
+        assert operation.done and client.calls["operations/hung"] == 2, client.calls
+    finally:
+        poller.release("operations/hung")
+        server.gemini_client = original
+        client.gates["operations/hung"].set()
+
+    print("✅ One thread per hung operation; polling resumed once it returned")
+    return True
+
+
+async def test_replaced_entry_survives_old_check():
+    """A check of a released operation does not drop the entry that replaced it"""
+    print("=== Testing a re-watched operation ===")
+    client = FakeGeminiClient()
+    gate = client.gates["operations/again"] = threading.Event()
+    poller = server.OperationPoller(concurrency=4, tick=0.1, max_errors=3, rpc_timeout=5.0)
+    original = server.gemini_client
+    server.gemini_client = client
+    try:
+        first = poller.watch(FakeOperation("operations/again"), interval=0.1)
+        await asyncio.to_thread(client.called.wait, 2)
+        poller.release("operations/again")
+        assert first.cancelled()
+
+        second = poller.watch(FakeOperation("operations/again"), interval=0.1)
+        client.calls["operations/again"] = 2  # The old check will report the operation done
+        gate.set()
+        operation = await asyncio.wait_for(second, timeout=3)
+        assert operation.done and poller.stats()["in_flight_operations"] == 0, poller.stats()
+    finally:
+        server.gemini_client = original
+        gate.set()
+
+    print("✅ The new watcher got its result after the old check finished")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Operation Poller Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_hung_rpc_holds_one_thread, test_replaced_entry_survives_old_check):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
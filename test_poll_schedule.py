@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test history-driven poll scheduling and ETA-based progress
+Usage: python test_poll_schedule.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_poll_schedule_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_POLL_TICK"] = "0.05"
+os.environ["VEO_POLL_MIN_INTERVAL"] = "0.05"
+os.environ["VEO_POLL_MAX_INTERVAL"] = "2"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeOperation:
+    def __init__(self, name: str, done: bool):
+        self.name = name
+        self.done = done
+
+
+class TimedGeminiClient:
+    """Fake Gemini client whose operations finish `duration` seconds after the first watch"""
+    def __init__(self, duration: float):
+        self.started = time.monotonic()
+        self.checks: list[float] = []
+        client = self
+
+        class Operations:
+            def get(self, operation):
+                elapsed = time.monotonic() - client.started
+                client.checks.append(elapsed)
+                return FakeOperation(operation.name, done=elapsed >= duration)
+
+        self.operations = Operations()
+
+
+def test_schedule_from_defaults():
+    """Without samples the model default sets a sparse, dense, then backing-off schedule"""
+    print("=== Testing schedule from the model default ===")
+    history = server.ModelLatencyHistory(size=10, defaults={"model-a": 100.0})
+    samples = history.samples("model-a")
+    assert samples == [50.0, 75.0, 100.0, 125.0, 160.0], samples
+    assert history.percentile("model-a", 0.1) == 50.0
+    assert history.percentile("model-a", 0.9) == 160.0
+
+    # Halfway to p10 early on, capped at the maximum interval
+    assert history.next_poll_delay("model-a", 0) == 2.0, history.next_poll_delay("model-a", 0)
+    assert history.next_poll_delay("model-a", 49) == 0.5, history.next_poll_delay("model-a", 49)
+    # Densest polling inside the p10..p90 window
+    assert history.next_poll_delay("model-a", 100) == 0.05
+    # Gradual back-off once past p90
+    delay = history.next_poll_delay("model-a", 200)
+    assert abs(delay - 0.1) < 1e-9, delay
+
+    unknown = history.samples("model-unknown")
+    assert unknown[2] == 120.0, f"Unknown models fall back to 120s: {unknown}"
+
+    print("✅ Default latency spread drives sparse, dense and back-off intervals")
+    return True
+
+
+def test_recorded_history():
+    """Recorded latencies replace the defaults and give a conditional ETA"""
+    print("=== Testing ETA from recorded latencies ===")
+    history = server.ModelLatencyHistory(size=10, defaults={"model-b": 100.0})
+    for seconds in (10, 11, 12, 13):
+        history.record("model-b", seconds)
+    assert history.samples("model-b")[0] == 50.0, "Fewer than MIN_SAMPLES keeps the defaults"
+    history.record("model-b", 14)
+    assert history.samples("model-b") == [10, 11, 12, 13, 14], history.samples("model-b")
+
+    assert history.eta("model-b", 11.5) == 1.5, history.eta("model-b", 11.5)
+    assert history.eta("model-b", 30) == 0.1, "Past every sample the ETA is two minimum intervals"
+    fraction = history.progress_fraction("model-b", 11.5)
+    assert abs(fraction - 11.5 / 13) < 1e-9, f"Unexpected progress fraction {fraction}"
+    assert history.progress_fraction("model-b", 5) < fraction
+    assert fraction < history.progress_fraction("model-b", 13.5)
+
+    for seconds in range(20, 40):
+        history.record("model-b", seconds)
+    assert len(history.samples("model-b")) == 10, "History keeps only the newest samples"
+    assert history.stats()["model-b"]["samples"] == 10
+
+    print("✅ ETA and progress follow the recorded latencies")
+    return True
+
+
+async def test_poller_uses_history():
+    """The shared poller waits for the expected window instead of checking at once"""
+    print("=== Testing poller spacing from latency history ===")
+    fake_client = TimedGeminiClient(duration=0.6)
+    original_client = server.gemini_client
+    server.gemini_client = fake_client
+    for _ in range(5):
+        server.latency_history.record("model-c", 0.6)
+    try:
+        operation = FakeOperation("operations/history-spaced", done=False)
+        future = server.operation_poller.watch(operation, model="model-c")
+        finished = await asyncio.wait_for(future, timeout=10)
+        server.operation_poller.release(operation.name)
+    finally:
+        server.gemini_client = original_client
+
+    checks = fake_client.checks
+    assert finished.done, "The poller should resolve with the finished operation"
+    assert checks[0] >= 0.25, f"First check should wait about half of p10 (0.3s): {checks}"
+    assert len(checks) <= 8, f"Checks should cluster around completion, not spin: {checks}"
+
+    fixed_client = TimedGeminiClient(duration=0.5)
+    server.gemini_client = fixed_client
+    try:
+        operation = FakeOperation("operations/fixed-interval", done=False)
+        future = server.operation_poller.watch(operation, interval=0.2, model="model-c")
+        await asyncio.wait_for(future, timeout=10)
+        server.operation_poller.release(operation.name)
+    finally:
+        server.gemini_client = original_client
+    gaps = [b - a for a, b in zip(fixed_client.checks, fixed_client.checks[1:])]
+    assert gaps and min(gaps) >= 0.15, f"A set interval fixes the spacing: {fixed_client.checks}"
+
+    print(f"✅ History-spaced checks at {[round(check, 2) for check in checks]}s")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Poll Schedule Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_schedule_from_defaults, test_recorded_history, test_poller_uses_history):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
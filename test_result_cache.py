@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed generation result cache
+Usage: python test_result_cache.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_result_cache_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_CACHE_ENABLED"] = "true"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, **kwargs):
+        pass
+
+
+class RefusingGeminiClient:
+    """Fake Gemini client that fails the test if a generation is submitted"""
+    def __init__(self):
+        self.submitted = 0
+        client = self
+
+        class Models:
+            def generate_videos(self, **kwargs):
+                client.submitted += 1
+                raise RuntimeError("generation submitted")
+
+        self.models = Models()
+
+
+def stored_result(name: str, size: int = 10, url: str = None) -> dict:
+    path = os.path.join(TEST_OUTPUT_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return {
+        "model": "veo-3.0-generate-preview",
+        "prompt": name,
+        "video_path": path,
+        "filename": name,
+        "azure_blob_url": url,
+        "file_size": size,
+    }
+
+
+def age(cache, cache_key: str, seconds: float) -> None:
+    """Move an entry's timestamps into the past"""
+    cache.db.execute(
+        "UPDATE generation_cache SET created = created - ?, last_used = last_used - ?"
+        " WHERE cache_key = ?",
+        (seconds, seconds, cache_key),
+    )
+
+
+def test_cache_key():
+    """Keys ignore whitespace and Unicode form, but not model or image"""
+    print("=== Testing cache keys ===")
+    key = server.generation_cache_key("veo-3.0-generate-preview", "a  cat\n on a mat")
+    assert key == server.generation_cache_key("veo-3.0-generate-preview", " a cat on a mat ")
+    assert server.generation_cache_key("m", "caf\u00e9") == server.generation_cache_key(
+        "m", "cafe\u0301"
+    ), "NFC-equivalent prompts share a key"
+    assert key != server.generation_cache_key("veo-2.0-generate-001", "a cat on a mat")
+    assert key != server.generation_cache_key("veo-3.0-generate-preview", "a cat on a mat", "ab12")
+
+    print("✅ Normalized prompts share a key")
+    return True
+
+
+def test_ttl_and_eviction():
+    """Entries expire, vanished local files miss, and LRU eviction keeps the budget"""
+    print("=== Testing TTL and LRU eviction ===")
+    cache = server.GenerationResultCache(server.state_db, ttl=60, max_entries=2, max_bytes=25)
+    cache.put("k1", stored_result("one.mp4"))
+    cache.put("k2", stored_result("two.mp4"))
+    age(cache, "k1", 5)
+    age(cache, "k2", 10)
+    assert cache.get("k1")["filename"] == "one.mp4"
+
+    # k1 was just used, so the third entry pushes out k2
+    cache.put("k3", stored_result("three.mp4"))
+    assert cache.get("k2") is None and cache.get("k1") and cache.get("k3"), cache.stats()
+
+    # Size budget: 25 bytes keeps the most recently used 10 + 10 byte entries only
+    age(cache, "k1", 20)
+    cache.put("k4", stored_result("four.mp4", size=10))
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 20, stats
+    assert cache.get("k1") is None, "Least recently used entry is evicted first"
+
+    age(cache, "k3", 120)
+    assert cache.get("k3") is None, "Entries older than the TTL miss"
+    os.unlink(os.path.join(TEST_OUTPUT_DIR, "four.mp4"))
+    assert cache.get("k4") is None, "A local-only entry whose file is gone misses"
+    assert os.path.exists(os.path.join(TEST_OUTPUT_DIR, "one.mp4")), "Eviction never deletes videos"
+
+    cache.put("k5", stored_result("five.mp4", url="https://blob/five.mp4"))
+    os.unlink(os.path.join(TEST_OUTPUT_DIR, "five.mp4"))
+    assert cache.get("k5")["azure_blob_url"] == "https://blob/five.mp4", (
+        "Uploaded entries stay usable after the local file is cleaned up"
+    )
+    assert cache.stats()["hits"] >= 4 and cache.stats()["misses"] >= 4, cache.stats()
+
+    print("✅ Expired, missing and least recently used entries are dropped")
+    return True
+
+
+async def test_hit_skips_generation():
+    """A hit returns the stored video without submitting; bypass_cache submits anyway"""
+    print("=== Testing cache hits in generate_video_with_progress ===")
+    model, prompt = "veo-3.0-generate-preview", "A lighthouse at dusk"
+    cached = stored_result("lighthouse.mp4", size=42, url="https://blob/lighthouse.mp4")
+    cached["prompt"] = prompt
+    server.result_cache.put(server.generation_cache_key(model, prompt), cached)
+
+    fake_client = RefusingGeminiClient()
+    original_client = server.gemini_client
+    server.gemini_client = fake_client
+    try:
+        hit = await server.generate_video_with_progress(
+            prompt="  A lighthouse   at dusk", model=model, ctx=FakeContext()
+        )
+        assert hit["cached"] is True and fake_client.submitted == 0, hit
+        assert hit["azure_blob_url"] == "https://blob/lighthouse.mp4", hit
+        assert hit["file_size"] == 42 and hit["video_path"] == cached["video_path"], hit
+
+        try:
+            await server.generate_video_with_progress(
+                prompt=prompt, model=model, ctx=FakeContext(), bypass_cache=True
+            )
+            raise AssertionError("bypass_cache should submit a new generation")
+        except ValueError as e:
+            assert "generation submitted" in str(e), str(e)
+        assert fake_client.submitted == 1, fake_client.submitted
+    finally:
+        server.gemini_client = original_client
+
+    print("✅ Identical requests are answered from the cache")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Result Cache Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_cache_key, test_ttl_and_eviction, test_hit_skips_generation):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
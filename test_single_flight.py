@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test coalescing of identical requests and recovery of coalesced jobs after a restart
+Usage: python test_single_flight.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_single_flight_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_CACHE_ENABLED"] = "false"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, message=None):
+        pass
+
+
+class FakePipeline:
+    """Stands in for run_generation_pipeline and records what the real one would"""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.runs: list[str] = []
+
+    async def __call__(self, prompt, model, request_id, resume=None, **kwargs):
+        self.runs.append(request_id)
+        if not resume:
+            server.generation_store.create(request_id=request_id, model=model, prompt=prompt)
+            server.generation_store.update(request_id, stage="polling")
+        await self.release.wait()
+        video_path = os.path.join(TEST_OUTPUT_DIR, f"{request_id}.mp4")
+        server.generation_store.update(
+            request_id, stage="completed", video_path=video_path, filename=f"{request_id}.mp4"
+        )
+        return {"video_path": video_path, "filename": f"{request_id}.mp4", "azure_blob_url": None}
+
+
+def stage_of(request_id: str) -> dict:
+    rows = server.state_db.execute(
+        "SELECT * FROM generations WHERE request_id = ?", (request_id,)
+    )
+    return rows[0] if rows else {}
+
+
+async def test_follower_recorded_against_leader():
+    """A follower is stored as following its leader and gets the leader's outcome"""
+    print("=== Testing the stored follower -> leader link ===")
+    pipeline = FakePipeline()
+    original = server.run_generation_pipeline
+    server.run_generation_pipeline = pipeline
+    try:
+        leader = asyncio.create_task(server.generate_video_with_progress(
+            "A coalesced test video", "model-a", FakeContext(), job_id="job_leader"
+        ))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(server.generate_video_with_progress(
+            "A  coalesced test video", "model-a", FakeContext(), job_id="job_follower"
+        ))
+        await asyncio.sleep(0.01)
+        assert len(pipeline.runs) == 1, pipeline.runs
+
+        record = server.generation_store.find_job("job_follower")
+        assert record and record["stage"] == "following", record
+        assert record["leader_request_id"] == pipeline.runs[0], record
+
+        pipeline.release.set()
+        leader_result, follower_result = await asyncio.wait_for(
+            asyncio.gather(leader, follower), timeout=5
+        )
+        assert follower_result["coalesced"] and not leader_result.get("coalesced")
+        record = server.generation_store.find_job("job_follower")
+        assert record["stage"] == "completed", record
+        assert record["video_path"] == leader_result["video_path"], record
+    finally:
+        server.run_generation_pipeline = original
+
+    print("✅ Follower row points at its leader and takes its outcome")
+    return True
+
+
+async def test_followers_survive_restart():
+    """After a restart followers wait for the resumed leader or fail with their lost leader"""
+    print("=== Testing coalesced jobs after a restart ===")
+    store = server.generation_store
+    # A previous process was killed while the leader polled and two requests followed
+    store.create(request_id="veo3_leader", job_id="job_old_leader", model="m", prompt="p")
+    store.update(
+        "veo3_leader", stage="polling", operation_name="operations/x", submitted_at=time.time()
+    )
+    store.create(
+        request_id="veo3_follower", job_id="job_old_follower", model="m", prompt="p",
+        leader_request_id="veo3_leader"
+    )
+    store.create(
+        request_id="veo3_orphan", job_id="job_orphan", model="m", prompt="q",
+        leader_request_id="veo3_never_recorded"
+    )
+
+    pipeline = FakePipeline()
+    original = server.run_generation_pipeline
+    server.run_generation_pipeline = pipeline
+    try:
+        resumed = await server.resume_unfinished_generations()
+        assert resumed == 2, f"Leader and follower should resume, got {resumed}"
+        await asyncio.sleep(0.01)
+        assert pipeline.runs == ["veo3_leader"], "Only the leader may run the pipeline"
+
+        follower = server.job_manager.get("job_old_follower")
+        assert follower is not None and follower.status == "running", follower
+        pipeline.release.set()
+        await asyncio.wait_for(follower.finished.wait(), timeout=5)
+
+        assert follower.status == "succeeded" and follower.result["coalesced"], follower.status
+        assert stage_of("veo3_follower")["stage"] == "completed"
+        assert stage_of("veo3_follower")["video_path"] == stage_of("veo3_leader")["video_path"]
+        assert stage_of("veo3_orphan")["stage"] == "failed", stage_of("veo3_orphan")
+        assert not store.following(), "No follower is left waiting"
+    finally:
+        server.run_generation_pipeline = original
+
+    print("✅ Followers reattach to their resumed leader")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Single Flight Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_follower_recorded_against_leader, test_followers_survive_restart):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
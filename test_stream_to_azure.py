@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test zero-disk mode: Gemini output streamed straight into Azure staged blocks
+Usage: python test_stream_to_azure.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_stream_to_azure_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STREAM_BLOCK_SIZE"] = "8192"
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+os.environ["AZURE_CATALOG_MANIFEST"] = "false"
+os.environ["VEO_DOWNLOAD_MAX_RETRIES"] = "0"
+
+import mcp_veo3_azure_blob as server
+
+VIDEO = bytes(index % 251 for index in range(30_000))
+
+
+class Done:
+    """Result usable both from a worker thread and as an awaitable, like either SDK client"""
+    def __init__(self, value=None):
+        self.value = value
+
+    def __await__(self):
+        return self.value
+        yield
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.blocks: dict[str, bytes] = {}
+        self.staged: list[str] = []
+        self.committed: list[str] = []
+        self.staging = 0
+        self.peak_staging = 0
+        self.lock = threading.Lock()
+
+    def stage_block(self, block_id, data, *args, **kwargs):
+        with self.lock:
+            self.staging += 1
+            self.peak_staging = max(self.peak_staging, self.staging)
+        time.sleep(0.01)
+        self.blocks[block_id] = bytes(data)
+        self.staged.append(block_id)
+        with self.lock:
+            self.staging -= 1
+        return Done()
+
+    def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+        return Done({"etag": "0x1", "last_modified": None})
+
+    @property
+    def content(self) -> bytes:
+        return b"".join(self.blocks[block_id] for block_id in self.committed)
+
+
+class FakeServiceClient:
+    account_name = "testaccount"
+
+    def __init__(self):
+        self.blobs: dict[str, FakeBlobClient] = {}
+        service = self
+
+        class ContainerClient:
+            def create_container(self):
+                return Done()
+
+            def get_blob_client(self, blob):
+                return service.get_blob_client(container=None, blob=blob)
+
+        self.container_client = ContainerClient()
+
+    def get_container_client(self, container):
+        return self.container_client
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(blob, FakeBlobClient())
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+class VideoServer:
+    """Minimal HTTP/1.1 server for the generated video, or an error status"""
+    def __init__(self, content: bytes, status: str = "200 OK"):
+        self.content = content
+        self.status = status
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/video.mp4"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        while (await reader.readline()).strip():
+            pass
+        body = self.content if self.status.startswith("200") else b""
+        writer.write(
+            f"HTTP/1.1 {self.status}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode()
+        )
+        for offset in range(0, len(body), 4096):
+            writer.write(body[offset:offset + 4096])
+            await writer.drain()
+            await asyncio.sleep(0.005)
+        writer.close()
+
+
+async def stream(service: FakeServiceClient, blob_name: str, local_path=None, status="200 OK"):
+    video_server = VideoServer(VIDEO, status)
+    uri = await video_server.start()
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    try:
+        return await server.stream_video_to_azure(
+            uri, blob_name, "req-zero-disk", FakeContext(), local_path
+        )
+    finally:
+        server.get_azure_blob_client = original
+        await video_server.stop()
+
+
+async def test_streamed_blocks():
+    """Blocks are staged while downloading and committed in order, with no local file"""
+    print("=== Testing streaming into staged blocks ===")
+    service = FakeServiceClient()
+    before = set(os.listdir(TEST_OUTPUT_DIR))
+    result = await stream(service, "zero-disk.mp4")
+
+    blob = service.blobs["zero-disk.mp4"]
+    assert result.success and result.file_size == len(VIDEO), result
+    assert result.blob_url.endswith(f"/{server.AZURE_CONTAINER_NAME}/zero-disk.mp4"), result
+    assert blob.content == VIDEO, "Committed blocks must reassemble the video"
+    assert len(blob.committed) == 4, f"30000 bytes in 8192-byte blocks: {len(blob.committed)}"
+    assert all(len(blob.blocks[block_id]) <= 8192 for block_id in blob.committed)
+    assert blob.peak_staging == 1, "At most one block uploads while the next downloads"
+    assert set(os.listdir(TEST_OUTPUT_DIR)) - before <= {"state.db-wal", "state.db-shm"}, (
+        "Zero-disk mode must not write the video to OUTPUT_DIR"
+    )
+
+    print(f"✅ {len(blob.committed)} blocks committed without touching the disk")
+    return True
+
+
+async def test_optional_local_copy():
+    """With a local path the same bytes are also written to OUTPUT_DIR"""
+    print("=== Testing the optional local copy ===")
+    service = FakeServiceClient()
+    local_path = Path(TEST_OUTPUT_DIR) / "kept.mp4"
+    result = await stream(service, "kept.mp4", local_path=local_path)
+
+    assert local_path.read_bytes() == VIDEO and result.file_size == len(VIDEO)
+    assert service.blobs["kept.mp4"].content == VIDEO
+    assert not local_path.with_name("kept.mp4.part").exists()
+
+    print("✅ Local copy matches the uploaded blob")
+    return True
+
+
+async def test_failed_download_commits_nothing():
+    """A failed download leaves no committed blob and no partial file"""
+    print("=== Testing a failed download ===")
+    service = FakeServiceClient()
+    local_path = Path(TEST_OUTPUT_DIR) / "broken.mp4"
+    try:
+        await stream(service, "broken.mp4", local_path=local_path, status="404 Not Found")
+        raise AssertionError("A 404 from Gemini must fail the stream")
+    except RuntimeError as e:
+        assert "404" in str(e), str(e)
+
+    assert not service.blobs["broken.mp4"].committed, "Nothing may be committed"
+    assert not local_path.exists() and not local_path.with_name("broken.mp4.part").exists()
+
+    print("✅ Failed stream left nothing behind")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Stream To Azure Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_streamed_blocks,
+        test_optional_local_copy,
+        test_failed_download_commits_nothing,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test the streaming video download: bounded chunks, Range resume and size checks
+Usage: python test_streaming_download.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_streaming_download_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_STREAMING_DOWNLOAD"] = "true"
+os.environ["VEO_DOWNLOAD_CHUNK_SIZE"] = "4096"
+os.environ["VEO_DOWNLOAD_MAX_RETRIES"] = "2"
+os.environ["VEO_SUBMIT_BACKOFF_MAX"] = "0.05"  # Also caps the reconnect delay
+
+import mcp_veo3_azure_blob as server
+
+VIDEO = bytes(index % 253 for index in range(50_000))
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+class VideoServer:
+    """Minimal HTTP/1.1 server that can cut connections partway through the body"""
+    def __init__(self, content: bytes, drops: list[int], advertised: int = None):
+        self.content = content
+        self.drops = list(drops)  # Bytes sent before closing, one entry per connection
+        self.advertised = advertised
+        self.requests: list[dict] = []
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/video.mp4"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        headers = {}
+        await reader.readline()
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        self.requests.append(headers)
+
+        total = self.advertised or len(self.content)
+        start = int(headers["range"][6:].rstrip("-")) if "range" in headers else 0
+        body = self.content[start:]
+        if start:
+            status = "206 Partial Content"
+            extra = f"Content-Range: bytes {start}-{total - 1}/{total}\r\n"
+        else:
+            status = "200 OK"
+            extra = ""
+        length = total - start
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: video/mp4\r\nContent-Length: {length}\r\n"
+            f"{extra}Connection: close\r\n\r\n".encode()
+        )
+        cut = self.drops.pop(0) if self.drops else None
+        writer.write(body[:cut] if cut is not None else body)
+        await writer.drain()
+        writer.close()
+
+
+async def test_chunks_and_range_resume():
+    """A dropped connection resumes with Range from the last byte received"""
+    print("=== Testing chunked download with Range resume ===")
+    video_server = VideoServer(VIDEO, drops=[20_000, 5_000])
+    uri = await video_server.start()
+    try:
+        chunks = [chunk async for chunk in server.stream_gemini_video(uri, "req-stream")]
+    finally:
+        await video_server.stop()
+
+    assert b"".join(chunks) == VIDEO, "Resumed download must reproduce the video exactly"
+    assert max(len(chunk) for chunk in chunks) <= 4096, "Chunks must respect the buffer size"
+    ranges = [headers.get("range") for headers in video_server.requests]
+    assert ranges == [None, "bytes=20000-", "bytes=25000-"], ranges
+    assert all(headers.get("x-goog-api-key") for headers in video_server.requests)
+
+    print(f"✅ {len(chunks)} chunks over {len(ranges)} connections")
+    return True
+
+
+async def test_download_into_output_dir():
+    """The finished file appears in OUTPUT_DIR only after a complete download"""
+    print("=== Testing download_generated_video ===")
+    video_server = VideoServer(VIDEO, drops=[30_000])
+    uri = await video_server.start()
+    original_client = server.gemini_client
+    # Any SDK call would mean the streaming path was skipped
+    server.gemini_client = SimpleNamespace(files=None)
+    try:
+        generated = SimpleNamespace(video=SimpleNamespace(uri=uri))
+        path = await server.download_generated_video(generated, "req-download", FakeContext())
+    finally:
+        server.gemini_client = original_client
+        await video_server.stop()
+
+    with open(path, "rb") as f:
+        assert f.read() == VIDEO, "Downloaded file should match the video"
+    leftovers = [name for name in os.listdir(TEST_OUTPUT_DIR) if name.endswith(".part")]
+    assert not leftovers, f"No partial files should remain: {leftovers}"
+
+    print(f"✅ Streamed into {os.path.basename(path)}")
+    return True
+
+
+async def test_size_mismatch_and_retry_budget():
+    """Short bodies and connections that never make progress are errors"""
+    print("=== Testing size check and retry budget ===")
+    # Advertises more than it has, so no reconnect gets past the real end
+    video_server = VideoServer(VIDEO[:1000], drops=[], advertised=2000)
+    uri = await video_server.start()
+    try:
+        async for _ in server.stream_gemini_video(uri, "req-short"):
+            pass
+        raise AssertionError("A body shorter than Content-Length must not pass")
+    except (RuntimeError, ConnectionError) as e:
+        assert "retries" in str(e) or "incomplete" in str(e), str(e)
+    finally:
+        await video_server.stop()
+    assert len(video_server.requests) <= 4, (
+        f"Reconnects without progress are limited: {len(video_server.requests)}"
+    )
+
+    print("✅ Incomplete downloads fail after the retry budget")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Streaming Download Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_chunks_and_range_resume,
+        test_download_into_output_dir,
+        test_size_mismatch_and_retry_budget,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test the adaptive (AIMD) submission limiter and 429 retries
+Usage: python test_submit_limiter.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_submit_limiter_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_SUBMIT_BACKOFF_BASE"] = "0.01"
+os.environ["VEO_SUBMIT_BACKOFF_MAX"] = "0.05"
+os.environ["VEO_SUBMIT_MAX_RETRIES"] = "3"
+
+import mcp_veo3_azure_blob as server
+
+
+class QuotaError(Exception):
+    """Shaped like a google-genai APIError for a 429"""
+    def __init__(self):
+        super().__init__("429 RESOURCE_EXHAUSTED")
+        self.code = 429
+
+
+class FlakyGeminiClient:
+    """Fake Gemini client whose generate_videos hits the quota a few times first"""
+    def __init__(self, throttled: int, error: type = QuotaError):
+        self.calls = 0
+        client = self
+
+        class Models:
+            def generate_videos(self, **kwargs):
+                client.calls += 1
+                if client.calls <= throttled:
+                    raise error()
+                return SimpleNamespace(name="operations/accepted")
+
+        self.models = Models()
+
+
+def test_aimd_limit():
+    """The limit creeps up on success and halves once per burst of 429s or spikes"""
+    print("=== Testing additive increase and multiplicative decrease ===")
+    limiter = server.AdaptiveConcurrencyLimiter(
+        min_limit=1, max_limit=8, initial_limit=4, spike_factor=3
+    )
+    for _ in range(4):
+        limiter.on_success(1.0)
+    grown = limiter.limit
+    assert 4.9 < grown < 5.0, f"Four successes at limit 4 add about one slot: {grown}"
+
+    limiter.on_throttle()
+    assert limiter.limit == grown / 2, f"A 429 halves the limit: {limiter.limit}"
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == grown / 2, "A burst of 429s only cuts the limit once"
+    assert limiter.stats()["throttled"] == 3 and limiter.stats()["limit"] == 2, limiter.stats()
+
+    limiter._last_decrease = 0.0
+    limiter.on_success(100.0)
+    assert limiter.limit == grown / 4, f"A latency spike cuts the limit: {limiter.limit}"
+
+    for _ in range(200):
+        limiter.on_success(1.0)
+    assert limiter.limit == 8, f"The limit never exceeds max_limit: {limiter.limit}"
+    for _ in range(10):
+        limiter._last_decrease = 0.0
+        limiter.on_throttle()
+    assert limiter.limit == 1, f"The limit never drops below min_limit: {limiter.limit}"
+
+    print("✅ Limit follows AIMD within its bounds")
+    return True
+
+
+async def test_acquire_caps_in_flight():
+    """No more than int(limit) submissions hold a slot at once"""
+    print("=== Testing the in-flight cap ===")
+    limiter = server.AdaptiveConcurrencyLimiter(
+        min_limit=1, max_limit=8, initial_limit=2, spike_factor=3
+    )
+    peak = 0
+
+    async def submit():
+        nonlocal peak
+        async with limiter.acquire():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.02)
+
+    await asyncio.gather(*(submit() for _ in range(6)))
+    assert peak == 2, f"Expected at most 2 in flight, saw {peak}"
+    assert limiter.in_flight == 0
+
+    print("✅ Concurrent submissions stay within the limit")
+    return True
+
+
+def test_retry_after_hints():
+    """Retry-After headers and RetryInfo details are honoured"""
+    print("=== Testing retry delay hints ===")
+    header_error = QuotaError()
+    header_error.response = SimpleNamespace(headers={"Retry-After": "7"})
+    assert server.get_retry_after(header_error) == 7.0
+
+    rpc_error = QuotaError()
+    rpc_error.details = {"error": {"details": [
+        {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "12s"}
+    ]}}
+    assert server.get_retry_after(rpc_error) == 12.0
+    assert server.get_retry_after(QuotaError()) is None
+
+    assert server.is_rate_limit_error(QuotaError())
+    assert server.is_rate_limit_error(Exception("RESOURCE_EXHAUSTED: quota"))
+    assert not server.is_rate_limit_error(ValueError("bad prompt"))
+
+    print("✅ Server retry hints are parsed")
+    return True
+
+
+async def test_submit_retries_429s():
+    """429s are retried with backoff and other errors are raised at once"""
+    print("=== Testing submit_with_backoff ===")
+    original_client = server.gemini_client
+    try:
+        server.gemini_client = FlakyGeminiClient(throttled=2)
+        throttled_before = server.submission_limiter.throttled
+        started = time.monotonic()
+        operation = await server.submit_with_backoff("req-1", model="m", prompt="p")
+        assert operation.name == "operations/accepted"
+        assert server.gemini_client.calls == 3, server.gemini_client.calls
+        assert server.submission_limiter.throttled == throttled_before + 2
+        assert time.monotonic() - started < 2, "Backoff should follow VEO_SUBMIT_BACKOFF_MAX"
+
+        server.gemini_client = FlakyGeminiClient(throttled=10)
+        try:
+            await server.submit_with_backoff("req-2", model="m", prompt="p")
+            raise AssertionError("Retries should stop after VEO_SUBMIT_MAX_RETRIES")
+        except QuotaError:
+            pass
+        assert server.gemini_client.calls == 4, server.gemini_client.calls
+
+        server.gemini_client = FlakyGeminiClient(throttled=1, error=RuntimeError)
+        try:
+            await server.submit_with_backoff("req-3", model="m", prompt="p")
+            raise AssertionError("Non-quota errors should not be retried")
+        except RuntimeError:
+            pass
+        assert server.gemini_client.calls == 1, server.gemini_client.calls
+    finally:
+        server.gemini_client = original_client
+
+    print("✅ Quota errors are retried and other errors surface immediately")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Submission Limiter Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_aimd_limit,
+        test_acquire_caps_in_flight,
+        test_retry_after_hints,
+        test_submit_retries_429s,
+    ):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
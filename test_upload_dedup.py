@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test content-addressed upload deduplication against a fake Azure container
+Usage: python test_upload_dedup.py
+"""
+
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_dedup_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = "UseDevelopmentStorage=true"
+os.environ["AZURE_INVENTORY_ENABLED"] = "true"
+os.environ["AZURE_UPLOAD_DEDUP_TAGS"] = "true"
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+
+import mcp_veo3_azure_blob as server
+from azure.core.exceptions import ResourceNotFoundError
+
+
+class FakeBlobClient:
+    def __init__(self, container: "FakeContainerClient", name: str):
+        self.container = container
+        self.name = name
+        self.url = (
+            f"https://devstoreaccount1.blob.core.windows.net/{server.AZURE_CONTAINER_NAME}/{name}"
+        )
+
+    def _written(self, blob: dict) -> dict:
+        blob["etag"] = f"0x{len(self.container.blobs) + 1}"
+        blob["last_modified"] = datetime.now(timezone.utc)
+        self.container.blobs[self.name] = blob
+        if blob["tags"]:
+            self.container.tag_index[self.name] = blob["tags"]["content_sha256"]
+        return {"etag": blob["etag"], "last_modified": blob["last_modified"]}
+
+    async def upload_blob(
+        self, data, overwrite=False, content_settings=None, metadata=None, tags=None, **kwargs
+    ):
+        self.container.uploads.append(self.name)
+        return self._written({
+            "data": bytes(data), "metadata": dict(metadata or {}), "tags": tags,
+            "content_md5": content_settings.content_md5 if content_settings else None
+        })
+
+    async def get_blob_properties(self):
+        self.container.heads.append(self.name)
+        blob = self.container.blobs.get(self.name)
+        if blob is None:
+            raise ResourceNotFoundError(message="The specified blob does not exist.")
+        return SimpleNamespace(
+            name=self.name,
+            size=len(blob["data"]),
+            metadata=dict(blob["metadata"]),
+            content_settings=SimpleNamespace(content_md5=blob["content_md5"]),
+            etag=blob["etag"],
+            last_modified=blob["last_modified"]
+        )
+
+    async def start_copy_from_url(self, source_url, tags=None):
+        source = self.container.blobs[source_url.rsplit("/", 1)[-1]]
+        self.container.copies.append(self.name)
+        properties = self._written({**source, "metadata": dict(source["metadata"]), "tags": tags})
+        return {"copy_status": "success", "copy_id": "copy-1", **properties}
+
+
+class FakeContainerClient:
+    """Fake async container client; tag_index, like Azure's, can lag behind the blobs"""
+    def __init__(self):
+        self.blobs: dict[str, dict] = {}
+        self.tag_index: dict[str, str] = {}
+        self.uploads: list[str] = []
+        self.copies: list[str] = []
+        self.heads: list[str] = []
+        self.tag_queries = 0
+
+    def get_blob_client(self, name):
+        return FakeBlobClient(self, name)
+
+    async def find_blobs_by_tags(self, filter_expression):
+        self.tag_queries += 1
+        sha = re.search(r"'([0-9a-f]+)'", filter_expression).group(1)
+        for name, tagged in list(self.tag_index.items()):
+            if tagged == sha:
+                yield SimpleNamespace(name=name)
+
+
+class FakeServiceClient:
+    account_name = "devstoreaccount1"
+
+    def __init__(self):
+        self.container = FakeContainerClient()
+
+    def get_container_client(self, container):
+        return self.container
+
+    def get_blob_client(self, container, blob):
+        return self.container.get_blob_client(blob)
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+def write_video(name: str, content: bytes) -> str:
+    path = os.path.join(TEST_OUTPUT_DIR, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+async def upload(path: str, blob_name: str, dedup: str) -> server.AzureBlobUploadResponse:
+    result = await server.upload_to_azure_blob(
+        path, blob_name, FakeContext(), lane="bulk", dedup=dedup
+    )
+    assert result.success, f"Upload of {blob_name} failed: {result.error_message}"
+    return result
+
+
+async def test_dedup_with_tags(service: FakeServiceClient):
+    """Hits are served without sending data; misses and stale index entries upload"""
+    print("=== Testing dedup through blob index tags ===")
+    container = service.container
+    path = write_video("first.mp4", b"video-bytes" * 100)
+
+    miss = await upload(path, "a.mp4", "reuse")
+    assert container.uploads == ["a.mp4"] and miss.deduplicated_from is None, (
+        "New content must be uploaded"
+    )
+    assert container.tag_index["a.mp4"] == miss.content_sha256, (
+        "Uploads should carry the content_sha256 tag"
+    )
+
+    same_name = await upload(path, "a.mp4", "reuse")
+    assert container.uploads == ["a.mp4"], "Same bytes under the same name must not be sent again"
+    assert (
+        same_name.deduplicated_from == "a.mp4" and same_name.content_sha256 == miss.content_sha256
+    )
+
+    reused = await upload(path, "b.mp4", "reuse")
+    assert "b.mp4" not in container.blobs, "Reuse mode should not create the new name"
+    assert reused.blob_url.endswith("/a.mp4") and reused.deduplicated_from == "a.mp4", (
+        f"Reuse: {reused}"
+    )
+
+    copied = await upload(path, "c.mp4", "copy")
+    assert container.copies == ["c.mp4"] and container.uploads == ["a.mp4"], (
+        "Copy mode should copy server-side"
+    )
+    assert copied.blob_url.endswith("/c.mp4") and copied.deduplicated_from == "a.mp4", (
+        f"Copy: {copied}"
+    )
+
+    other = await upload(write_video("other.mp4", b"different" * 100), "a.mp4", "reuse")
+    assert other.deduplicated_from is None, (
+        "Different bytes under an existing name must be uploaded"
+    )
+
+    # The tag index still lists a.mp4 and c.mp4; a.mp4 now holds other bytes and c.mp4 is gone
+    del container.blobs["c.mp4"]
+    container.tag_index["a.mp4"] = miss.content_sha256
+    heads_before = len(container.heads)
+    stale = await upload(path, "d.mp4", "reuse")
+    assert stale.deduplicated_from is None and container.uploads[-1] == "d.mp4", (
+        "Stale candidates must not be trusted"
+    )
+    assert container.heads[heads_before:] == ["d.mp4", "a.mp4", "c.mp4"], \
+        f"Every candidate should be confirmed with HEAD: {container.heads[heads_before:]}"
+
+    uploads = len(container.uploads)
+    await upload(path, "e.mp4", "off")
+    assert len(container.uploads) == uploads + 1, "Dedup off always uploads"
+
+    print(
+        "✅ Tag lookups confirmed by HEAD: hits reused or copied, misses and stale entries uploaded"
+    )
+    return True
+
+
+async def test_dedup_with_inventory(service: FakeServiceClient):
+    """With a synced inventory, candidates come from the index instead of tags"""
+    print("=== Testing dedup through the blob inventory ===")
+    container = service.container
+    server.blob_inventory.db.execute(
+        "INSERT OR REPLACE INTO blob_inventory_state (container, synced_at) VALUES (?, ?)",
+        (server.AZURE_CONTAINER_NAME, 1.0)
+    )
+    assert server.blob_inventory.ready, "Inventory should count as synced"
+
+    path = write_video("third.mp4", b"third-video" * 100)
+    await upload(path, "f.mp4", "reuse")
+    queries = container.tag_queries
+
+    result = await upload(path, "g.mp4", "reuse")
+    assert result.deduplicated_from == "f.mp4", f"Inventory should find f.mp4: {result}"
+    assert container.tag_queries == queries, (
+        "Tags should not be queried when the inventory is ready"
+    )
+
+    print("✅ Inventory lookup found the duplicate without a tag query")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Upload Dedup Test Suite")
+    print("=" * 50)
+
+    service = FakeServiceClient()
+    original_client = server._azure_blob_client
+    server._azure_blob_client = service
+    server._azure_container_ready = True
+
+    passed = True
+    try:
+        for test in (test_dedup_with_tags, test_dedup_with_inventory):
+            try:
+                passed = await test(service) and passed
+            except Exception as e:
+                print(f"❌ Test failed: {str(e)}")
+                passed = False
+    finally:
+        server._azure_blob_client = original_client
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Test the durable background upload queue: retries, dead letters and replay
+Usage: python test_upload_queue.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_upload_queue_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=queued;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_UPLOAD_ASYNC"] = "true"
+os.environ["AZURE_UPLOAD_WORKERS"] = "2"
+os.environ["AZURE_UPLOAD_MAX_ATTEMPTS"] = "3"
+os.environ["AZURE_UPLOAD_RETRY_BASE"] = "0.02"
+os.environ["AZURE_UPLOAD_RETRY_MAX"] = "0.05"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+class FakeUploader:
+    """Stands in for upload_to_azure_blob, failing a set number of times per blob"""
+    def __init__(self, failures: dict, crashes: int = 0):
+        self.failures = dict(failures)
+        self.crashes = crashes
+        self.calls: list[str] = []
+
+    async def __call__(self, file_path, blob_name, ctx, *args, **kwargs):
+        self.calls.append(blob_name)
+        await asyncio.sleep(0.01)
+        if self.crashes:
+            self.crashes -= 1
+            raise RuntimeError("connection reset by peer")
+        if self.failures.get(blob_name, 0):
+            self.failures[blob_name] -= 1
+            return server.AzureBlobUploadResponse(
+                success=False, upload_time=0.0, file_size=0, error_message="503 Server Busy"
+            )
+        return server.AzureBlobUploadResponse(
+            success=True,
+            blob_url=server.azure_blob_url(blob_name),
+            upload_time=0.0,
+            file_size=os.path.getsize(file_path)
+        )
+
+
+def video(name: str) -> str:
+    path = os.path.join(TEST_OUTPUT_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"queued video " + name.encode())
+    return path
+
+
+async def wait_for(upload_id: str, status: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = next(e for e in server.upload_queue.list() if e["upload_id"] == upload_id)
+        if entry["status"] == status:
+            return entry
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"{upload_id} never reached {status}: {entry}")
+
+
+async def test_retry_then_dead_letter():
+    """Failed uploads back off and retry, then go to the dead-letter list"""
+    print("=== Testing retries and dead letters ===")
+    uploader = FakeUploader({"flaky.mp4": 2, "broken.mp4": 99})
+    original = server.upload_to_azure_blob
+    server.upload_to_azure_blob = uploader
+    try:
+        flaky = await server.upload_queue.enqueue(video("flaky.mp4"), "flaky.mp4", "req-flaky")
+        broken = await server.upload_queue.enqueue(video("broken.mp4"), "broken.mp4", "req-broken")
+        missing = await server.upload_queue.enqueue(
+            os.path.join(TEST_OUTPUT_DIR, "gone.mp4"), "gone.mp4", "req-gone"
+        )
+        assert flaky["status"] == "pending", flaky
+        assert flaky["blob_url"] == server.azure_blob_url("flaky.mp4"), flaky
+
+        done = await wait_for(flaky["upload_id"], "succeeded")
+        assert done["attempts"] == 3 and done["last_error"] is None, done
+        dead = await wait_for(broken["upload_id"], "dead")
+        assert dead["attempts"] == 3 and "503" in dead["last_error"], dead
+        gone = await wait_for(missing["upload_id"], "dead")
+        assert "not found" in gone["last_error"], gone
+        assert "gone.mp4" not in uploader.calls, "A missing file is not worth retrying"
+        assert uploader.calls.count("broken.mp4") == 3, uploader.calls
+    finally:
+        server.upload_to_azure_blob = original
+
+    print("✅ Retried twice before success, dead-lettered after three attempts")
+    return True
+
+
+async def test_tools_list_and_replay():
+    """list_upload_queue filters by status and retry_failed_uploads requeues dead uploads"""
+    print("=== Testing list_upload_queue and retry_failed_uploads ===")
+    list_tool = getattr(server.list_upload_queue, "fn", server.list_upload_queue)
+    retry_tool = getattr(server.retry_failed_uploads, "fn", server.retry_failed_uploads)
+
+    listing = await list_tool(FakeContext(), status="dead")
+    assert listing.total_count == 2, listing
+    broken = next(entry for entry in listing.uploads if entry["blob_name"] == "broken.mp4")
+
+    try:
+        await list_tool(FakeContext(), status="lost")
+        raise AssertionError("An unknown status must be rejected")
+    except ValueError:
+        pass
+
+    uploader = FakeUploader({})
+    original = server.upload_to_azure_blob
+    server.upload_to_azure_blob = uploader
+    try:
+        result = await retry_tool(FakeContext(), upload_id=broken["upload_id"])
+        assert result["requeued"] == 1, result
+        replayed = await wait_for(broken["upload_id"], "succeeded")
+        assert replayed["attempts"] == 1, "Replay starts the attempt count over"
+    finally:
+        server.upload_to_azure_blob = original
+
+    stats = server.upload_queue.stats()
+    assert stats["succeeded"] == 2 and stats["dead"] == 1, stats
+
+    print("✅ Dead uploads listed, replayed and uploaded")
+    return True
+
+
+async def test_writes_off_the_event_loop():
+    """Queue and generation writes run in worker threads, not on the event loop"""
+    print("=== Testing queue writes stay off the event loop ===")
+    server.generation_store.create(request_id="req-threads", model="m", prompt="p")
+    loop_thread = threading.current_thread()
+    writes: list[tuple[str, threading.Thread]] = []
+    original_execute = server.state_db.execute
+
+    def execute(sql, params=()):
+        if not sql.lstrip().startswith("SELECT"):
+            writes.append((sql.split()[0] + " " + sql.split()[1], threading.current_thread()))
+        return original_execute(sql, params)
+
+    uploader = FakeUploader({"threads.mp4": 1})
+    original = server.upload_to_azure_blob
+    server.upload_to_azure_blob = uploader
+    server.state_db.execute = execute
+    try:
+        entry = await server.upload_queue.enqueue(
+            video("threads.mp4"), "threads.mp4", "req-threads"
+        )
+        await wait_for(entry["upload_id"], "succeeded")
+    finally:
+        del server.state_db.execute
+        server.upload_to_azure_blob = original
+
+    assert original_execute(
+        "SELECT stage FROM generations WHERE request_id = ?", ("req-threads",)
+    )[0]["stage"] == "uploaded"
+    kinds = {kind for kind, _ in writes}
+    assert {"INSERT INTO", "UPDATE upload_queue", "UPDATE generations"} <= kinds, kinds
+    on_loop = [kind for kind, thread in writes if thread is loop_thread]
+    assert not on_loop, f"Written on the event loop: {on_loop}"
+
+    print(f"✅ {len(writes)} writes ran in worker threads")
+    return True
+
+
+async def test_workers_survive_exceptions():
+    """An exception from one upload is retried and leaves the workers running"""
+    print("=== Testing worker survival ===")
+    uploader = FakeUploader({}, crashes=2)
+    original = server.upload_to_azure_blob
+    server.upload_to_azure_blob = uploader
+    try:
+        entries = [
+            await server.upload_queue.enqueue(video(f"crash-{index}.mp4"), f"crash-{index}.mp4")
+            for index in range(3)
+        ]
+        for entry in entries:
+            await wait_for(entry["upload_id"], "succeeded")
+        assert server.upload_queue.stats()["workers"] == 2, server.upload_queue.stats()
+        assert len(uploader.calls) == 5, uploader.calls
+    finally:
+        server.upload_to_azure_blob = original
+        await server.upload_queue.stop()
+
+    print("✅ Crashed uploads retried, both workers still running")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Upload Queue Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_retry_then_dead_letter,
+        test_tools_list_and_replay,
+        test_writes_off_the_event_loop,
+        test_workers_survive_exceptions,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    await server.upload_queue.stop()
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
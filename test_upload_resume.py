@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Test that interrupted block uploads resume from their checkpoints
+Usage: python test_upload_resume.py
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_upload_resume_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+
+import mcp_veo3_azure_blob as server
+
+BLOCK_SIZE = 1024
+BLOCK_COUNT = 8
+
+
+class FakeBlobClient:
+    """Fake async blob client holding staged blocks the way Azure does until commit"""
+    def __init__(self, fail_at: int = -1):
+        self.fail_at = fail_at
+        self.uncommitted: dict[str, bytes] = {}
+        self.staged: list[str] = []
+        self.committed: list[str] = []
+        self.content = b""
+
+    async def stage_block(self, block_id, data, length=None, **kwargs):
+        if len(self.staged) == self.fail_at:
+            raise ConnectionError("connection reset while staging")
+        self.staged.append(block_id)
+        self.uncommitted[block_id] = bytes(data)
+
+    async def get_block_list(self, block_list_type="committed"):
+        blocks = [
+            SimpleNamespace(id=block_id, size=len(data))
+            for block_id, data in self.uncommitted.items()
+        ]
+        return [], blocks
+
+    async def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+        self.content = b"".join(self.uncommitted[block_id] for block_id in self.committed)
+        self.uncommitted = {}
+        return {"etag": "0x1", "last_modified": None}
+
+
+def write_test_file() -> str:
+    path = os.path.join(TEST_OUTPUT_DIR, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(bytes(index % 251 for index in range(BLOCK_SIZE * BLOCK_COUNT - 100)))
+    return path
+
+
+async def upload(blob_client: FakeBlobClient, path: str, block_size: int = BLOCK_SIZE) -> dict:
+    return await server.upload_file_in_blocks(
+        blob_client, "resume.mp4", path, os.path.getsize(path), block_size, concurrency=1
+    )
+
+
+async def test_resume_skips_staged_blocks():
+    """A retry stages only the blocks Azure does not already hold"""
+    print("=== Testing resume of an interrupted block upload ===")
+    path = write_test_file()
+    blob_client = FakeBlobClient(fail_at=5)
+
+    try:
+        await upload(blob_client, path)
+        raise AssertionError("First attempt should fail while staging block 5")
+    except ConnectionError:
+        pass
+
+    file_key = server.UploadCheckpointStore.file_key(path, os.path.getsize(path))
+    checkpoint = server.upload_checkpoints.pending(
+        server.AZURE_CONTAINER_NAME, "resume.mp4", file_key
+    )
+    assert checkpoint and sorted(checkpoint["blocks"]) == [0, 1, 2, 3, 4], (
+        f"Unexpected checkpoint: {checkpoint}"
+    )
+
+    first_attempt = list(blob_client.staged)
+    blob_client.fail_at = -1
+    # A different block size on retry must not matter: the checkpointed one is reused
+    result = await upload(blob_client, path, block_size=BLOCK_SIZE * 2)
+
+    assert result["blocks"] == BLOCK_COUNT, f"Expected {BLOCK_COUNT} blocks, got {result['blocks']}"
+    assert result["resumed_blocks"] == 5, (
+        f"Expected 5 resumed blocks, got {result['resumed_blocks']}"
+    )
+    assert blob_client.staged[len(first_attempt):] == [
+        server.azure_block_id(index, checkpoint["upload_key"]) for index in range(5, BLOCK_COUNT)
+    ], "Only the blocks after the failure should be staged again"
+    with open(path, "rb") as f:
+        content = f.read()
+    assert blob_client.content == content, "Committed blob should match the file"
+    assert result["hasher"].content_sha256 == hashlib.sha256(content).hexdigest(), (
+        "Whole-file hash must cover resumed blocks"
+    )
+    assert not server.upload_checkpoints.pending(
+        server.AZURE_CONTAINER_NAME, "resume.mp4", file_key
+    ), "Checkpoints should be cleared after the commit"
+
+    print("✅ Retry staged only the missing blocks and committed the whole file")
+    return True
+
+
+async def test_resume_restages_lost_blocks():
+    """Blocks Azure no longer holds, or holds with the wrong size, are sent again"""
+    print("=== Testing resume when Azure dropped staged blocks ===")
+    path = write_test_file()
+    os.utime(path, ns=(0, 0))  # New file identity, so earlier checkpoints do not apply
+    blob_client = FakeBlobClient(fail_at=4)
+
+    try:
+        await upload(blob_client, path)
+        raise AssertionError("First attempt should fail while staging block 4")
+    except ConnectionError:
+        pass
+
+    lost, truncated = blob_client.staged[1], blob_client.staged[2]
+    del blob_client.uncommitted[lost]
+    blob_client.uncommitted[truncated] = blob_client.uncommitted[truncated][:10]
+    blob_client.fail_at = -1
+    staged_before = len(blob_client.staged)
+    result = await upload(blob_client, path)
+
+    restaged = blob_client.staged[staged_before:]
+    assert result["resumed_blocks"] == 2, (
+        f"Expected 2 resumed blocks, got {result['resumed_blocks']}"
+    )
+    assert lost in restaged and truncated in restaged, (
+        "Lost and truncated blocks should be staged again"
+    )
+    with open(path, "rb") as f:
+        assert blob_client.content == f.read(), "Committed blob should match the file"
+
+    print("✅ Missing and truncated blocks were staged again")
+    return True
+
+
+async def test_checkpoints_written_off_the_event_loop():
+    """Checkpoint reads and writes run in worker threads, not on the event loop"""
+    print("=== Testing checkpoint writes stay off the event loop ===")
+    path = write_test_file()
+    os.utime(path, ns=(1, 1))
+    store = server.upload_checkpoints
+    loop_thread = threading.current_thread()
+    threads: list[tuple[str, threading.Thread]] = []
+    originals = (store.pending, store.record, store.clear)
+
+    def spy(name, method):
+        def call(*args, **kwargs):
+            threads.append((name, threading.current_thread()))
+            return method(*args, **kwargs)
+        return call
+
+    store.pending, store.record, store.clear = (
+        spy(name, method) for name, method in zip(("pending", "record", "clear"), originals)
+    )
+    try:
+        result = await upload(FakeBlobClient(), path)
+    finally:
+        store.pending, store.record, store.clear = originals
+
+    names = [name for name, _ in threads]
+    assert names == ["pending"] + ["record"] * result["blocks"] + ["clear"], names
+    assert all(thread is not loop_thread for _, thread in threads), "SQLite ran on the loop"
+
+    print(f"✅ {len(threads)} checkpoint calls ran in worker threads")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Upload Resume Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (
+        test_resume_skips_staged_blocks,
+        test_resume_restages_lost_blocks,
+        test_checkpoints_written_off_the_event_loop,
+    ):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the upload bandwidth shaper: shared and per-lane rates, interactive priority
+Usage: python test_upload_shaper.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_shaper_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+
+import mcp_veo3_azure_blob as server
+
+KB = 1000
+
+
+async def send(
+    shaper: server.UploadBandwidthShaper, lane: str, blocks: int, block_size: int
+) -> float:
+    """Push `blocks` blocks through the shaper concurrently; returns the seconds it took"""
+    started = time.monotonic()
+    await asyncio.gather(*(shaper.acquire(block_size, lane) for _ in range(blocks)))
+    return time.monotonic() - started
+
+
+async def test_disabled_shaper():
+    """Without any rate the shaper never waits but still counts bytes"""
+    print("=== Testing shaper without limits ===")
+    shaper = server.UploadBandwidthShaper(max_rate=0, lane_rates={}, bulk_min_share=0.1)
+    assert not shaper.enabled, "Shaper without rates should be disabled"
+    waited = await shaper.acquire(10 * 1024 * 1024, "bulk")
+    assert waited == 0.0, f"Disabled shaper should not wait, waited {waited}"
+    assert shaper.sent["bulk"] == 10 * 1024 * 1024, "Bytes should still be counted"
+
+    try:
+        await shaper.acquire(1, "nope")
+        raise AssertionError("Unknown lane should be rejected")
+    except ValueError:
+        pass
+
+    print("✅ Unlimited shaper passes bytes straight through")
+    return True
+
+
+async def test_shared_rate():
+    """The shared rate holds the total across lanes, after one second of burst"""
+    print("=== Testing shared rate limit ===")
+    shaper = server.UploadBandwidthShaper(max_rate=200 * KB, lane_rates={}, bulk_min_share=1.0)
+    # 200 KB burst, then 200 KB more at 200 KB/s
+    elapsed = await send(shaper, "interactive", 2, 100 * KB) + await send(
+        shaper, "bulk", 2, 100 * KB
+    )
+    assert 0.8 <= elapsed <= 2.0, f"Expected about 1s for 400 KB at 200 KB/s, took {elapsed:.2f}s"
+
+    # A block larger than the bucket still passes once the bucket is full
+    elapsed = await send(shaper, "bulk", 1, 500 * KB)
+    assert elapsed <= 2.0, (
+        f"Oversized block should pass within a second of refill, took {elapsed:.2f}s"
+    )
+
+    print(f"✅ Shared rate enforced ({shaper.stats()['lanes']['bulk']['sent_mb']} MB sent in bulk)")
+    return True
+
+
+async def test_lane_rate():
+    """A lane cap slows only that lane"""
+    print("=== Testing per-lane rate limit ===")
+    shaper = server.UploadBandwidthShaper(
+        max_rate=0, lane_rates={"interactive": 100 * KB}, bulk_min_share=0.1
+    )
+    capped, uncapped = await asyncio.gather(
+        send(shaper, "interactive", 5, 50 * KB),
+        send(shaper, "bulk", 5, 50 * KB)
+    )
+    assert capped >= 1.2, f"Interactive lane should be held to 100 KB/s, took {capped:.2f}s"
+    assert uncapped < 0.5, f"Bulk lane has no cap and should not wait, took {uncapped:.2f}s"
+
+    print("✅ Lane cap applied to its own lane only")
+    return True
+
+
+async def test_interactive_priority():
+    """Bulk uploads hold back while interactive ones wait for bandwidth"""
+    print("=== Testing interactive priority over bulk ===")
+    shaper = server.UploadBandwidthShaper(max_rate=200 * KB, lane_rates={}, bulk_min_share=0.0)
+    await shaper.acquire(200 * KB, "bulk")  # Drain the burst so both lanes have to wait
+
+    granted: dict[str, list[float]] = {"interactive": [], "bulk": []}
+
+    async def block(lane: str, delay: float = 0.0) -> None:
+        await asyncio.sleep(delay)
+        await shaper.acquire(50 * KB, lane)
+        granted[lane].append(time.monotonic())
+
+    # Bulk queues first, yet gets nothing while any interactive block is still waiting
+    await asyncio.gather(
+        *(block("bulk") for _ in range(4)), *(block("interactive", 0.1) for _ in range(6))
+    )
+    assert max(granted["interactive"]) < min(granted["bulk"]), (
+        "Bulk blocks should wait for every interactive block"
+    )
+    assert shaper.waiting == {"interactive": 0, "bulk": 0}, (
+        f"Nothing should be left waiting: {shaper.waiting}"
+    )
+
+    print("✅ Interactive uploads were served first")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Upload Shaper Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_disabled_shaper, test_shared_rate, test_lane_rate, test_interactive_priority):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Test parallel block uploads and the per-account block size / concurrency tuner
+Usage: python test_upload_tuning.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_upload_tuning_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["AZURE_STORAGE_CONNECTION_STRING"] = (
+    "DefaultEndpointsProtocol=https;AccountName=tuning;AccountKey=dGVzdA==;"
+    "EndpointSuffix=core.windows.net"
+)
+os.environ["AZURE_UPLOAD_BLOCK_SIZE"] = str(64 * 1024)
+os.environ["AZURE_UPLOAD_CONCURRENCY"] = "4"
+os.environ["AZURE_UPLOAD_MAX_RATE"] = "0"
+os.environ["AZURE_UPLOAD_DEDUP"] = "off"
+os.environ["AZURE_CATALOG_MANIFEST"] = "false"
+
+import mcp_veo3_azure_blob as server
+
+MB = 1024 * 1024
+
+
+class Done:
+    """Finished result, as returned by the sync SDK in a worker thread"""
+    def __init__(self, value=None):
+        self.value = value
+
+    def __await__(self):
+        return self.value
+        yield
+
+
+def respond(value=None, delay: float = 0.0):
+    """Answer like the sync SDK from a worker thread, or like the aio SDK on the event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        time.sleep(delay)
+        return Done(value)
+
+    async def later():
+        await asyncio.sleep(delay)
+        return value
+    return later()
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.blocks: dict[str, bytes] = {}
+        self.committed: list[str] = []
+        self.single_upload: bytes = b""
+        self.staging = 0
+        self.peak_staging = 0
+        self.lock = threading.Lock()
+
+    def stage_block(self, block_id, data, *args, **kwargs):
+        data = bytes(data)
+        with self.lock:
+            self.staging += 1
+            self.peak_staging = max(self.peak_staging, self.staging)
+
+        def done():
+            with self.lock:
+                self.staging -= 1
+            self.blocks[block_id] = data
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            time.sleep(0.02)
+            done()
+            return Done()
+
+        async def stage():
+            await asyncio.sleep(0.02)
+            done()
+        return stage()
+
+    def get_block_list(self, *args, **kwargs):
+        return respond(([], []))
+
+    def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+        return respond({"etag": "0x1", "last_modified": None})
+
+    def upload_blob(self, data, *args, **kwargs):
+        self.single_upload = bytes(data) if not hasattr(data, "read") else data.read()
+        return respond({"etag": "0x2", "last_modified": None})
+
+    @property
+    def content(self) -> bytes:
+        return b"".join(self.blocks[block_id] for block_id in self.committed)
+
+
+class FakeServiceClient:
+    account_name = "tuning"
+
+    def __init__(self):
+        self.blobs: dict[str, FakeBlobClient] = {}
+        self.container = SimpleNamespace(create_container=lambda: respond())
+
+    def get_container_client(self, container):
+        return self.container
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(blob, FakeBlobClient())
+
+
+class FakeContext:
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+
+def test_tuner_prefers_fastest():
+    """The tuner starts from the default and then follows the fastest measured settings"""
+    print("=== Testing the upload tuner ===")
+    tuner = server.UploadTuner(server.state_db, block_size=0, concurrency=0, explore_rate=0)
+    assert tuner.choose("acct-a") == server.UploadTuner.DEFAULT
+
+    tuner.record("acct-a", 8 * MB, 4, 100 * MB, 10.0)
+    tuner.record("acct-a", 16 * MB, 8, 100 * MB, 5.0)
+    tuner.record("acct-b", 4 * MB, 2, 100 * MB, 1.0)
+    assert tuner.choose("acct-a") == (16 * MB, 8), tuner.choose("acct-a")
+    assert tuner.choose("acct-b") == (4 * MB, 2), "Settings are kept per account"
+
+    # A slower sample pulls the running average down instead of replacing it
+    tuner.record("acct-a", 16 * MB, 8, 100 * MB, 100.0)
+    best = tuner.best("acct-a")
+    assert best["samples"] == 2 and best["block_size"] == 16 * MB, best
+    expected = 0.7 * 20 * MB + 0.3 * 1 * MB
+    assert abs(best["throughput"] - expected) < 1, best
+
+    explorer = server.UploadTuner(server.state_db, block_size=0, concurrency=0, explore_rate=1)
+    neighbours = {(8 * MB, 8), (32 * MB, 8), (16 * MB, 4), (16 * MB, 16)}
+    for _ in range(20):
+        assert explorer.choose("acct-a") in neighbours, explorer.choose("acct-a")
+
+    pinned = server.UploadTuner(server.state_db, block_size=4 * MB, concurrency=0, explore_rate=1)
+    for _ in range(20):
+        block_size, concurrency = pinned.choose("acct-a")
+        assert block_size == 4 * MB, "A pinned block size is never explored"
+
+    print("✅ Fastest settings win per account, exploration stays next to them")
+    return True
+
+
+async def test_parallel_block_upload():
+    """Large files are staged as parallel blocks, small ones in a single request"""
+    print("=== Testing parallel block upload ===")
+    service = FakeServiceClient()
+    original = server.get_azure_blob_client
+    server.get_azure_blob_client = lambda: service
+    large = os.path.join(TEST_OUTPUT_DIR, "large.mp4")
+    small = os.path.join(TEST_OUTPUT_DIR, "small.mp4")
+    content = bytes(index % 249 for index in range(10 * 64 * 1024 + 123))
+    with open(large, "wb") as f:
+        f.write(content)
+    with open(small, "wb") as f:
+        f.write(b"tiny video")
+    try:
+        result = await server.upload_to_azure_blob(large, "large.mp4", FakeContext())
+        small_result = await server.upload_to_azure_blob(small, "small.mp4", FakeContext())
+    finally:
+        server.get_azure_blob_client = original
+
+    assert result.success, result.error_message
+    blob = service.blobs["large.mp4"]
+    assert blob.content == content, "Committed blocks must reassemble the file"
+    assert len(blob.committed) == 11, f"Expected 11 blocks of 64 KiB, got {len(blob.committed)}"
+    assert 2 <= blob.peak_staging <= 4, f"Up to 4 blocks should stage at once: {blob.peak_staging}"
+    assert result.blob_url.endswith(f"/{server.AZURE_CONTAINER_NAME}/large.mp4"), result.blob_url
+
+    assert small_result.success and service.blobs["small.mp4"].single_upload == b"tiny video"
+    assert not service.blobs["small.mp4"].committed, "A one-block file needs no block list"
+
+    best = server.upload_tuner.stats()["best_by_account"].get("tuning")
+    assert best and best["block_size"] == 64 * 1024 and best["concurrency"] == 4, best
+
+    print(f"✅ {len(blob.committed)} blocks, {blob.peak_staging} staging at once")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Upload Tuning Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_tuner_prefers_fastest, test_parallel_block_upload):
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            passed = result and passed
+        except Exception as e:
+            print(f"❌ Test failed: {type(e).__name__}: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test generate_videos_batch: bounded fan-out, streamed results and per-item failures
+Usage: python test_video_batch.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_video_batch_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_BATCH_MAX_ITEMS"] = "20"
+os.environ["VEO_BATCH_MAX_CONCURRENCY"] = "3"
+
+import mcp_veo3_azure_blob as server
+
+
+class RecordingContext:
+    def __init__(self):
+        self.infos: list[str] = []
+        self.progress: list[float] = []
+
+    async def info(self, message):
+        self.infos.append(message)
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, **kwargs):
+        self.progress.append(progress)
+
+
+class FakeGeneration:
+    """Stands in for generate_video_with_progress and tracks how many items run at once"""
+    def __init__(self, ctx: RecordingContext):
+        self.ctx = ctx
+        self.running = 0
+        self.peak = 0
+        self.calls: list[dict] = []
+        self.streamed_before_last: int = -1
+
+    async def __call__(self, prompt, model, ctx, **kwargs):
+        self.calls.append({"prompt": prompt, **kwargs})
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            # Later items take longer, so results arrive in input order
+            await asyncio.sleep(0.02 * int(prompt.split()[-1]))
+            if prompt.startswith("fail"):
+                raise RuntimeError("quota exceeded for this item")
+            if prompt.endswith(" 7"):
+                self.streamed_before_last = sum(
+                    1 for message in self.ctx.infos if message.startswith("{")
+                )
+            return {"azure_blob_url": f"https://blob/{prompt}.mp4", "video_path": f"/v/{prompt}"}
+        finally:
+            self.running -= 1
+
+
+def batch_tool():
+    return getattr(server.generate_videos_batch, "fn", server.generate_videos_batch)
+
+
+async def test_batch_streams_results():
+    """Items run with bounded concurrency and each result is reported when it finishes"""
+    print("=== Testing batch fan-out and streamed results ===")
+    ctx = RecordingContext()
+    generation = FakeGeneration(ctx)
+    original = server.generate_video_with_progress
+    server.generate_video_with_progress = generation
+    items = [{"prompt": f"scene {i}"} for i in range(1, 8)]
+    items[2] = {"prompt": "fail scene 3"}
+    items.append({"prompt": "   "})
+    items.append({"prompt": "scene 9", "model": "veo-9"})
+    try:
+        response = await batch_tool()(items, ctx, concurrency=10)
+    finally:
+        server.generate_video_with_progress = original
+
+    assert generation.peak == 3, f"Concurrency should be capped at 3, saw {generation.peak}"
+    assert all(call.get("priority") == "batch" for call in generation.calls), generation.calls
+    assert response.total_count == 9 and response.succeeded_count == 6, response
+    assert response.failed_count == 3, response
+    assert [outcome["index"] for outcome in response.results] == list(range(9))
+
+    failed = {outcome["index"]: outcome["error"] for outcome in response.results
+              if outcome["status"] == "failed"}
+    assert "quota exceeded" in failed[2], failed
+    assert "Prompt cannot be empty" in failed[7], failed
+    assert "Invalid model" in failed[8], failed
+    assert response.results[0]["azure_video_url"] == "https://blob/scene 1.mp4", response.results[0]
+
+    streamed = [json.loads(message) for message in ctx.infos if message.startswith("{")]
+    assert len(streamed) == 9, f"Every item should be streamed: {len(streamed)}"
+    assert generation.streamed_before_last >= 4, (
+        f"Results should stream while later items still run: {generation.streamed_before_last}"
+    )
+    assert ctx.progress[-1] == 100, ctx.progress
+
+    print(f"✅ Peak concurrency {generation.peak}, failures reported per item")
+    return True
+
+
+async def test_batch_limits():
+    """Empty and oversized batches are rejected up front"""
+    print("=== Testing batch size limits ===")
+    for items, expected in (([], "at least one item"), ([{"prompt": "x"}] * 21, "too large")):
+        try:
+            await batch_tool()(items, RecordingContext())
+            raise AssertionError(f"Batch of {len(items)} items should be rejected")
+        except ValueError as e:
+            assert expected in str(e), str(e)
+
+    print("✅ Batch size is validated")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Video Batch Test Suite")
+    print("=" * 50)
+
+    passed = True
+    for test in (test_batch_streams_results, test_batch_limits):
+        try:
+            passed = await test() and passed
+        except Exception as e:
+            print(f"❌ Test failed: {str(e)}")
+            passed = False
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test background video jobs: submit, status, bounded waits, listing and history
+Usage: python test_video_jobs.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Set the required CLI arguments before importing the server module
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="veo3_video_jobs_")
+sys.argv = [sys.argv[0], '--output-dir', TEST_OUTPUT_DIR]
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["VEO_STATE_DB"] = os.path.join(TEST_OUTPUT_DIR, "state.db")
+os.environ["VEO_JOB_MAX_WAIT"] = "0.3"
+os.environ["VEO_PROGRESS_INTERVAL"] = "0.05"
+
+import mcp_veo3_azure_blob as server
+
+
+class FakeContext:
+    def __init__(self):
+        self.progress: list[float] = []
+
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        pass
+
+    async def report_progress(self, progress, total=100, **kwargs):
+        self.progress.append(progress)
+
+
+class FakeGeneration:
+    """Stands in for generate_video_with_progress; each prompt finishes when released"""
+    def __init__(self):
+        self.release: dict[str, asyncio.Event] = {}
+
+    async def __call__(self, prompt, model, ctx, **kwargs):
+        gate = self.release.setdefault(prompt, asyncio.Event())
+        await ctx.report_progress(progress=40, total=100)
+        await gate.wait()
+        if prompt.startswith("fail"):
+            raise RuntimeError("generation blew up")
+        return {"video_path": f"/videos/{prompt}.mp4", "azure_blob_url": f"https://blob/{prompt}"}
+
+    def finish(self, prompt: str) -> None:
+        self.release.setdefault(prompt, asyncio.Event()).set()
+
+
+def tool(name):
+    candidate = getattr(server, name)
+    return getattr(candidate, "fn", candidate)
+
+
+async def test_submit_and_wait(generation: FakeGeneration):
+    """Submit returns at once; waits are bounded and end with the result"""
+    print("=== Testing submit, status and wait ===")
+    ctx = FakeContext()
+    submitted = await tool("submit_video_job")("ocean waves", ctx)
+    assert submitted.status in ("queued", "running"), submitted.status
+    assert submitted.job_id.startswith("job_"), submitted.job_id
+
+    await asyncio.sleep(0.05)
+    status = await tool("get_video_job")(submitted.job_id, ctx)
+    assert status.status == "running" and status.progress == 40, (
+        f"Job progress should come from the background run: {status}"
+    )
+
+    # The requested timeout is capped by VEO_JOB_MAX_WAIT
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    pending = await tool("wait_video_job")(submitted.job_id, ctx, timeout=30)
+    assert pending.status == "running", pending.status
+    assert loop.time() - started < 2, "wait_video_job must honour VEO_JOB_MAX_WAIT"
+
+    generation.finish("ocean waves")
+    finished = await tool("wait_video_job")(submitted.job_id, ctx, timeout=30)
+    assert finished.status == "succeeded" and finished.progress == 100, finished
+    assert finished.azure_video_url == "https://blob/ocean waves", finished.azure_video_url
+    assert finished.video_path == "/videos/ocean waves.mp4", finished.video_path
+
+    try:
+        await tool("get_video_job")("job_missing", ctx)
+        raise AssertionError("Unknown job ids should raise")
+    except ValueError as e:
+        assert "Job not found" in str(e), str(e)
+
+    print("✅ Submit returned immediately and the bounded wait saw the result")
+    return True
+
+
+async def test_failure_and_listing(generation: FakeGeneration):
+    """Failures are recorded on the job and listing filters by status"""
+    print("=== Testing failed jobs and listing ===")
+    ctx = FakeContext()
+    failing = await tool("submit_video_job")("fail loudly", ctx)
+    generation.finish("fail loudly")
+    failed = await tool("wait_video_job")(failing.job_id, ctx, timeout=5)
+    assert failed.status == "failed" and "generation blew up" in (failed.error or ""), failed
+
+    listing = await tool("list_video_jobs")(ctx)
+    assert listing.total_count == 2, listing
+    created = [job["created"] for job in listing.jobs]
+    assert created == sorted(created, reverse=True), "Jobs should be listed newest first"
+    only_failed = await tool("list_video_jobs")(ctx, status="failed")
+    assert [job["job_id"] for job in only_failed.jobs] == [failing.job_id], only_failed
+
+    try:
+        await tool("submit_video_job")("   ", ctx)
+        raise AssertionError("Empty prompts should be rejected")
+    except ValueError:
+        pass
+
+    print("✅ Failures are reported and listing filters by status")
+    return True
+
+
+async def test_history_eviction(generation: FakeGeneration):
+    """Only finished jobs beyond the history limit are forgotten"""
+    print("=== Testing job history limit ===")
+    manager = server.VideoJobManager(history_limit=2)
+    jobs = [manager.submit(prompt=f"evict {i}", model="veo-3.0-generate-preview") for i in range(2)]
+    for job in jobs:
+        generation.finish(job.prompt)
+        await asyncio.wait_for(job.finished.wait(), timeout=5)
+
+    running = manager.submit(prompt="evict running", model="veo-3.0-generate-preview")
+    assert manager.get(running.job_id) is running
+    assert len(manager.list()) == 2, [job.prompt for job in manager.list()]
+    assert jobs[0].job_id not in [job.job_id for job in manager.list()], "Oldest finished job goes"
+
+    another = manager.submit(prompt="evict another", model="veo-3.0-generate-preview")
+    assert {running.job_id, another.job_id} <= {job.job_id for job in manager.list()}, (
+        "Running jobs are never evicted"
+    )
+    for job in (running, another):
+        generation.finish(job.prompt)
+        await asyncio.wait_for(job.finished.wait(), timeout=5)
+
+    print("✅ History keeps running jobs and drops the oldest finished ones")
+    return True
+
+
+async def main():
+    """Run all tests"""
+    print("🧪 Video Job Test Suite")
+    print("=" * 50)
+
+    generation = FakeGeneration()
+    original = server.generate_video_with_progress
+    server.generate_video_with_progress = generation
+    passed = True
+    try:
+        for test in (test_submit_and_wait, test_failure_and_listing, test_history_eviction):
+            try:
+                passed = await test(generation) and passed
+            except Exception as e:
+                print(f"❌ Test failed: {str(e)}")
+                passed = False
+    finally:
+        server.generate_video_with_progress = original
+
+    print(f"\nOverall: {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())